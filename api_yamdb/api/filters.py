@@ -1,4 +1,6 @@
 import django_filters as filters
+from django.db.models import F
+from rest_framework.filters import OrderingFilter
 
 from reviews.models import Title
 
@@ -12,3 +14,41 @@ class TitleFilter(filters.FilterSet):
     class Meta:
         model = Title
         fields = ('category', 'genre', 'year', 'name')
+
+
+class StableOrderingFilter(OrderingFilter):
+    """?ordering= с однозначным порядком для постраничного вывода.
+
+    К сортировке добавляется первичный ключ в том же направлении, что и
+    первое поле, поэтому сортировка по одному полю целиком совпадает с
+    индексом (поле, id). Пустые значения nullable-полей идут в конце
+    при любом направлении.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        return queryset.order_by(*self.order_expressions(queryset, ordering))
+
+    @staticmethod
+    def order_expressions(queryset, ordering):
+        opts = queryset.model._meta
+        expressions = []
+        for field in ordering:
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            nulls_last = opts.get_field(name).null
+            expression = F(name)
+            expressions.append(
+                expression.desc(nulls_last=nulls_last) if descending
+                else expression.asc(nulls_last=nulls_last)
+            )
+        names = {field.lstrip('-') for field in ordering}
+        if not names & {'pk', opts.pk.name}:
+            tie_breaker = F('pk')
+            expressions.append(
+                tie_breaker.desc() if ordering[0].startswith('-')
+                else tie_breaker.asc()
+            )
+        return expressions
@@ -0,0 +1,25 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.schema import generate_schema, schema_version
+
+
+class Command(BaseCommand):
+    help = 'Собирает схему OpenAPI в статический файл для /redoc/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.OPENAPI_SCHEMA_FILE,
+            help='Куда сохранить схему.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['output']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as schema_file:
+            schema_file.write(generate_schema())
+        self.stdout.write(self.style.SUCCESS(
+            f'Схема версии {schema_version()} сохранена в {path}.'
+        ))
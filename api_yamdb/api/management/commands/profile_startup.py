@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.startup import group_by_package, measure_startup
+
+
+class Command(BaseCommand):
+    help = 'Замеряет холодный старт приложения: импорты и AppConfig.ready.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Сколько самых медленных модулей показать.',
+        )
+
+    def handle(self, *args, **options):
+        report = measure_startup(import_times=True)
+        top = options['top']
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Этапы запуска'))
+        for phase, seconds in report['phases'].items():
+            self.stdout.write(f'  {phase:<40}{seconds * 1000:>10.1f} мс')
+        self.stdout.write(
+            f'  {"всего, включая интерпретатор":<40}'
+            f'{report["total"] * 1000:>10.1f} мс'
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING('AppConfig.ready'))
+        for label, seconds in sorted(
+                report['ready'].items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {label:<40}{seconds * 1000:>10.1f} мс')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Импорты по пакетам'))
+        for package, seconds in group_by_package(report['imports'])[:top]:
+            self.stdout.write(f'  {package:<40}{seconds * 1000:>10.1f} мс')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Самые медленные модули (накопленное время)'
+        ))
+        slowest = sorted(
+            report['imports'], key=lambda item: item[2], reverse=True
+        )
+        for name, _, cumulative in slowest[:top]:
+            self.stdout.write(f'  {name:<60}{cumulative * 1000:>10.1f} мс')
+
+        budget = settings.STARTUP_TIME_BUDGET
+        if report['total'] > budget:
+            self.stdout.write(self.style.WARNING(
+                f'Запуск дольше бюджета {budget} с.'
+            ))
@@ -1,4 +1,18 @@
-from rest_framework import mixins, viewsets
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from reviews.jobs import CASCADES, cascade_size, enqueue
+
+from .serializers import JobSerializer
+
+UNKNOWN_FIELDS_ERROR = 'Неизвестные поля: {}.'
+INVALID_IDS_ERROR = 'Идентификаторы должны быть целыми числами через запятую.'
+TOO_MANY_IDS_ERROR = 'Можно запросить не больше {} объектов за раз.'
 
 
 class CustomViewSet(mixins.CreateModelMixin,
@@ -6,3 +20,130 @@ class CustomViewSet(mixins.CreateModelMixin,
                     mixins.DestroyModelMixin,
                     viewsets.GenericViewSet):
     pass
+
+
+def parse_list_param(value):
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsViewMixin:
+    """Поддержка ?fields= и ?expand= для чтения.
+
+    ?fields=id,name оставляет в ответе только перечисленные поля и
+    загружает из БД только нужные для них колонки; связанные объекты из
+    fields отдаются компактно (slug). ?expand=genre отдаёт связанный
+    объект целиком.
+    """
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._parse_sparse_fields()
+        return self._sparse_fields
+
+    def _parse_sparse_fields(self):
+        if (self.request is None
+                or self.request.method not in SAFE_METHODS
+                or 'fields' not in self.request.query_params):
+            return None
+        fields = parse_list_param(self.request.query_params['fields'])
+        expand = parse_list_param(
+            self.request.query_params.get('expand', '')
+        )
+        available = self.get_serializer_class()().fields
+        unknown = (fields | expand) - set(available)
+        if unknown:
+            raise ValidationError({'fields': UNKNOWN_FIELDS_ERROR.format(
+                ', '.join(sorted(unknown))
+            )})
+        return fields | expand, expand
+
+    def includes_field(self, name):
+        sparse = self.get_sparse_fields()
+        return sparse is None or name in sparse[0]
+
+    def prune_queryset(self, queryset, *required):
+        sparse = self.get_sparse_fields()
+        if sparse is None:
+            return queryset
+        columns = {
+            field.name for field in queryset.model._meta.concrete_fields
+            if field.name in sparse[0]
+        }
+        return queryset.only('pk', *required, *columns)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse_fields'] = self.get_sparse_fields()
+        return context
+
+
+class BatchFetchMixin:
+    """Получение нескольких объектов списка одним запросом: ?ids=3,1,2.
+
+    Объекты возвращаются в порядке запроса, отсутствующие перечисляются
+    в missing.
+    """
+
+    def parse_ids(self):
+        try:
+            ids = [
+                int(value)
+                for value in self.request.query_params['ids'].split(',')
+                if value.strip()
+            ]
+        except ValueError:
+            raise ValidationError({'ids': INVALID_IDS_ERROR})
+        ids = list(dict.fromkeys(ids))
+        limit = settings.BATCH_FETCH_MAX_IDS
+        if len(ids) > limit:
+            raise ValidationError({'ids': TOO_MANY_IDS_ERROR.format(limit)})
+        return ids
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        ids = self.parse_ids()
+        found = {obj.pk: obj for obj in self.get_queryset().filter(pk__in=ids)}
+        serializer = self.get_serializer(
+            [found[pk] for pk in ids if pk in found], many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in found],
+        })
+
+
+class AsyncDestroyMixin:
+    """Удаление объектов с большим каскадом фоновой задачей.
+
+    Если у объекта меньше ASYNC_DELETE_THRESHOLD зависимых записей, он
+    удаляется сразу. Иначе ставится задача delete_job_kind и
+    возвращается 202 со ссылкой на неё в заголовке Location.
+    """
+    delete_job_kind = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.delete_job_kind not in CASCADES:
+            raise ImproperlyConfigured(
+                f'{cls.__name__}: укажите delete_job_kind из '
+                f'{", ".join(CASCADES)}.'
+            )
+
+    def get_cascade_size(self, instance):
+        return cascade_size(
+            self.delete_job_kind, instance.pk, settings.ASYNC_DELETE_THRESHOLD
+        )
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if self.get_cascade_size(instance) < settings.ASYNC_DELETE_THRESHOLD:
+            self.perform_destroy(instance)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        job = enqueue(self.delete_job_kind, instance.pk, request.user)
+        location = reverse('jobs-detail', args=(job.pk,), request=request)
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': location},
+        )
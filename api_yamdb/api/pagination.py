@@ -0,0 +1,22 @@
+from functools import partial
+
+from rest_framework.pagination import PageNumberPagination
+
+from reviews.paginator import EstimatedCountPaginator
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """Постраничный вывод с точным count только для небольших списков.
+
+    Ответ выглядит как у PageNumberPagination. Если в списке больше
+    EXACT_COUNT_LIMIT объектов, count — оценка: поддерживаемый счётчик из
+    метода представления get_estimated_count, если он есть, иначе
+    статистика Postgres.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            EstimatedCountPaginator,
+            estimate=getattr(view, 'get_estimated_count', None),
+        )
+        return super().paginate_queryset(queryset, request, view)
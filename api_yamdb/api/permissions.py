@@ -34,3 +34,12 @@ class ReviewCommentPermissions(permissions.BasePermission):
             return True
         return (obj.author == request.user
                 or request.method in permissions.SAFE_METHODS)
+
+
+class AutocompletePermission(permissions.BasePermission):
+    """Подсказки по пользователям доступны только администраторам."""
+
+    def has_permission(self, request, view):
+        if request.query_params.get('type') != 'users':
+            return True
+        return IsAdmin().has_permission(request, view)
@@ -1,7 +1,11 @@
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.dedup import text_index
+from reviews.models import (Category, Comment, Genre, Job, Review,
+                            TextSignature, Title, TitleSimilarity,
+                            TrendingTitle, User)
 from reviews.validators import username_not_me
 
 from .title import CurrentReviewDefault, CurrentTitleDefault
@@ -12,6 +16,9 @@ ERROR_CHANGE_ROLE = {
 ERROR_CHANGE_EMAIL = {
     'email': 'Невозможно изменить подтвержденный адрес электронной почты.'
 }
+ERROR_DUPLICATE_TEXT = {
+    'text': 'Такой текст уже опубликован.'
+}
 
 
 class GetAllUserSerializer(serializers.ModelSerializer):
@@ -34,6 +41,18 @@ class GetAllUserSerializer(serializers.ModelSerializer):
         }
 
 
+class UserProfileSerializer(GetAllUserSerializer):
+    average_score = serializers.FloatField(read_only=True)
+
+    class Meta(GetAllUserSerializer.Meta):
+        fields = GetAllUserSerializer.Meta.fields + (
+            'reviews_count',
+            'comments_count',
+            'average_score',
+        )
+        read_only_fields = ('reviews_count', 'comments_count')
+
+
 class RegistrationSerializer(serializers.ModelSerializer):
     username = serializers.CharField(
         required=True,
@@ -77,16 +96,62 @@ class GenreSerializer(serializers.ModelSerializer):
         lookup_field = 'slug'
 
 
-class TitleReadSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Урезает набор полей по ?fields= (см. SparseFieldsViewMixin).
+
+    compact_fields описывает, как отдавать связанные объекты, которые
+    запрошены в fields, но не перечислены в expand.
+    """
+    compact_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        sparse = self.context.get('sparse_fields')
+        if sparse is None:
+            return
+        fields, expand = sparse
+        for name in set(self.fields) - fields:
+            self.fields.pop(name)
+        for name, (field_class, field_kwargs) in self.compact_fields.items():
+            if name in self.fields and name not in expand:
+                self.fields[name] = field_class(**field_kwargs)
+
+
+class TitleReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     genre = GenreSerializer(read_only=True, many=True)
     category = CategorySerializer(read_only=True)
     rating = serializers.IntegerField(read_only=True, required=False)
 
+    compact_fields = {
+        'genre': (serializers.SlugRelatedField, {
+            'slug_field': 'slug', 'many': True, 'read_only': True,
+        }),
+        'category': (serializers.SlugRelatedField, {
+            'slug_field': 'slug', 'read_only': True,
+        }),
+    }
+
     class Meta:
-        fields = '__all__'
+        exclude = ('score_sum',)
         model = Title
 
 
+class SimilarTitleSerializer(serializers.ModelSerializer):
+    title = TitleReadSerializer(source='similar', read_only=True)
+
+    class Meta:
+        model = TitleSimilarity
+        fields = ('title', 'score', 'common_reviewers')
+
+
+class TrendingTitleSerializer(serializers.ModelSerializer):
+    title = TitleReadSerializer(read_only=True)
+
+    class Meta:
+        model = TrendingTitle
+        fields = ('rank', 'score', 'reviews', 'title')
+
+
 class TitleWriteSerializer(TitleReadSerializer):
     genre = serializers.SlugRelatedField(queryset=Genre.objects.all(),
                                          slug_field='slug',
@@ -96,13 +161,54 @@ class TitleWriteSerializer(TitleReadSerializer):
                                             )
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class DuplicateTextMixin:
+    """Проверяет текст на повтор уже опубликованного (см. reviews.dedup).
+
+    В зависимости от DUPLICATE_TEXT_ACTION повтор отклоняется или
+    сохраняется вместе с сигнатурой текста для модераторов.
+    """
+    text_kind = None
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        action = settings.DUPLICATE_TEXT_ACTION
+        if 'text' not in attrs or action == 'off':
+            return attrs
+        self.text_check = text_index.check(
+            self.text_kind, attrs['text'],
+            self.instance.pk if self.instance is not None else None,
+        )
+        if (action == 'reject' and self.text_check is not None
+                and self.text_check.duplicate is not None):
+            raise serializers.ValidationError(ERROR_DUPLICATE_TEXT)
+        return attrs
+
+    def create(self, validated_data):
+        instance = super().create(validated_data)
+        check = getattr(self, 'text_check', None)
+        if check is not None:
+            text_index.save_many([check._replace(object_id=instance.pk)])
+        return instance
+
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        if hasattr(self, 'text_check'):
+            if self.text_check is None:
+                text_index.forget(self.text_kind, instance.pk)
+            else:
+                text_index.save(self.text_check)
+        return instance
+
+
+class ReviewSerializer(DuplicateTextMixin, SparseFieldsMixin,
+                       serializers.ModelSerializer):
     title = serializers.HiddenField(default=CurrentTitleDefault())
     author = serializers.SlugRelatedField(
         default=serializers.CurrentUserDefault(),
         slug_field='username',
         read_only=True
     )
+    text_kind = TextSignature.REVIEW
 
     class Meta:
         fields = '__all__'
@@ -111,14 +217,48 @@ class ReviewSerializer(serializers.ModelSerializer):
             queryset=Review.objects.all(),
             fields=('title', 'author',)),)
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        embedded = self.context.get('embedded_comments')
+        if embedded is not None:
+            comments, count = embedded.get(instance.pk, ([], 0))
+            data['comments'] = CommentSerializer(
+                comments, many=True,
+                context={**self.context, 'sparse_fields': None},
+            ).data
+            data['comments_count'] = count
+        return data
+
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(DuplicateTextMixin, SparseFieldsMixin,
+                        serializers.ModelSerializer):
     review = serializers.HiddenField(
         default=CurrentReviewDefault(), )
     author = serializers.SlugRelatedField(
         read_only=True, required=False, slug_field='username')
+    text_kind = TextSignature.COMMENT
 
     class Meta:
         model = Comment
         fields = '__all__'
         extra_kwargs = {'text': {'required': True}}
+
+
+class JobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'kind',
+            'object_id',
+            'status',
+            'total',
+            'processed',
+            'progress',
+            'error',
+            'created',
+            'started',
+            'finished',
+        )
@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Выполняется в отдельном интерпретаторе, чтобы замерить холодный старт:
+# время каждого AppConfig.ready, django.setup() и загрузки urlconf.
+PROBE = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+
+from django.apps import config
+
+ready_times = {}
+original_create = config.AppConfig.create.__func__
+
+
+def create(cls, entry):
+    app_config = original_create(cls, entry)
+    ready = app_config.ready
+
+    def timed_ready():
+        ready_start = time.perf_counter()
+        ready()
+        ready_times[app_config.label] = time.perf_counter() - ready_start
+
+    app_config.ready = timed_ready
+    return app_config
+
+
+config.AppConfig.create = classmethod(create)
+
+from api_yamdb.wsgi import application  # noqa: E402,F401
+
+setup_done = time.perf_counter()
+
+from django.urls import get_resolver  # noqa: E402
+
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+
+json.dump({
+    'phases': {
+        'setup': setup_done - start,
+        'urls': urls_done - setup_done,
+    },
+    'ready': ready_times,
+    'modules': sorted(sys.modules),
+}, sys.stdout)
+'''
+
+
+def parse_import_times(output):
+    """Разбирает вывод ``python -X importtime``.
+
+    Возвращает список (модуль, собственное время, накопленное время)
+    в секундах.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append(
+            (name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6)
+        )
+    return modules
+
+
+def measure_startup(import_times=False):
+    """Запускает приложение в новом процессе и возвращает замеры старта."""
+    command = [sys.executable]
+    if import_times:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE]
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        path for path in (settings.BASE_DIR, env.get('PYTHONPATH')) if path
+    )
+    start = time.perf_counter()
+    completed = subprocess.run(
+        command, cwd=settings.BASE_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True,
+    )
+    report = json.loads(completed.stdout)
+    report['total'] = time.perf_counter() - start
+    if import_times:
+        report['imports'] = parse_import_times(completed.stderr)
+    return report
+
+
+def group_by_package(imports):
+    totals = defaultdict(float)
+    for name, self_time, _ in imports:
+        totals[name.split('.')[0]] += self_time
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -1,9 +1,10 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                    GetAllUserViewSet, GetTokenView, RegistrationView,
-                    ReviewViewSet, TitleViewSet)
+from .views import (AutocompleteView, CategoryViewSet, CommentViewSet,
+                    GenreViewSet, GetAllUserViewSet, GetTokenView,
+                    JobViewSet, RegistrationView, ReviewViewSet,
+                    TitleViewSet)
 
 appname = 'api'
 router = DefaultRouter()
@@ -12,6 +13,7 @@ router.register(r'categories', CategoryViewSet, basename='categories')
 router.register(r'genres', GenreViewSet, basename='genres')
 router.register(r'titles', TitleViewSet, basename='titles')
 router.register('users', GetAllUserViewSet)
+router.register('jobs', JobViewSet, basename='jobs')
 router.register(r'titles/(?P<title_id>\d+)/reviews',
                 ReviewViewSet, basename='reviews')
 router.register(
@@ -29,5 +31,10 @@ urlpatterns = [
         'v1/auth/token/',
         GetTokenView.as_view(),
         name='get_token'
-    )
+    ),
+    path(
+        'v1/autocomplete/',
+        AutocompleteView.as_view(),
+        name='autocomplete'
+    ),
 ]
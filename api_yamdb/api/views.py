@@ -1,24 +1,39 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail
-from django.db.models.aggregates import Avg
+from django.db import IntegrityError, transaction
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, views, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from reviews.models import Category, Genre, Review, Title, User
-from .filters import TitleFilter
-from .mixins import CustomViewSet
-from .permissions import IsAdmin, ReviewCommentPermissions, AdminOrReadOnly
+from reviews.autocomplete import SOURCES, autocomplete
+from reviews.codes import consume_code, issue_code
+from reviews.models import (Category, Comment, Genre, Job, Review, Title,
+                            TitleSimilarity, TrendingTitle, User)
+from reviews.queries import first_comments
+from reviews.trending import cache_key, last_built
+
+from .filters import StableOrderingFilter, TitleFilter
+from .mixins import (AsyncDestroyMixin, BatchFetchMixin, CustomViewSet,
+                     SparseFieldsViewMixin, parse_list_param)
+from .pagination import EstimatedCountPagination
+from .permissions import (AdminOrReadOnly, AutocompletePermission, IsAdmin,
+                          ReviewCommentPermissions)
 from .serializers import (CategorySerializer, CommentSerializer,
                           GenreSerializer, GetAllUserSerializer,
-                          GetTokenSerializer, RegistrationSerializer,
-                          ReviewSerializer, TitleReadSerializer,
-                          TitleWriteSerializer)
+                          GetTokenSerializer, JobSerializer,
+                          RegistrationSerializer,
+                          ReviewSerializer, SimilarTitleSerializer,
+                          TitleReadSerializer, TrendingTitleSerializer,
+                          TitleWriteSerializer, UserProfileSerializer)
 
 USER_ERROR = {
     'Ошибка': 'Данный email уже зарегистирован.'
@@ -41,19 +56,25 @@ ME_ERROR = {
     'error': 'Данный никнейм выбрать нельзя.'
 }
 
+LIMIT_ERROR = 'Укажите целое число от 1 до {}.'
+
+TRENDING_WINDOW_ERROR = 'Допустимые значения: {}.'
+AUTOCOMPLETE_TYPE_ERROR = 'Допустимые значения: {}.'
+
 
-class GetAllUserViewSet(viewsets.ModelViewSet):
+class GetAllUserViewSet(AsyncDestroyMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdmin]
     queryset = User.objects.all()
     serializer_class = GetAllUserSerializer
     lookup_field = 'username'
     filter_backends = (filters.SearchFilter, )
     search_fields = ('username',)
+    delete_job_kind = Job.DELETE_USER
 
     @action(
         detail=False, methods=['GET', 'PATCH'],
         permission_classes=[IsAuthenticated],
-        serializer_class=GetAllUserSerializer
+        serializer_class=UserProfileSerializer
     )
     def me(self, request):
         user = self.request.user
@@ -80,23 +101,34 @@ class RegistrationView(views.APIView):
     permission_classes = [AllowAny]
 
     @staticmethod
-    def send_reg_mail(email, user):
+    def send_reg_mail(email, code):
         send_mail(
             subject='Код подтверждения для получения токена.',
             message=f'Пожалуйста, не передавайте данный код третьим лицам. '
-                    f'Ваш код: {user.confirmation_code}',
+                    f'Ваш код: {code}',
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[email],
             fail_silently=False
         )
 
     def post(self, request):
+        # Повторная регистрация с теми же username и email — запрос нового
+        # кода: прежний одноразовый и мог истечь.
+        user = User.objects.filter(
+            username=request.data.get('username'),
+            email=request.data.get('email'),
+        ).first()
+        if user is not None:
+            self.send_reg_mail(user.email, issue_code(user))
+            return Response(
+                {'email': user.email, 'username': user.username},
+                status=status.HTTP_200_OK
+            )
         serializer = RegistrationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data['email']
-        serializer.save(email=email)
-        user = get_object_or_404(User, email=email)
-        self.send_reg_mail(email, user)
+        user = serializer.save(email=email)
+        self.send_reg_mail(email, issue_code(user))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -108,19 +140,20 @@ class GetTokenView(views.APIView):
         serializer.is_valid(raise_exception=True)
         confirmation_code = serializer.validated_data['confirmation_code']
         username = serializer.validated_data['username']
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
-            return Response(
-                USERNAME_NOT_FOUND,
-                status=status.HTTP_404_NOT_FOUND
-            )
-        if user.confirmation_code != confirmation_code:
+        user_id = consume_code(username, confirmation_code)
+        if user_id is None:
+            if not User.objects.filter(username=username).exists():
+                return Response(
+                    USERNAME_NOT_FOUND,
+                    status=status.HTTP_404_NOT_FOUND
+                )
             return Response(
                 CODE_ERROR,
                 status=status.HTTP_400_BAD_REQUEST
             )
-        return Response(self.obtain_token(user), status=status.HTTP_200_OK)
+        return Response(
+            self.obtain_token(User(pk=user_id)), status=status.HTTP_200_OK
+        )
 
     @staticmethod
     def obtain_token(user):
@@ -131,11 +164,34 @@ class GetTokenView(views.APIView):
         }
 
 
+class AutocompleteView(views.APIView):
+    permission_classes = [AutocompletePermission]
+
+    def get(self, request):
+        kind = request.query_params.get('type', 'titles')
+        if kind not in SOURCES:
+            raise ValidationError({
+                'type': AUTOCOMPLETE_TYPE_ERROR.format(', '.join(SOURCES))
+            })
+        limit = request.query_params.get('limit', settings.AUTOCOMPLETE_LIMIT)
+        max_limit = settings.AUTOCOMPLETE_MAX_LIMIT
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= max_limit:
+            raise ValidationError({'limit': LIMIT_ERROR.format(max_limit)})
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response([])
+        return Response(autocomplete.search(kind, query, limit))
+
+
 class CategoryViewSet(CustomViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (AdminOrReadOnly,)
-    pagination_class = PageNumberPagination
+    pagination_class = EstimatedCountPagination
     lookup_field = 'slug'
     filter_backends = (filters.SearchFilter, )
     search_fields = ('name',)
@@ -145,51 +201,167 @@ class GenreViewSet(CustomViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = (AdminOrReadOnly,)
-    pagination_class = PageNumberPagination
+    pagination_class = EstimatedCountPagination
     lookup_field = 'slug'
     filter_backends = (filters.SearchFilter, )
     search_fields = ('name',)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')).all()
+class TitleViewSet(AsyncDestroyMixin, BatchFetchMixin, SparseFieldsViewMixin,
+                   viewsets.ModelViewSet):
+    queryset = Title.objects.all()
     permission_classes = (AdminOrReadOnly,)
-    pagination_class = PageNumberPagination
-    filter_backends = (DjangoFilterBackend,)
+    pagination_class = EstimatedCountPagination
+    filter_backends = (DjangoFilterBackend, StableOrderingFilter)
     filterset_class = TitleFilter
+    ordering_fields = ('rating', 'year', 'reviews_count', 'name')
+    ordering = ('id',)
+    delete_job_kind = Job.DELETE_TITLE
+
+    def get_queryset(self):
+        queryset = self.prune_queryset(super().get_queryset())
+        if self.includes_field('category'):
+            queryset = queryset.select_related('category')
+        if self.includes_field('genre'):
+            queryset = queryset.prefetch_related('genre')
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PATCH']:
             return TitleWriteSerializer
         return TitleReadSerializer
 
+    @action(detail=True, methods=['GET'], pagination_class=None)
+    def similar(self, request, pk=None):
+        if not pk.isdigit():
+            raise Http404
+        similar = list(
+            TitleSimilarity.objects.filter(title_id=pk)
+            .select_related('similar__category')
+            .prefetch_related('similar__genre')
+            .order_by('-score')[:settings.SIMILAR_TITLES_COUNT]
+        )
+        if not similar:
+            get_object_or_404(Title.objects.only('pk'), pk=pk)
+        serializer = SimilarTitleSerializer(
+            similar, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['GET'], pagination_class=None)
+    def trending(self, request):
+        window = request.query_params.get(
+            'window', settings.TRENDING_DEFAULT_WINDOW
+        )
+        if window not in settings.TRENDING_WINDOWS:
+            return Response(
+                {'window': TRENDING_WINDOW_ERROR.format(
+                    ', '.join(settings.TRENDING_WINDOWS)
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        key = cache_key(window, last_built(window))
+        data = cache.get(key)
+        if data is None:
+            trending = (
+                TrendingTitle.objects.filter(window=window)
+                .select_related('title__category')
+                .prefetch_related('title__genre')
+            )
+            data = TrendingTitleSerializer(
+                trending, many=True, context={'request': request}
+            ).data
+            cache.set(key, data, settings.TRENDING_CACHE_TTL)
+        return Response(data)
+
+
+class ReviewViewSet(BatchFetchMixin, SparseFieldsViewMixin,
+                    viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [ReviewCommentPermissions, ]
-    pagination_class = PageNumberPagination
+    pagination_class = EstimatedCountPagination
+
+    def get_comments_limit(self):
+        limit = self.request.query_params.get(
+            'comments_limit', settings.EMBEDDED_COMMENTS_LIMIT
+        )
+        max_limit = settings.EMBEDDED_COMMENTS_MAX_LIMIT
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= max_limit:
+            raise ValidationError({
+                'comments_limit': LIMIT_ERROR.format(max_limit)
+            })
+        return limit
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        embed = parse_list_param(self.request.query_params.get('embed', ''))
+        if page is not None and 'comments' in embed:
+            self.embedded_comments = first_comments(
+                [review.pk for review in page], self.get_comments_limit()
+            )
+        return page
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['embedded_comments'] = getattr(
+            self, 'embedded_comments', None
+        )
+        return context
+
+    def get_estimated_count(self):
+        return self.title.reviews_count
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        try:
+            with transaction.atomic():
+                serializer.save(author=self.request.user)
+        except IntegrityError:
+            # Отзыв успел создать параллельный запрос: ответ тот же, что
+            # у UniqueTogetherValidator сериализатора.
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    UniqueTogetherValidator.message.format(
+                        field_names='title, author'
+                    )
+                ]
+            }, code='unique')
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Review.objects.none()
         title_id = self.kwargs.get('title_id')
-        title = get_object_or_404(Title, id=title_id)
-        new_queryset = title.reviews.all()
+        self.title = get_object_or_404(Title, id=title_id)
+        new_queryset = self.prune_queryset(self.title.reviews.all(), 'title')
+        if self.includes_field('author'):
+            new_queryset = new_queryset.select_related('author')
         return new_queryset
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [ReviewCommentPermissions, ]
-    pagination_class = PageNumberPagination
+    pagination_class = EstimatedCountPagination
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Comment.objects.none()
         review_id = self.kwargs.get('review_id')
         review = get_object_or_404(Review, id=review_id)
-        new_queryset = review.comments.all()
+        new_queryset = self.prune_queryset(review.comments.all(), 'review')
+        if self.includes_field('author'):
+            new_queryset = new_queryset.select_related('author')
         return new_queryset
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAdmin]
+    pagination_class = EstimatedCountPagination
@@ -1,7 +1,186 @@
+"""ASGI-приложение: лента произведения по SSE и остальной API через WSGI.
+
+Django 2.2 не умеет обрабатывать запросы асинхронно, поэтому обычные
+запросы выполняются WSGI-приложением в пуле потоков, а долгие соединения
+ленты /api/v1/titles/{id}/live/ обслуживаются здесь же в цикле событий:
+ожидающий клиент — это корутина и очередь, а не занятый поток.
+Запуск: uvicorn api_yamdb.asgi:application.
+"""
+import asyncio
+import json
 import os
+import re
+from urllib.parse import parse_qs
 
-from django.core.asgi import get_asgi_application
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
-application = get_asgi_application()
+django_application = WsgiToAsgi(get_wsgi_application())
+
+from django.conf import settings  # noqa: E402
+from django.db import close_old_connections  # noqa: E402
+
+from reviews import live  # noqa: E402
+from reviews.models import Title  # noqa: E402
+
+LIVE_FEED_PATH = re.compile(r'^/api/v1/titles/(?P<title_id>\d+)/live/$')
+NOT_FOUND = {'detail': 'Страница не найдена.'}
+METHOD_NOT_ALLOWED = {'detail': 'Метод не разрешён.'}
+TOO_MANY_SUBSCRIBERS = {'detail': 'Слишком много подписчиков, повторите '
+                                  'запрос позже.'}
+
+
+def run_in_thread(func):
+    """Синхронный код с базой в пуле потоков, как в запросах Django."""
+    def wrapper(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper)
+
+
+title_exists = run_in_thread(
+    lambda pk: Title.objects.filter(pk=pk).exists()
+)
+events_since = run_in_thread(live.events_since)
+
+
+async def application(scope, receive, send):
+    match = None
+    if scope['type'] == 'http':
+        match = LIVE_FEED_PATH.match(scope['path'])
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif match:
+        await live_feed(scope, receive, send, int(match.group('title_id')))
+    else:
+        await django_application(scope, receive, send)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            live.start(asyncio.get_event_loop())
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def respond(send, status, data, headers=()):
+    body = json.dumps(data, ensure_ascii=False).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def format_event(event):
+    data = event.to_json().replace('\n', '\ndata: ')
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(
+        event.id, event.kind, data
+    ).encode()
+
+
+def last_event_id(scope):
+    """Браузер присылает Last-Event-ID при переподключении сам, при
+    первом подключении его можно передать параметром ?last_event_id=."""
+    for name, value in scope['headers']:
+        if name == b'last-event-id':
+            return live.parse_event_id(value.decode('latin-1'))
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return live.parse_event_id(query.get('last_event_id', [''])[-1])
+
+
+async def missed_events(title_id, key):
+    if key is None:
+        return []
+    events = live.broker.replay(title_id, key)
+    if events is None:
+        events = await events_since(
+            title_id, key, settings.LIVE_FEED_RESUME_LIMIT
+        )
+    return events
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def live_feed(scope, receive, send, title_id):
+    if scope['method'] != 'GET':
+        await respond(send, 405, METHOD_NOT_ALLOWED, [(b'allow', b'GET')])
+        return
+    live.start(asyncio.get_event_loop())
+    if not await title_exists(title_id):
+        await respond(send, 404, NOT_FOUND)
+        return
+    # Подписка оформляется до чтения пропущенного, чтобы между ними
+    # ничего не потерялось; повторы отсекаются по ключам отправленных
+    # событий. Окно покрывает пропущенное и всю очередь подписки.
+    subscription = live.broker.subscribe(title_id)
+    if subscription is None:
+        await respond(
+            send, 503, TOO_MANY_SUBSCRIBERS, [(b'retry-after', b'30')]
+        )
+        return
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        missed = await missed_events(title_id, last_event_id(scope))
+        sent = live.SentEvents(
+            max(settings.LIVE_FEED_HISTORY_SIZE,
+                settings.LIVE_FEED_RESUME_LIMIT)
+            + settings.LIVE_FEED_QUEUE_SIZE
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        body = 'retry: {}\n\n'.format(settings.LIVE_FEED_RETRY).encode()
+        for event in missed:
+            sent.add(event.key)
+            body += format_event(event)
+        await send({
+            'type': 'http.response.body', 'body': body, 'more_body': True,
+        })
+        while not subscription.overflowed:
+            get = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                (get, disconnected), timeout=settings.LIVE_FEED_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                get.cancel()
+                return
+            if get in done:
+                event = get.result()
+                if not sent.add(event.key):
+                    continue
+                chunk = format_event(event)
+            else:
+                get.cancel()
+                # Комментарий не виден клиенту, но не даёт прокси
+                # закрыть простаивающее соединение.
+                chunk = b': ping\n\n'
+            await send({
+                'type': 'http.response.body', 'body': chunk,
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        live.broker.unsubscribe(subscription)
@@ -0,0 +1,71 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPTS_BROTLI = re.compile(r'\bbr\b')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+
+class CompressionMiddleware:
+    """Сжимает ответы больше COMPRESSION_MIN_SIZE байт.
+
+    Если клиент поддерживает brotli и пакет установлен, используется он,
+    иначе gzip. В отличие от GZipMiddleware, порог размера настраивается
+    и маленькие ответы не тратят процессор на сжатие.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and ACCEPTS_BROTLI.search(accept_encoding):
+            encoding = 'br'
+            compressed = brotli.compress(
+                response.content, quality=settings.BROTLI_QUALITY
+            )
+        elif ACCEPTS_GZIP.search(accept_encoding):
+            encoding = 'gzip'
+            compressed = compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Сжатый ответ побайтно отличается от исходного, поэтому сильный
+        # ETag превращается в слабый, как в GZipMiddleware.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    @staticmethod
+    def is_compressible(response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return False
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return False
+        content_type = response.get('Content-Type', '')
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -12,8 +12,11 @@ ALLOWED_HOSTS = ['84.252.139.136', 'localhost', 'therealrustam.ddns.net', ]
 
 AUTH_USER_MODEL = 'reviews.User'
 
+# Админка не нужна воркерам, которые обслуживают только API: без неё
+# быстрее старт и меньше памяти на процесс.
+ADMIN_ENABLED = os.getenv('DJANGO_ADMIN_ENABLED', 'true').lower() == 'true'
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -23,12 +26,14 @@ INSTALLED_APPS = [
     'django_filters',
     'api.apps.ApiConfig',
     'reviews.apps.ReviewsConfig',
-    'drf_yasg',
-
 ]
 
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api_yamdb.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,7 +98,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.EstimatedCountPagination',
     'PAGE_SIZE': 10
 }
 
@@ -122,6 +127,20 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
+STATICFILES_STORAGE = (
+    'api_yamdb.storage.CompressedManifestStaticFilesStorage'
+)
+
+# Ответы меньше порога не сжимаются: выигрыш в размере не окупает
+# затраты процессора.
+COMPRESSION_MIN_SIZE = 1024
+BROTLI_QUALITY = 5
+
+# Собранная схема OpenAPI попадает в статику при collectstatic и
+# отдаётся nginx по адресу /redoc/openapi.json.
+OPENAPI_SCHEMA_DIR = os.path.join(BASE_DIR, 'schema')
+OPENAPI_SCHEMA_FILE = os.path.join(OPENAPI_SCHEMA_DIR, 'openapi.json')
+STATICFILES_DIRS = [('schema', OPENAPI_SCHEMA_DIR)]
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
@@ -129,3 +148,104 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 ADMIN_ROLE = 'admin'
 MODERATOR_ROLE = 'moderator'
 USER_ROLE = 'user'
+
+# Сколько объектов можно запросить за раз через ?ids=.
+BATCH_FETCH_MAX_IDS = 100
+
+# Сколько комментариев встраивать в отзывы по ?embed=comments.
+EMBEDDED_COMMENTS_LIMIT = 3
+EMBEDDED_COMMENTS_MAX_LIMIT = 20
+
+# Произведения и пользователи, у которых отзывов и комментариев больше
+# порога, удаляются фоновой задачей (см. run_jobs) пачками по
+# JOB_CHUNK_SIZE объектов.
+ASYNC_DELETE_THRESHOLD = 500
+JOB_CHUNK_SIZE = 500
+# Задача, воркер которой не отзывался дольше этого числа секунд
+# (упал или перезапущен), снова ставится в очередь.
+JOB_LEASE_TIMEOUT = 10 * 60
+
+# Бюджет холодного старта приложения в секундах (см. profile_startup).
+STARTUP_TIME_BUDGET = 3.0
+
+# До этого числа строки в списках считаются точно, дальше используется
+# оценка по статистике Postgres (см. reviews.paginator).
+EXACT_COUNT_LIMIT = 10000
+# Сколько секунд кешируется оценка числа строк большого списка.
+COUNT_CACHE_TTL = 60
+
+# Срок действия кода подтверждения в секундах.
+CONFIRMATION_CODE_TTL = 24 * 60 * 60
+
+# Похожие произведения (см. build_title_similarity): сколько соседей
+# хранить, минимум общих рецензентов и сглаживание сходства для пар с
+# малым числом общих рецензентов.
+SIMILAR_TITLES_COUNT = 10
+SIMILARITY_MIN_COMMON_REVIEWERS = 2
+SIMILARITY_SHRINKAGE = 10
+
+# Популярные произведения (см. build_trending_titles): окно и период
+# полураспада веса отзыва в часах для каждого допустимого ?window=.
+TRENDING_WINDOWS = {
+    '1d': (24, 6),
+    '7d': (7 * 24, 36),
+    '30d': (30 * 24, 7 * 24),
+}
+TRENDING_DEFAULT_WINDOW = '7d'
+TRENDING_SIZE = 100
+TRENDING_CACHE_TTL = 60
+# Часовые интервалы активности старше этого срока (в днях) сворачиваются
+# в суточные, суточные старше ACTIVITY_RETENTION_DAYS удаляются.
+ACTIVITY_HOURLY_RETENTION_DAYS = 7
+ACTIVITY_RETENTION_DAYS = 90
+
+# Автодополнение (/api/v1/autocomplete/): размер ответа по умолчанию и
+# максимальный, а также срок, после которого индекс процесса
+# пересобирается в фоне, в секундах.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_MAX_AGE = 600
+
+# Лента новых отзывов и комментариев по SSE (см. api_yamdb.asgi):
+# бэкенд доставки событий, размер очереди одного подписчика, число
+# событий истории произведения для продолжения по Last-Event-ID, предел
+# событий, дочитываемых из базы, и интервалы пинга и переподключения.
+LIVE_FEED_BACKEND = os.getenv(
+    'LIVE_FEED_BACKEND',
+    default='reviews.live.PostgresBackend'
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    else 'reviews.live.LocalBackend'
+)
+LIVE_FEED_QUEUE_SIZE = 100
+LIVE_FEED_HISTORY_SIZE = 100
+LIVE_FEED_HISTORY_TITLES = 1000
+LIVE_FEED_RESUME_LIMIT = 500
+LIVE_FEED_MAX_SUBSCRIBERS = 10000
+LIVE_FEED_HEARTBEAT = 15
+LIVE_FEED_RETRY = 3000
+
+# Секционирование отзывов и комментариев по месяцам (только Postgres,
+# см. reviews.partitions и manage_review_partitions). Включается до
+# миграции reviews 0009; сколько месяцев создавать наперёд, через
+# сколько месяцев выгружать старые секции (None — не выгружать) и куда.
+REVIEW_PARTITIONING = (
+    os.getenv('REVIEW_PARTITIONING', 'false').lower() == 'true'
+)
+PARTITION_PREMAKE_MONTHS = 3
+PARTITION_RETENTION_MONTHS = None
+PARTITION_ARCHIVE_DIR = os.getenv(
+    'PARTITION_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive')
+)
+
+# Поиск повторяющихся текстов отзывов и комментариев (см. reviews.dedup):
+# что делать с повтором при публикации — 'flag' (записать для
+# модераторов), 'reject' (отклонить) или 'off'; порог сходства, длина
+# нормализованного текста, начиная с которой он проверяется, предел
+# кандидатов на проверку и кеш корзин в памяти процесса.
+DUPLICATE_TEXT_ACTION = os.getenv('DUPLICATE_TEXT_ACTION', default='flag')
+DUPLICATE_TEXT_THRESHOLD = 0.7
+DUPLICATE_TEXT_MIN_LENGTH = 40
+DUPLICATE_TEXT_MAX_CANDIDATES = 200
+DUPLICATE_TEXT_CACHE_SIZE = 100000
+DUPLICATE_TEXT_CACHE_TTL = 300
+DUPLICATE_TEXT_SHORT_CACHE_TTL = 5
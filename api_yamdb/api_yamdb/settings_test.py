@@ -0,0 +1,27 @@
+"""Настройки для тестов: SQLite в памяти и быстрый хешер паролей.
+
+Подключаются в pytest.ini, Postgres и переменные окружения для запуска
+тестов не нужны. С pytest-xdist каждый процесс получает свою базу.
+Если задан DB_ENGINE=django.db.backends.postgresql, тесты идут на
+Postgres из переменных окружения, и выполняются также тесты с меткой
+postgres.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+if os.getenv('DB_ENGINE') != 'django.db.backends.postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+LIVE_FEED_BACKEND = 'reviews.live.LocalBackend'
@@ -0,0 +1,43 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml',
+)
+MIN_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в имени и сжатыми копиями .gz.
+
+    Хеш в имени позволяет nginx отдавать файлы с бессрочным кешированием,
+    а готовые .gz копии — не сжимать их на каждый запрос (gzip_static).
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = super().post_process(paths, dry_run=dry_run, **options)
+        for name, hashed_name, is_processed in processed:
+            yield name, hashed_name, is_processed
+            if dry_run or isinstance(is_processed, Exception):
+                continue
+            for path in {name, hashed_name}:
+                if path:
+                    self.write_gzipped(path)
+
+    def write_gzipped(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        if len(content) < MIN_SIZE:
+            return
+        compressed = gzip.compress(content, compresslevel=9)
+        if len(compressed) >= len(content):
+            return
+        with open(path + '.gz', 'wb') as target:
+            target.write(compressed)
+        stat = os.stat(path)
+        os.utime(path + '.gz', (stat.st_atime, stat.st_mtime))
@@ -1,24 +1,24 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path
 from django.urls.conf import include
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
+from django.views.generic import TemplateView
+
+from api.schema import openapi_schema
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="API Yamdb",
-        default_version='v1',
-        description="Документация для приложения проекта API Yamdb",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path(
-        'redoc/', schema_view.with_ui('redoc', cache_timeout=0),
+        'redoc/',
+        TemplateView.as_view(
+            template_name='redoc.html',
+            extra_context={'schema_url': 'schema-openapi'},
+        ),
         name='schema-redoc'),
+    path('redoc/openapi.json', openapi_schema, name='schema-openapi'),
 ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# sync — по процессу на запрос, gthread — пул потоков в каждом процессе,
+# gevent — кооперативная многозадачность (нужен пакет gevent).
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'sync':
+    default_workers = CPU_COUNT * 2 + 1
+elif worker_class == 'gthread':
+    default_workers = CPU_COUNT + 1
+else:
+    default_workers = CPU_COUNT
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY', default_workers)
+))
+threads = int(os.getenv(
+    'GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1
+))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Приложение загружается один раз в мастер-процессе, воркеры получают
+# его копию при fork. gevent должен пропатчить стандартную библиотеку до
+# импорта Django, поэтому для него предзагрузка выключена.
+preload_app = (
+    os.getenv('GUNICORN_PRELOAD', '1') == '1' and worker_class != 'gevent'
+)
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Периодический перезапуск воркеров ограничивает рост памяти, а разброс
+# не даёт всем воркерам перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG')
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Соединения с БД, открытые мастером при предзагрузке, нельзя
+    # использовать из нескольких процессов одновременно.
+    from django.db import connections
+
+    connections.close_all()
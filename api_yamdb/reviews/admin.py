@@ -1,7 +1,20 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils.text import Truncator
 
-from reviews.models import Category, Genre, Title, User
+from reviews.jobs import enqueue_chunks
+from reviews.models import (Category, Comment, Genre, Job, Review,
+                            TextSignature, Title, User)
+from reviews.paginator import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без полного COUNT(*) по таблице и без лишних запросов."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    empty_value_display = '-пусто-'
 
 
 class UserAdmin(UserAdmin):
@@ -11,34 +24,115 @@ class UserAdmin(UserAdmin):
     add_fieldsets = UserAdmin.add_fieldsets + (
         (None, {'fields': ('role',)}),
     )
-    list_display = ['email', 'username', 'role', 'is_active']
+    list_display = [
+        'email', 'username', 'role', 'is_active',
+        'reviews_count', 'comments_count', 'average_score',
+    ]
+    list_filter = ('role', 'is_staff', 'is_active')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def average_score(self, obj):
+        return obj.average_score
+    average_score.short_description = 'Средняя оценка'
+
 
 admin.site.register(User, UserAdmin)
 
 
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(LargeTableAdmin):
     list_display = ('pk', 'name', 'slug')
     search_fields = ('name',)
-    empty_value_display = '-пусто-'
-    list_filter = ('name',)
     list_editable = ('name',)
 
 
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(LargeTableAdmin):
     list_display = ('pk', 'name', 'slug')
     search_fields = ('name',)
-    empty_value_display = '-пусто-'
-    list_filter = ('name',)
     list_editable = ('name',)
 
 
-class TitleAdmin(admin.ModelAdmin):
-    search_fields = ('name',)
-    empty_value_display = '-пусто-'
+class TitleAdmin(LargeTableAdmin):
+    list_display = (
+        'pk', 'name', 'year', 'category', 'rating', 'reviews_count'
+    )
+    list_select_related = ('category',)
+    raw_id_fields = ('category', 'genre')
+    search_fields = ('^name',)
+    actions = ('rebuild_aggregates',)
+
+    def rebuild_aggregates(self, request, queryset):
+        jobs = enqueue_chunks(
+            Job.REBUILD_TITLE_AGGREGATES,
+            queryset.order_by('pk').values_list('pk', flat=True).iterator(),
+            request.user,
+        )
+        self.message_user(
+            request, f'Поставлено задач на пересчёт рейтингов: {len(jobs)}.'
+        )
+    rebuild_aggregates.short_description = (
+        'Пересчитать рейтинги выбранных произведений в фоне'
+    )
+
+
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ('pk', 'title', 'author', 'score', 'short_text', 'pub_date')
+    list_select_related = ('title', 'author')
+    raw_id_fields = ('title', 'author')
+    search_fields = ('=author__username', '^title__name')
+    list_filter = ('score',)
+    ordering = ('-pk',)
+
+    def short_text(self, obj):
+        return Truncator(obj.text).chars(80)
+    short_text.short_description = 'Текст'
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'review_id', 'author', 'short_text', 'pub_date')
+    list_select_related = ('author',)
+    raw_id_fields = ('review', 'author')
+    search_fields = ('=author__username',)
+    ordering = ('-pk',)
+
+    def short_text(self, obj):
+        return Truncator(obj.text).chars(80)
+    short_text.short_description = 'Текст'
 
 
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Genre, GenreAdmin)
 admin.site.register(Title, TitleAdmin)
+admin.site.register(Review, ReviewAdmin)
+admin.site.register(Comment, CommentAdmin)
+
+
+class DuplicateFilter(admin.SimpleListFilter):
+    title = 'Повтор'
+    parameter_name = 'duplicate'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Да'), ('no', 'Нет'))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(duplicate_id__isnull=False)
+        if self.value() == 'no':
+            return queryset.filter(duplicate_id__isnull=True)
+        return queryset
+
+
+class TextSignatureAdmin(LargeTableAdmin):
+    list_display = (
+        'pk', 'kind', 'object_id', 'duplicate_kind', 'duplicate_id',
+        'similarity', 'created',
+    )
+    list_filter = (DuplicateFilter, 'kind')
+    exclude = ('signature',)
+    readonly_fields = (
+        'kind', 'object_id', 'duplicate_kind', 'duplicate_id', 'similarity',
+    )
+
+
+admin.site.register(TextSignature, TextSignatureAdmin)
@@ -0,0 +1,148 @@
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.db.models import (Case, Count, F, IntegerField, Max, OuterRef,
+                              Subquery, Sum, When)
+from django.db.models.functions import Coalesce
+
+from .models import Title, TitleAggregateEvent
+from .trending import add_activity, hour_start
+
+RATING = Case(
+    When(reviews_count__gt=0, then=F('score_sum') / F('reviews_count')),
+    default=None,
+    output_field=IntegerField(),
+)
+
+# Разрешает чтение очереди, но не запись в неё из других транзакций.
+LOCK_EVENTS_SQL = 'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE'
+EVENT_FIELDS = (
+    'pk', 'title_id', 'reviews_delta', 'score_delta', 'created', 'review_date'
+)
+
+
+def enqueue_review_change(title_id, reviews_delta=0, score_delta=0,
+                          review_date=None):
+    TitleAggregateEvent.objects.create(
+        title_id=title_id,
+        reviews_delta=reviews_delta,
+        score_delta=score_delta,
+        review_date=review_date,
+    )
+
+
+def enqueue_review_changes(changes):
+    """Ставит в очередь пачку изменений одним запросом.
+
+    changes — кортежи (title_id, reviews_delta, score_delta, review_date).
+    """
+    TitleAggregateEvent.objects.bulk_create(
+        TitleAggregateEvent(
+            title_id=title_id,
+            reviews_delta=reviews_delta,
+            score_delta=score_delta,
+            review_date=review_date,
+        )
+        for title_id, reviews_delta, score_delta, review_date in changes
+    )
+
+
+def event_activity(events):
+    """Изменения {(title_id, час отзыва): [отзывы, оценки]} по событиям.
+
+    События без даты отзыва относятся к часу, когда они созданы.
+    """
+    activity = defaultdict(lambda: [0, 0])
+    for event in events:
+        _, title_id, reviews_delta, score_delta, created, review_date = event
+        hour = activity[title_id, hour_start(review_date or created)]
+        hour[0] += reviews_delta
+        hour[1] += score_delta
+    return {key: changes for key, changes in activity.items() if any(changes)}
+
+
+def apply_pending_events(batch_size=1000):
+    """Сворачивает пачку событий по произведениям и применяет их.
+
+    Те же события попадают в часовые интервалы активности, по которым
+    считаются популярные произведения.
+
+    Возвращает количество обработанных событий и затронутых произведений.
+    """
+    with transaction.atomic():
+        events = list(
+            TitleAggregateEvent.objects.order_by('pk')
+            .select_for_update(skip_locked=True)
+            .values_list(*EVENT_FIELDS)[:batch_size]
+        )
+        if not events:
+            return 0, 0
+        deltas = defaultdict(lambda: [0, 0])
+        for _, title_id, reviews_delta, score_delta, _, _ in events:
+            deltas[title_id][0] += reviews_delta
+            deltas[title_id][1] += score_delta
+        for title_id, (reviews_delta, score_delta) in sorted(deltas.items()):
+            if reviews_delta or score_delta:
+                Title.objects.filter(pk=title_id).update(
+                    reviews_count=F('reviews_count') + reviews_delta,
+                    score_sum=F('score_sum') + score_delta,
+                )
+        Title.objects.filter(pk__in=deltas).update(rating=RATING)
+        add_activity(event_activity(events))
+        TitleAggregateEvent.objects.filter(
+            pk__in=[event[0] for event in events]
+        ).delete()
+    return len(events), len(deltas)
+
+
+def rebuild_title_aggregates(title_model, review_model, event_model,
+                             title_ids=None):
+    """Пересчитывает агрегаты произведений по таблице отзывов.
+
+    Без title_ids пересчитываются все произведения, иначе только
+    перечисленные. Учтённые пересчётом события удаляются из очереди, но
+    их изменения сначала попадают в интервалы активности, как при
+    apply_pending_events.
+
+    На Postgres очередь событий на время пересчёта блокируется для
+    записи: иначе отзыв, закоммиченный между чтением last_event и
+    UPDATE, попал бы и в пересчёт, и в оставшиеся события. Отзыв и его
+    событие записываются одной транзакцией (см. Review.save), поэтому
+    такой отзыв становится виден только вместе с событием.
+    """
+    titles = title_model.objects.all()
+    events = event_model.objects.all()
+    if title_ids is not None:
+        titles = titles.filter(pk__in=title_ids)
+        events = events.filter(title_id__in=title_ids)
+    connection = connections[events.db]
+    with transaction.atomic(using=events.db):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(LOCK_EVENTS_SQL.format(
+                    table=connection.ops.quote_name(
+                        event_model._meta.db_table
+                    )
+                ))
+        last_event = events.aggregate(last=Max('pk'))['last']
+        reviews = (
+            review_model.objects.filter(title=OuterRef('pk'))
+            .order_by()
+            .values('title')
+        )
+        updated = titles.update(
+            reviews_count=Coalesce(Subquery(
+                reviews.annotate(value=Count('pk')).values('value'),
+                output_field=IntegerField(),
+            ), 0),
+            score_sum=Coalesce(Subquery(
+                reviews.annotate(value=Sum('score')).values('value'),
+                output_field=IntegerField(),
+            ), 0),
+        )
+        titles.update(rating=RATING)
+        if last_event is not None:
+            applied = events.filter(pk__lte=last_event)
+            add_activity(event_activity(applied.values_list(*EVENT_FIELDS)))
+            applied.delete()
+    return updated
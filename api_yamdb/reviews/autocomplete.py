@@ -0,0 +1,398 @@
+"""Автодополнение по названиям произведений, жанров и именам пользователей.
+
+Индекс хранится в памяти процесса: отсортированный список ключей, поиск
+по префиксу — двоичный поиск (bisect). Ключами служат нормализованное
+название и все его окончания, начинающиеся с нового слова, поэтому
+«колец» находит «Властелин колец». Изменения, сделанные в этом процессе,
+попадают в индекс сразу через сигналы; изменения из других процессов и
+сдвиги популярности подхватываются фоновой пересборкой раз в
+AUTOCOMPLETE_MAX_AGE секунд.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F
+
+from .models import Genre, Title, User
+
+WORD_SEPARATORS = re.compile(r'\W+')
+MAX_CHAR = '\U0010ffff'
+MAX_WORDS = 8
+
+
+def words(text):
+    text = (text or '').casefold()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKC', text).replace('ё', 'е')
+    return [word for word in WORD_SEPARATORS.split(text) if word]
+
+
+def normalize(text):
+    """Регистр, «ё» и пунктуация не влияют на поиск."""
+    return ' '.join(words(text))
+
+
+def word_keys(text):
+    """Нормализованный текст и его окончания, начинающиеся со слова."""
+    parts = words(text)[:MAX_WORDS]
+    if not parts:
+        return ()
+    key = ' '.join(parts)
+    keys = [key]
+    offset = 0
+    for word in parts[:-1]:
+        offset += len(word) + 1
+        keys.append(key[offset:])
+    return tuple(keys)
+
+
+class PrefixIndex:
+    """Отсортированный по ключам индекс с ранжированием по популярности.
+
+    Ключи хранятся блоками по chunk_size штук, поэтому вставка и удаление
+    сдвигают один блок, а не весь список. Для префиксов, под которые
+    подходит больше scan_limit ключей, лучшие top_size объектов
+    кешируются и поддерживаются при изменениях; для префиксов длиной до
+    warm_prefix_length они считаются сразу при сборке.
+    """
+
+    def __init__(self, top_size=50, scan_limit=2000, chunk_size=1000,
+                 warm_prefix_length=2):
+        self.top_size = top_size
+        self.scan_limit = scan_limit
+        self.chunk_size = chunk_size
+        self.warm_prefix_length = warm_prefix_length
+        self.chunks = []
+        self.chunk_ids = []
+        self.maxes = []
+        self.items = {}
+        self.ranks = {}
+        self.top = {}
+        self.top_prefix_length = 0
+        self.lock = threading.RLock()
+
+    @classmethod
+    def build(cls, entries, **kwargs):
+        """Строит индекс из (pk, текст, популярность, данные ответа)."""
+        index = cls(**kwargs)
+        pairs = []
+        for pk, text, popularity, payload in entries:
+            keys = word_keys(text)
+            index.items[pk] = (popularity or 0, payload, keys)
+            index.ranks[pk] = (-(popularity or 0), pk)
+            pairs.extend((key, pk) for key in keys)
+        pairs.sort(key=itemgetter(0))
+        for start in range(0, len(pairs), index.chunk_size):
+            chunk = pairs[start:start + index.chunk_size]
+            index.chunks.append([key for key, _ in chunk])
+            index.chunk_ids.append(array('q', (pk for _, pk in chunk)))
+            index.maxes.append(chunk[-1][0])
+        index.warm_up()
+        return index
+
+    def __len__(self):
+        return len(self.items)
+
+    def best(self, pks, count):
+        return heapq.nsmallest(count, set(pks), key=self.ranks.__getitem__)
+
+    def locate(self, key):
+        """Позиция (блок, смещение) первого ключа не меньше key."""
+        chunk = bisect_left(self.maxes, key)
+        if chunk == len(self.chunks):
+            return chunk, 0
+        return chunk, bisect_left(self.chunks[chunk], key)
+
+    def key_range(self, prefix):
+        return self.locate(prefix), self.locate(prefix + MAX_CHAR)
+
+    def range_size(self, start, end, limit):
+        """Число ключей в диапазоне, но не больше limit + 1."""
+        (first, first_offset), (last, last_offset) = start, end
+        if first == last:
+            return last_offset - first_offset
+        size = len(self.chunks[first]) - first_offset + last_offset
+        for chunk in range(first + 1, last):
+            if size > limit:
+                break
+            size += len(self.chunks[chunk])
+        return size
+
+    def range_ids(self, start, end):
+        (first, first_offset), (last, last_offset) = start, end
+        if first == len(self.chunks):
+            return ()
+        if first == last:
+            return self.chunk_ids[first][first_offset:last_offset]
+        return itertools.chain(
+            self.chunk_ids[first][first_offset:],
+            *self.chunk_ids[first + 1:last],
+            self.chunk_ids[last][:last_offset] if last < len(self.chunks)
+            else (),
+        )
+
+    def cache_top(self, prefix, start, end):
+        pks = self.best(self.range_ids(start, end), self.top_size)
+        self.top[prefix] = pks
+        self.top_prefix_length = max(self.top_prefix_length, len(prefix))
+        return pks
+
+    def warm_up(self):
+        for length in range(1, self.warm_prefix_length + 1):
+            position = (0, 0)
+            while position[0] < len(self.chunks):
+                prefix = self.chunks[position[0]][position[1]][:length]
+                start, end = self.key_range(prefix)
+                if self.range_size(start, end, self.scan_limit) > (
+                        self.scan_limit):
+                    self.cache_top(prefix, start, end)
+                position = end
+
+    def search(self, query, limit):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self.lock:
+            start, end = self.key_range(prefix)
+            if self.range_size(start, end, self.scan_limit) <= (
+                    self.scan_limit):
+                pks = self.best(self.range_ids(start, end), limit)
+            else:
+                pks = self.top.get(prefix)
+                if pks is None:
+                    pks = self.cache_top(prefix, start, end)
+            return [self.items[pk][1] for pk in pks[:limit]]
+
+    def cached_prefixes(self, keys):
+        if not self.top:
+            return set()
+        return {
+            key[:length] for key in keys
+            for length in range(1, min(len(key), self.top_prefix_length) + 1)
+        } & self.top.keys()
+
+    def insert(self, key, pk):
+        if not self.chunks:
+            self.chunks.append([key])
+            self.chunk_ids.append(array('q', [pk]))
+            self.maxes.append(key)
+            return
+        chunk = min(bisect_right(self.maxes, key), len(self.chunks) - 1)
+        keys, ids = self.chunks[chunk], self.chunk_ids[chunk]
+        position = bisect_right(keys, key)
+        keys.insert(position, key)
+        ids.insert(position, pk)
+        self.maxes[chunk] = keys[-1]
+        if len(keys) > 2 * self.chunk_size:
+            half = len(keys) // 2
+            self.chunks[chunk + 1:chunk + 1] = [keys[half:]]
+            self.chunk_ids[chunk + 1:chunk + 1] = [ids[half:]]
+            self.maxes[chunk + 1:chunk + 1] = [keys[-1]]
+            del keys[half:]
+            del ids[half:]
+            self.maxes[chunk] = keys[-1]
+
+    def delete(self, key, pk):
+        chunk, position = self.locate(key)
+        while self.chunk_ids[chunk][position] != pk:
+            position += 1
+            if position == len(self.chunks[chunk]):
+                chunk, position = chunk + 1, 0
+        keys, ids = self.chunks[chunk], self.chunk_ids[chunk]
+        del keys[position]
+        del ids[position]
+        if keys:
+            self.maxes[chunk] = keys[-1]
+        else:
+            del self.chunks[chunk]
+            del self.chunk_ids[chunk]
+            del self.maxes[chunk]
+
+    def add(self, pk, text, popularity=None, payload=None):
+        """Добавляет или обновляет объект.
+
+        Если popularity не передана, сохраняется прежняя.
+        """
+        with self.lock:
+            current = self.items.get(pk)
+            if popularity is None:
+                popularity = current[0] if current else 0
+            keys = word_keys(text)
+            if current is not None and current[2] != keys:
+                self.remove(pk)
+                current = None
+            self.items[pk] = (popularity, payload, keys)
+            self.ranks[pk] = (-popularity, pk)
+            if current is None:
+                for key in keys:
+                    self.insert(key, pk)
+            for prefix in self.cached_prefixes(keys):
+                top = self.top[prefix]
+                if pk in top:
+                    if current is not None and popularity < current[0]:
+                        # Объект мог опуститься ниже тех, кого нет в
+                        # списке, поэтому список строится заново.
+                        del self.top[prefix]
+                    else:
+                        top.sort(key=self.ranks.__getitem__)
+                elif (len(top) < self.top_size
+                      or self.ranks[pk] < self.ranks[top[-1]]):
+                    top.append(pk)
+                    top.sort(key=self.ranks.__getitem__)
+                    del top[self.top_size:]
+
+    def remove(self, pk):
+        with self.lock:
+            current = self.items.pop(pk, None)
+            if current is None:
+                return
+            del self.ranks[pk]
+            for key in current[2]:
+                self.delete(key, pk)
+            for prefix in self.cached_prefixes(current[2]):
+                if pk in self.top[prefix]:
+                    del self.top[prefix]
+
+
+def title_entry(pk, name, year, reviews_count):
+    return pk, name, reviews_count, {'id': pk, 'name': name, 'year': year}
+
+
+def title_entries(queryset):
+    rows = queryset.values_list('pk', 'name', 'year', 'reviews_count')
+    return (title_entry(*row) for row in rows.iterator())
+
+
+def title_instance_entry(title):
+    return title_entry(title.pk, title.name, title.year, title.reviews_count)
+
+
+def genre_entry(pk, name, slug, popularity):
+    return pk, name, popularity, {'name': name, 'slug': slug}
+
+
+def genre_entries(queryset):
+    rows = queryset.annotate(
+        popularity=Count('titles')
+    ).values_list('pk', 'name', 'slug', 'popularity')
+    return (genre_entry(*row) for row in rows.iterator())
+
+
+def genre_instance_entry(genre):
+    # Число произведений жанра обновится при пересборке индекса.
+    return genre_entry(genre.pk, genre.name, genre.slug, None)
+
+
+def user_entry(pk, username, popularity):
+    return pk, username, popularity, {'username': username}
+
+
+def user_entries(queryset):
+    rows = queryset.annotate(
+        popularity=F('reviews_count') + F('comments_count')
+    ).values_list('pk', 'username', 'popularity')
+    return (user_entry(*row) for row in rows.iterator())
+
+
+def user_instance_entry(user):
+    return user_entry(
+        user.pk, user.username, user.reviews_count + user.comments_count
+    )
+
+
+# Тип автодополнения: модель, поле для поиска в БД до сборки индекса,
+# сортировка по популярности в БД, записи индекса из queryset и из
+# сохранённого объекта.
+SOURCES = {
+    'titles': (
+        Title, 'name', '-reviews_count', title_entries, title_instance_entry
+    ),
+    'genres': (Genre, 'name', 'name', genre_entries, genre_instance_entry),
+    'users': (
+        User, 'username', '-reviews_count', user_entries, user_instance_entry
+    ),
+}
+MODEL_TYPES = {source[0]: kind for kind, source in SOURCES.items()}
+
+
+class Autocomplete:
+    """Индексы всех типов процесса и их фоновая пересборка."""
+
+    def __init__(self):
+        self.indexes = {}
+        self.built = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def search(self, kind, query, limit):
+        index = self.indexes.get(kind)
+        age = time.monotonic() - self.built.get(kind, 0)
+        if index is None or age > settings.AUTOCOMPLETE_MAX_AGE:
+            self.rebuild_in_background(kind)
+        if index is None:
+            return self.search_database(kind, query, limit)
+        return index.search(query, limit)
+
+    @staticmethod
+    def search_database(kind, query, limit):
+        """Поиск по началу названия, пока индекс строится."""
+        model, field, ordering, entries, _ = SOURCES[kind]
+        queryset = model.objects.filter(
+            **{f'{field}__istartswith': query}
+        ).order_by(ordering, 'pk')[:limit]
+        return [payload for _, _, _, payload in entries(queryset)]
+
+    def rebuild_in_background(self, kind):
+        with self.lock:
+            if kind in self.pending:
+                return
+            self.pending[kind] = []
+        threading.Thread(
+            target=self.rebuild, args=(kind,), daemon=True
+        ).start()
+
+    def rebuild(self, kind):
+        model, _, _, entries, _ = SOURCES[kind]
+        try:
+            index = PrefixIndex.build(
+                entries(model.objects.order_by()),
+                top_size=settings.AUTOCOMPLETE_MAX_LIMIT,
+            )
+            with self.lock:
+                # Изменения, пришедшие во время сборки, применяются к
+                # новому индексу перед заменой.
+                for method, args in self.pending[kind]:
+                    getattr(index, method)(*args)
+                self.indexes[kind] = index
+                self.built[kind] = time.monotonic()
+        finally:
+            with self.lock:
+                self.pending.pop(kind, None)
+            connection.close()
+
+    def apply(self, kind, method, *args):
+        with self.lock:
+            index = self.indexes.get(kind)
+            if index is not None:
+                getattr(index, method)(*args)
+            if kind in self.pending:
+                self.pending[kind].append((method, args))
+
+    def object_saved(self, instance):
+        kind = MODEL_TYPES[type(instance)]
+        self.apply(kind, 'add', *SOURCES[kind][4](instance))
+
+    def object_deleted(self, model, pk):
+        self.apply(MODEL_TYPES[model], 'remove', pk)
+
+
+autocomplete = Autocomplete()
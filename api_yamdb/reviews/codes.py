@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ConfirmationCode
+
+CODE_BYTES = 18
+
+CONSUME_SQL = '''
+    UPDATE {table} SET used_at = %s
+    WHERE code_hash = %s AND used_at IS NULL AND expires_at > %s
+    RETURNING user_id
+'''
+
+
+def hash_code(username, code):
+    """HMAC-SHA256 кода, привязанный к имени пользователя.
+
+    С чужим username код даёт другой хеш, поэтому проверка сводится к
+    поиску по уникальному индексу code_hash без чтения пользователя.
+    """
+    return hmac.new(
+        settings.SECRET_KEY.encode(),
+        f'{username}:{code}'.encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def expiry_time():
+    return timezone.now() + timedelta(seconds=settings.CONFIRMATION_CODE_TTL)
+
+
+def issue_code(user):
+    """Создаёт код для пользователя и возвращает его в открытом виде."""
+    code = secrets.token_urlsafe(CODE_BYTES)
+    ConfirmationCode.objects.create(
+        user=user,
+        code_hash=hash_code(user.username, code),
+        expires_at=expiry_time(),
+    )
+    return code
+
+
+def consume_code(username, code):
+    """Проверяет и гасит код; возвращает id пользователя или None.
+
+    На Postgres проверка и отметка об использовании — один запрос
+    UPDATE ... RETURNING, так что код нельзя использовать дважды даже
+    при одновременных запросах.
+    """
+    code_hash = hash_code(username, code)
+    now = timezone.now()
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(ConfirmationCode._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                CONSUME_SQL.format(table=table), [now, code_hash, now]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    with transaction.atomic():
+        row = ConfirmationCode.objects.filter(
+            code_hash=code_hash, used_at__isnull=True, expires_at__gt=now
+        ).values_list('pk', 'user_id').first()
+        if row is None:
+            return None
+        updated = ConfirmationCode.objects.filter(
+            pk=row[0], used_at__isnull=True
+        ).update(used_at=now)
+    return row[1] if updated else None
+
+
+def purge_codes(batch_size=1000):
+    """Удаляет истёкшие и использованные коды пачками.
+
+    Возвращает число удалённых кодов.
+    """
+    stale = ConfirmationCode.objects.filter(
+        Q(expires_at__lte=timezone.now()) | Q(used_at__isnull=False)
+    )
+    deleted = 0
+    while True:
+        pks = list(stale.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += ConfirmationCode.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,365 @@
+"""Поиск почти одинаковых текстов отзывов и комментариев (MinHash LSH).
+
+Текст нормализуется, режется на пересекающиеся куски по SHINGLE_SIZE
+символов, и для множества кусков считается MinHash-сигнатура из
+NUM_PERM чисел: доля совпавших чисел двух сигнатур оценивает долю общих
+кусков (сходство Жаккара). Сигнатура делится на BANDS полос, хеш каждой
+полосы — ключ корзины в таблице TextBand. Кандидаты в повторы — тексты,
+совпавшие с новым хотя бы в одной корзине; это один индексный запрос,
+сколько бы текстов ни было в базе. Окончательно повтор определяется
+сравнением сигнатур с порогом DUPLICATE_TEXT_THRESHOLD.
+
+Корзины и сигнатуры кешируются в памяти процесса на
+DUPLICATE_TEXT_CACHE_TTL секунд, поэтому волна одинакового спама
+проверяется без запросов к базе. Пустые и почти пустые корзины
+кешируются только на DUPLICATE_TEXT_SHORT_CACHE_TTL секунд: первые
+копии новой волны в них добавляют другие процессы.
+"""
+import hashlib
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .autocomplete import words
+from .models import TextBand, TextSignature
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+# Текст длиннее сравнивается по началу.
+MAX_LENGTH = 10000
+# Перестановки (a * h + b) mod PRIME с a, b и h меньше 2 ** 32 не
+# переполняют 64 бита, поэтому numpy и чистый Python дают одно и то же.
+PRIME = 4294967311
+MASK = 0xffffffff
+_random = random.Random(6421)
+PERMUTATIONS = [
+    (_random.randrange(1, MASK), _random.randrange(0, MASK))
+    for _ in range(NUM_PERM)
+]
+SIGNATURE_FORMAT = f'<{NUM_PERM}I'
+BUCKETS_PER_QUERY = 1000
+# Корзины не больше этого размера кешируются на короткое время.
+SHORT_BUCKET_SIZE = 1
+
+TextCheck = namedtuple(
+    'TextCheck', 'kind object_id signature keys duplicate similarity'
+)
+
+
+def shingles(text):
+    normalized = ' '.join(words(text[:MAX_LENGTH]))
+    if len(normalized) < settings.DUPLICATE_TEXT_MIN_LENGTH:
+        return set()
+    return {
+        normalized[start:start + SHINGLE_SIZE]
+        for start in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text):
+    """Сигнатура текста или None, если текст слишком короткий."""
+    hashes = [zlib.crc32(shingle.encode()) for shingle in shingles(text)]
+    if not hashes:
+        return None
+    if np is not None:
+        values = np.array(hashes, dtype=np.uint64)
+        a, b = (np.array(column, dtype=np.uint64)[:, None]
+                for column in zip(*PERMUTATIONS))
+        # Константы явно uint64: в numpy 1.x смешение с int даёт float64.
+        permuted = (a * values + b) % np.uint64(PRIME) & np.uint64(MASK)
+        return tuple(int(value) for value in permuted.min(axis=1))
+    return tuple(
+        min((a * value + b) % PRIME & MASK for value in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            struct.pack(f'<B{ROWS}I', band, *rows), digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(first, second):
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def pack(signature):
+    return struct.pack(SIGNATURE_FORMAT, *signature)
+
+
+def unpack(data):
+    return struct.unpack(SIGNATURE_FORMAT, bytes(data))
+
+
+class ExpiringCache:
+    """Ограниченный по размеру кеш с вытеснением давно не читанного."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl
+        with self.lock:
+            self.items[key] = (time.monotonic() + ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def update(self, key, func):
+        """Меняет значение, только если оно уже есть в кеше."""
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None:
+                self.items[key] = (item[0], func(item[1]))
+
+    def pop(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+class TextIndex:
+    """Корзины LSH в базе и их кеш в памяти процесса."""
+
+    def __init__(self):
+        self.buckets = ExpiringCache(
+            settings.DUPLICATE_TEXT_CACHE_SIZE,
+            settings.DUPLICATE_TEXT_CACHE_TTL,
+        )
+        self.signatures = ExpiringCache(
+            settings.DUPLICATE_TEXT_CACHE_SIZE,
+            settings.DUPLICATE_TEXT_CACHE_TTL,
+        )
+        self.short_ttl = settings.DUPLICATE_TEXT_SHORT_CACHE_TTL
+
+    def bucket_members(self, keys):
+        members = {}
+        missing = []
+        for key in keys:
+            cached = self.buckets.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                members[key] = cached
+        if not missing:
+            return members
+        for start in range(0, len(missing), BUCKETS_PER_QUERY):
+            chunk = missing[start:start + BUCKETS_PER_QUERY]
+            # Предел кандидатов — на каждый проверяемый текст.
+            limit = settings.DUPLICATE_TEXT_MAX_CANDIDATES * -(
+                -len(chunk) // BANDS
+            )
+            found = defaultdict(list)
+            # При усечении остаются самые новые тексты.
+            rows = (
+                TextBand.objects.filter(key__in=chunk)
+                .order_by('-object_id')
+                .values_list('key', 'kind', 'object_id')[:limit]
+            )
+            count = 0
+            for key, kind, object_id in rows:
+                found[key].append((kind, object_id))
+                count += 1
+            for key in chunk:
+                members[key] = tuple(found[key])
+                # Усечённый ответ мог пропустить часть корзин, их не
+                # кешируем.
+                if count < limit:
+                    self.buckets.set(key, members[key], (
+                        self.short_ttl
+                        if len(members[key]) <= SHORT_BUCKET_SIZE else None
+                    ))
+        return members
+
+    def load_signatures(self, items):
+        signatures = {}
+        missing = defaultdict(list)
+        for item in items:
+            cached = self.signatures.get(item)
+            if cached is None:
+                missing[item[0]].append(item[1])
+            else:
+                signatures[item] = cached
+        if missing:
+            condition = Q()
+            for kind, object_ids in missing.items():
+                condition |= Q(kind=kind, object_id__in=object_ids)
+            rows = TextSignature.objects.filter(condition).values_list(
+                'kind', 'object_id', 'signature'
+            )
+            for kind, object_id, data in rows:
+                item = (kind, object_id)
+                signatures[item] = unpack(data)
+                self.signatures.set(item, signatures[item])
+        return signatures
+
+    def check_many(self, items):
+        """Проверяет тексты (kind, object_id, text) на повторы.
+
+        Тексты сравниваются с базой и с предыдущими текстами той же
+        пачки. Для слишком коротких текстов возвращается None.
+        """
+        prepared = []
+        for kind, object_id, text in items:
+            signature = minhash(text)
+            if signature is not None:
+                prepared.append(
+                    (kind, object_id, signature, band_keys(signature))
+                )
+        members = self.bucket_members(
+            list({key for *_, keys in prepared for key in keys})
+        )
+        signatures = self.load_signatures(
+            {item for group in members.values() for item in group}
+        )
+        batch = defaultdict(list)
+        results = {}
+        threshold = settings.DUPLICATE_TEXT_THRESHOLD
+        for kind, object_id, signature, keys in prepared:
+            this = (kind, object_id)
+            candidates = {
+                other
+                for key in keys
+                for other in members.get(key, ()) + tuple(batch[key])
+                if other != this and other in signatures
+            }
+            best, best_similarity = max(
+                (
+                    (other, similarity(signature, signatures[other]))
+                    for other in candidates
+                ),
+                key=lambda match: match[1], default=(None, 0.0),
+            )
+            if best_similarity < threshold:
+                best = None
+            results[this] = TextCheck(
+                kind, object_id, signature, keys, best, best_similarity
+            )
+            if object_id is not None:
+                signatures[this] = signature
+                for key in keys:
+                    batch[key].append(this)
+        return [
+            results.get((kind, object_id)) for kind, object_id, _ in items
+        ]
+
+    def check(self, kind, text, object_id=None):
+        return self.check_many([(kind, object_id, text)])[0]
+
+    def save_many(self, checks):
+        """Сохраняет сигнатуры и корзины проверенных текстов."""
+        signatures = []
+        bands = []
+        for check in checks:
+            duplicate_kind, duplicate_id = check.duplicate or ('', None)
+            signatures.append(TextSignature(
+                kind=check.kind,
+                object_id=check.object_id,
+                signature=pack(check.signature),
+                duplicate_kind=duplicate_kind,
+                duplicate_id=duplicate_id,
+                similarity=check.similarity if check.duplicate else None,
+            ))
+            bands.extend(
+                TextBand(key=key, kind=check.kind, object_id=check.object_id)
+                for key in check.keys
+            )
+        TextSignature.objects.bulk_create(signatures)
+        TextBand.objects.bulk_create(bands)
+        transaction.on_commit(lambda: self.remember(checks))
+
+    def remember(self, checks):
+        for check in checks:
+            item = (check.kind, check.object_id)
+            self.signatures.set(item, check.signature)
+            for key in check.keys:
+                self.buckets.update(key, lambda group: group + (item,))
+
+    def save(self, check):
+        self.forget(check.kind, check.object_id)
+        self.save_many([check])
+
+    def forget(self, kind, object_id):
+        TextSignature.objects.filter(kind=kind, object_id=object_id).delete()
+        TextBand.objects.filter(kind=kind, object_id=object_id).delete()
+        # Корзины в кеше чистить не нужно: текст без сигнатуры
+        # при проверке пропускается.
+        self.signatures.pop((kind, object_id))
+
+    def forget_many(self, kind, object_ids):
+        TextSignature.objects.filter(
+            kind=kind, object_id__in=object_ids
+        ).delete()
+        TextBand.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        for object_id in object_ids:
+            self.signatures.pop((kind, object_id))
+
+
+text_index = TextIndex()
+
+
+def backfill(model, kind, batch_size, rebuild=False):
+    """Строит сигнатуры уже опубликованных текстов пачками по pk.
+
+    Более поздний текст помечается повтором более раннего. Возвращает
+    число проверенных текстов и найденных повторов.
+    """
+    if rebuild:
+        TextSignature.objects.filter(kind=kind).delete()
+        TextBand.objects.filter(kind=kind).delete()
+    checked = duplicates = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'text')[:batch_size]
+        )
+        if not batch:
+            return checked, duplicates
+        last_pk = batch[-1][0]
+        indexed = set(TextSignature.objects.filter(
+            kind=kind, object_id__in=[pk for pk, _ in batch]
+        ).values_list('object_id', flat=True))
+        checks = [
+            check for check in text_index.check_many(
+                [(kind, pk, text) for pk, text in batch if pk not in indexed]
+            ) if check is not None
+        ]
+        text_index.save_many(checks)
+        checked += len(checks)
+        duplicates += sum(check.duplicate is not None for check in checks)
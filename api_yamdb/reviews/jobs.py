@@ -0,0 +1,224 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .aggregates import rebuild_title_aggregates
+from .models import (Comment, Job, Review, Title, TitleAggregateEvent,
+                     User)
+from .signals import bulk_delete
+from .stats import recount_user_stats
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def abandoned(now=None):
+    """Условие на задачи, воркер которых перестал отзываться."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOB_LEASE_TIMEOUT)
+    return Q(status=Job.RUNNING) & (
+        Q(heartbeat__lt=cutoff) | Q(heartbeat__isnull=True, started__lt=cutoff)
+    )
+
+
+def enqueue(kind, object_id=None, user=None, object_ids=()):
+    """Ставит задачу в очередь; повторная задача для того же объекта
+    (или набора object_ids) не создаётся, пока первая не завершилась.
+    Брошенная задача возвращается в очередь."""
+    object_ids = ','.join(map(str, object_ids))
+    with transaction.atomic():
+        active = Job.objects.select_for_update().filter(
+            kind=kind, object_id=object_id, object_ids=object_ids,
+            status__in=(Job.PENDING, Job.RUNNING),
+        ).first()
+        if active is None:
+            return Job.objects.create(
+                kind=kind, object_id=object_id, object_ids=object_ids,
+                created_by=user,
+            )
+        if Job.objects.filter(abandoned(), pk=active.pk).exists():
+            active.status = Job.PENDING
+            active.save(update_fields=('status',))
+    return active
+
+
+def claim_next():
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Job.PENDING) | abandoned(now))
+            .order_by('pk')
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status == Job.RUNNING:
+            logger.warning('Задача %s брошена воркером, перезапуск', job)
+        job.status = Job.RUNNING
+        job.started = job.heartbeat = now
+        job.processed = 0
+        job.save(update_fields=('status', 'started', 'heartbeat', 'processed'))
+    return job
+
+
+def run(job):
+    try:
+        HANDLERS[job.kind](job)
+    except Exception as error:
+        logger.exception('Задача %s завершилась с ошибкой', job)
+        job.status = Job.FAILED
+        job.error = str(error)
+    else:
+        job.status = Job.DONE
+    job.finished = timezone.now()
+    job.save(update_fields=('status', 'error', 'finished'))
+
+
+def set_total(job, total):
+    job.total = total
+    Job.objects.filter(pk=job.pk).update(
+        total=total, heartbeat=timezone.now()
+    )
+
+
+def enqueue_chunks(kind, pks, user=None):
+    """Ставит задачи над набором объектов, по одной на JOB_CHUNK_SIZE
+    идентификаторов. Возвращает список задач."""
+    chunk_size = settings.JOB_CHUNK_SIZE
+    pks = list(pks)
+    return [
+        enqueue(kind, user=user, object_ids=pks[start:start + chunk_size])
+        for start in range(0, len(pks), chunk_size)
+    ]
+
+
+def job_object_ids(job):
+    return [int(pk) for pk in job.object_ids.split(',') if pk]
+
+
+def advance(job, count):
+    """Отмечает прогресс задачи и продлевает её аренду."""
+    Job.objects.filter(pk=job.pk).update(
+        processed=F('processed') + count,
+        heartbeat=timezone.now(),
+    )
+
+
+def delete_in_chunks(job, queryset):
+    """Удаляет объекты короткими транзакциями по JOB_CHUNK_SIZE штук.
+
+    Блокировки держатся только на время одной пачки. Счётчики авторов,
+    очередь рейтингов и индекс похожих текстов обновляются запросами на
+    всю пачку, а не обработчиками post_delete для каждой строки.
+    """
+    chunk_size = settings.JOB_CHUNK_SIZE
+    model = queryset.model
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return
+            bulk_delete(model.objects.filter(pk__in=pks))
+            advance(job, len(pks))
+
+
+def pk_chunks(queryset):
+    """Первичные ключи queryset пачками по JOB_CHUNK_SIZE по возрастанию."""
+    chunk_size = settings.JOB_CHUNK_SIZE
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    pks = list(queryset[:chunk_size])
+    while pks:
+        yield pks
+        pks = list(queryset.filter(pk__gt=pks[-1])[:chunk_size])
+
+
+def title_cascade(title_id):
+    return (
+        Comment.objects.filter(review__title_id=title_id),
+        Review.objects.filter(title_id=title_id),
+    )
+
+
+def user_cascade(user_id):
+    return (
+        Comment.objects.filter(
+            Q(author_id=user_id) | Q(review__author_id=user_id)
+        ),
+        Review.objects.filter(author_id=user_id),
+    )
+
+
+# Зависимые записи, которые удаляются вместе с объектом, по типу задачи.
+CASCADES = {
+    Job.DELETE_TITLE: title_cascade,
+    Job.DELETE_USER: user_cascade,
+}
+
+
+def cascade_size(kind, object_id, limit):
+    """Число зависимых записей объекта, но не больше limit.
+
+    Каждый подсчёт ограничен оставшимся до limit числом строк, поэтому
+    на объектах с огромным каскадом он стоит не больше limit строк.
+    """
+    size = 0
+    for queryset in CASCADES[kind](object_id):
+        size += queryset.order_by()[:limit - size].count()
+        if size >= limit:
+            break
+    return size
+
+
+@handler(Job.DELETE_TITLE)
+def delete_title(job):
+    comments, reviews = title_cascade(job.object_id)
+    set_total(job, comments.count() + reviews.count() + 1)
+    delete_in_chunks(job, comments)
+    delete_in_chunks(job, reviews)
+    delete_in_chunks(job, Title.objects.filter(pk=job.object_id))
+
+
+@handler(Job.DELETE_USER)
+def delete_user(job):
+    comments, reviews = user_cascade(job.object_id)
+    set_total(job, comments.count() + reviews.count() + 1)
+    delete_in_chunks(job, comments)
+    delete_in_chunks(job, reviews)
+    delete_in_chunks(job, User.objects.filter(pk=job.object_id))
+
+
+@handler(Job.REBUILD_TITLE_AGGREGATES)
+def rebuild_aggregates(job):
+    titles = Title.objects.all()
+    if job.object_ids:
+        titles = titles.filter(pk__in=job_object_ids(job))
+    set_total(job, titles.count())
+    for pks in pk_chunks(titles):
+        advance(job, rebuild_title_aggregates(
+            Title, Review, TitleAggregateEvent, title_ids=pks
+        ))
+
+
+@handler(Job.RECOUNT_USER_STATS)
+def recount_users(job):
+    users = User.objects.all()
+    set_total(job, users.count())
+    for pks in pk_chunks(users):
+        with transaction.atomic():
+            processed = recount_user_stats(
+                User, Review, Comment, user_ids=pks
+            )
+        advance(job, processed)
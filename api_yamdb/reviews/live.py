@@ -0,0 +1,350 @@
+"""Лента новых отзывов и комментариев произведения (Server-Sent Events).
+
+Подписчики живут в ASGI-процессе (см. api_yamdb.asgi): у каждого своя
+ограниченная очередь asyncio, соединение без событий не занимает ни
+потока, ни запроса к базе. События доставляет бэкенд из настройки
+LIVE_FEED_BACKEND: LocalBackend раздаёт их внутри процесса, а
+PostgresBackend передаёт через LISTEN/NOTIFY, чтобы отзывы, записанные
+воркерами gunicorn, доходили до подписчиков ASGI-процесса. Другой
+транспорт (например, Redis) подключается классом с теми же методами
+publish и start.
+
+Идентификатор события строится из даты публикации и первичного ключа,
+поэтому он одинаков во всех процессах и по заголовку Last-Event-ID можно
+продолжить ленту после переподключения: из истории процесса или, если
+она не покрывает пропуск, из базы.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import OrderedDict, defaultdict, deque, namedtuple
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .models import Comment, Review
+
+logger = logging.getLogger(__name__)
+
+REVIEW = 'review'
+COMMENT = 'comment'
+# NOTIFY принимает не больше 8000 байт, длинный текст обрезается.
+NOTIFY_MAX_SIZE = 7900
+
+
+class Event(namedtuple('Event', 'key title_id kind data')):
+    """key — (микросекунды даты публикации, тип, pk), задаёт порядок."""
+
+    __slots__ = ()
+
+    @property
+    def id(self):
+        return '{}-{}-{}'.format(*self.key)
+
+    def to_json(self):
+        return json.dumps(self.data, cls=DjangoJSONEncoder,
+                          ensure_ascii=False)
+
+    def to_notify(self):
+        # В JSON дата публикации округляется до миллисекунд, поэтому
+        # ключ передаётся отдельно.
+        return dict(self.data, event_id=self.id)
+
+    @classmethod
+    def from_notify(cls, payload):
+        data = json.loads(payload)
+        key = parse_event_id(data.pop('event_id'))
+        if key is None:
+            raise ValueError(payload)
+        return cls(key, data['title_id'], key[1], data)
+
+    @classmethod
+    def create(cls, kind, data):
+        return cls(
+            (parse_timestamp(data['pub_date']), kind, data['id']),
+            data['title_id'], kind, data,
+        )
+
+
+def parse_timestamp(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    return int(value.timestamp() * 1000000)
+
+
+def parse_event_id(value):
+    """Ключ события из Last-Event-ID или None, если он некорректен."""
+    try:
+        timestamp, kind, pk = (value or '').split('-')
+        key = (int(timestamp), kind, int(pk))
+    except ValueError:
+        return None
+    return key if kind in (REVIEW, COMMENT) else None
+
+
+def review_event(review):
+    return Event.create(REVIEW, {
+        'id': review.pk,
+        'title_id': review.title_id,
+        'text': review.text,
+        'author': review.author.username,
+        'score': review.score,
+        'pub_date': review.pub_date,
+    })
+
+
+def comment_event(comment):
+    return Event.create(COMMENT, {
+        'id': comment.pk,
+        'title_id': comment.review.title_id,
+        'review_id': comment.review_id,
+        'text': comment.text,
+        'author': comment.author.username,
+        'pub_date': comment.pub_date,
+    })
+
+
+def events_since(title_id, key, limit):
+    """События произведения после key из базы, не больше limit."""
+    since = datetime.fromtimestamp(key[0] / 1000000, tz=timezone.utc)
+    reviews = Review.objects.filter(
+        title_id=title_id, pub_date__gte=since
+    ).select_related('author').order_by('pub_date', 'pk')[:limit]
+    comments = Comment.objects.filter(
+        review__title_id=title_id, pub_date__gte=since
+    ).select_related('author', 'review').order_by('pub_date', 'pk')[:limit]
+    events = [review_event(review) for review in reviews]
+    events += [comment_event(comment) for comment in comments]
+    return sorted(
+        (event for event in events if event.key > key),
+        key=lambda event: event.key,
+    )[:limit]
+
+
+class SentEvents:
+    """Ключи последних отправленных клиенту событий.
+
+    Повторы отсекаются по множеству ключей, а не сравнением с последним
+    отправленным: NOTIFY из разных процессов приходят не по порядку, и
+    опоздавшее событие с меньшим ключом клиент тоже должен получить.
+    """
+
+    def __init__(self, size):
+        self.keys = set()
+        self.order = deque()
+        self.size = size
+
+    def add(self, key):
+        """Запоминает ключ; False, если событие уже отправлялось."""
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        self.order.append(key)
+        if len(self.order) > self.size:
+            self.keys.discard(self.order.popleft())
+        return True
+
+
+class Subscription:
+    def __init__(self, title_id, queue_size):
+        self.title_id = title_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def push(self, event):
+        # Медленный клиент не задерживает остальных: при переполнении
+        # очереди его соединение закрывается, а пропущенное он получит
+        # после переподключения по Last-Event-ID.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broker:
+    """Раздача событий подписчикам в цикле событий ASGI-процесса."""
+
+    def __init__(self, history_size, history_titles, queue_size,
+                 max_subscribers):
+        self.loop = None
+        self.subscribers = defaultdict(set)
+        self.count = 0
+        # История хранится для history_titles последних произведений с
+        # событиями или подписчиками; для вытесненных пропуск дочитывается
+        # из базы.
+        self.history = OrderedDict()
+        self.history_size = history_size
+        self.history_titles = history_titles
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+
+    def attach(self, loop):
+        self.loop = loop
+
+    def publish(self, event):
+        """Потокобезопасная точка входа для бэкендов."""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.dispatch, event)
+
+    def touch(self, title_id):
+        history = self.history.get(title_id)
+        if history is None:
+            history = self.history[title_id] = deque(maxlen=self.history_size)
+            while len(self.history) > self.history_titles:
+                self.history.popitem(last=False)
+        else:
+            self.history.move_to_end(title_id)
+        return history
+
+    def dispatch(self, event):
+        history = self.touch(event.title_id)
+        if history and history[-1].key >= event.key:
+            # NOTIFY может прийти позже события с большей датой.
+            if any(item.key == event.key for item in history):
+                return
+            history.append(event)
+            ordered = sorted(history, key=lambda item: item.key)
+            history.clear()
+            history.extend(ordered)
+        else:
+            history.append(event)
+        for subscription in self.subscribers.get(event.title_id, ()):
+            subscription.push(event)
+
+    def subscribe(self, title_id):
+        if self.count >= self.max_subscribers:
+            return None
+        subscription = Subscription(title_id, self.queue_size)
+        self.subscribers[title_id].add(subscription)
+        self.touch(title_id)
+        self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self.subscribers.get(subscription.title_id)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        self.count -= 1
+        if not subscribers:
+            del self.subscribers[subscription.title_id]
+
+    def replay(self, title_id, key):
+        """События после key из истории или None, если история их не
+        покрывает и нужно читать базу."""
+        history = self.history.get(title_id)
+        if not history or history[0].key > key:
+            return None
+        return [event for event in history if event.key > key]
+
+
+class LocalBackend:
+    """События доходят только до подписчиков этого же процесса."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, event):
+        transaction.on_commit(lambda: self.broker.publish(event))
+
+    def start(self):
+        pass
+
+
+class PostgresBackend:
+    """События передаются между процессами через LISTEN/NOTIFY.
+
+    NOTIFY выполняется в транзакции записи и доставляется только после
+    её фиксации. Слушает канал отдельный поток со своим соединением.
+    """
+
+    channel = 'yamdb_live_feed'
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.listener = None
+
+    def publish(self, event):
+        data = event.to_notify()
+        payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+        excess = len(payload.encode()) - NOTIFY_MAX_SIZE
+        if excess > 0:
+            text = data['text'].encode()[:-excess - 3]
+            data['text'] = text.decode(errors='ignore') + '...'
+            payload = json.dumps(
+                data, cls=DjangoJSONEncoder, ensure_ascii=False
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def start(self):
+        if self.listener is None:
+            self.listener = threading.Thread(target=self.listen, daemon=True)
+            self.listener.start()
+
+    def listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                params = connection.get_connection_params()
+                listener = psycopg2.connect(**params)
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute('LISTEN {}'.format(self.channel))
+                self.receive(listener)
+            except psycopg2.Error:
+                logger.exception('Соединение ленты с Postgres прервано')
+                threading.Event().wait(5)
+
+    def receive(self, listener):
+        while True:
+            if select.select([listener], [], [], 60) == ([], [], []):
+                continue
+            listener.poll()
+            while listener.notifies:
+                notify = listener.notifies.pop(0)
+                try:
+                    event = Event.from_notify(notify.payload)
+                except (KeyError, ValueError):
+                    logger.warning('Некорректное событие ленты: %s',
+                                   notify.payload)
+                    continue
+                self.broker.publish(event)
+
+
+broker = Broker(
+    settings.LIVE_FEED_HISTORY_SIZE,
+    settings.LIVE_FEED_HISTORY_TITLES,
+    settings.LIVE_FEED_QUEUE_SIZE,
+    settings.LIVE_FEED_MAX_SUBSCRIBERS,
+)
+_backends = []
+
+
+def get_backend():
+    if not _backends:
+        _backends.append(import_string(settings.LIVE_FEED_BACKEND)(broker))
+    return _backends[0]
+
+
+def start(loop):
+    """Подключает ленту к циклу событий ASGI-процесса."""
+    if broker.loop is None:
+        broker.attach(loop)
+        get_backend().start()
+
+
+def publish_review(review):
+    get_backend().publish(review_event(review))
+
+
+def publish_comment(comment):
+    get_backend().publish(comment_event(comment))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.aggregates import apply_pending_events, rebuild_title_aggregates
+from reviews.models import Review, Title, TitleAggregateEvent
+
+
+class Command(BaseCommand):
+    help = 'Применяет отложенные изменения рейтингов и счётчиков произведений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько событий сворачивать за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, опрашивая очередь.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между опросами пустой очереди, в секундах.',
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать агрегаты всех произведений с нуля.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            updated = rebuild_title_aggregates(
+                Title, Review, TitleAggregateEvent
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Агрегаты пересчитаны для произведений: {updated}.'
+            ))
+            return
+        while True:
+            processed, titles = apply_pending_events(options['batch_size'])
+            if processed:
+                self.stdout.write(
+                    f'Событий: {processed}, произведений: {titles}.'
+                )
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.dedup import backfill
+from reviews.models import Comment, Review, TextSignature
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит сигнатуры опубликованных отзывов и комментариев для поиска '
+        'повторов и помечает найденные повторы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько текстов проверять за один запрос.',
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Удалить сохранённые сигнатуры и построить их заново.',
+        )
+
+    def handle(self, *args, **options):
+        for model, kind in ((Review, TextSignature.REVIEW),
+                            (Comment, TextSignature.COMMENT)):
+            start = time.perf_counter()
+            checked, duplicates = backfill(
+                model, kind, options['batch_size'], options['rebuild']
+            )
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: проверено {checked}, '
+                f'повторов {duplicates}, {time.perf_counter() - start:.1f} с.'
+            )
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассчитывает похожие произведения по оценкам общих рецензентов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все произведения, а не только изменившиеся.',
+        )
+        parser.add_argument(
+            '--block-size', type=int, default=similarity.BLOCK_SIZE,
+            help='Сколько произведений рассчитывать за один проход.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, пересчитывая с заданным интервалом.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=3600,
+            help='Пауза между пересчётами, в секундах.',
+        )
+        parser.add_argument(
+            '--full-interval', type=float, default=86400,
+            help='Как часто в режиме --loop пересчитывать все произведения, '
+                 'в секундах.',
+        )
+
+    def handle(self, *args, **options):
+        if similarity.np is None:
+            raise CommandError(
+                'Для расчёта нужны пакеты numpy и scipy.'
+            )
+        full = options['full']
+        last_full = time.monotonic()
+        while True:
+            start = time.perf_counter()
+            updated = similarity.build_title_similarity(
+                full=full, block_size=options['block_size']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересчитано произведений: {updated} '
+                f'за {time.perf_counter() - start:.1f} с.'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+            full = (
+                time.monotonic() - last_full >= options['full_interval']
+            )
+            if full:
+                last_full = time.monotonic()
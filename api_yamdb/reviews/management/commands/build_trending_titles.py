@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.trending import build_trending, compact_activity
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает популярные произведения для всех окон.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, пересчитывая с заданным интервалом.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300,
+            help='Пауза между пересчётами, в секундах.',
+        )
+        parser.add_argument(
+            '--compact', action='store_true',
+            help='Перед пересчётом свернуть старые интервалы активности.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options['compact']:
+                compact_activity()
+            start = time.perf_counter()
+            build_trending()
+            self.stdout.write(
+                f'Популярные произведения пересчитаны '
+                f'за {time.perf_counter() - start:.1f} с.'
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
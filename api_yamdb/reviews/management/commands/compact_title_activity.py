@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from reviews.trending import compact_activity
+
+
+class Command(BaseCommand):
+    help = 'Сворачивает старые часовые интервалы активности в суточные.'
+
+    def handle(self, *args, **options):
+        compacted, expired = compact_activity()
+        self.stdout.write(
+            f'Свёрнуто интервалов: {compacted}, удалено: {expired}.'
+        )
@@ -0,0 +1,123 @@
+import argparse
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reviews import partitions
+from reviews.jobs import enqueue
+from reviews.models import Job
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'месяц должен быть в формате ГГГГ-ММ: {value}'
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт секции отзывов и комментариев на следующие месяцы и '
+        'выгружает в архив секции старых месяцев.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enable', action='store_true',
+            help='Секционировать таблицы отзывов и комментариев, если они '
+                 'ещё не секционированы.',
+        )
+        parser.add_argument(
+            '--months-ahead', type=int,
+            default=settings.PARTITION_PREMAKE_MONTHS,
+            help='На сколько месяцев вперёд создавать секции.',
+        )
+        parser.add_argument(
+            '--retention-months', type=int,
+            default=settings.PARTITION_RETENTION_MONTHS,
+            help='Выгрузить секции месяцев старше этого числа месяцев.',
+        )
+        parser.add_argument(
+            '--archive-before', type=parse_month,
+            help='Выгрузить секции месяцев раньше указанного (ГГГГ-ММ).',
+        )
+        parser.add_argument(
+            '--archive-dir', default=settings.PARTITION_ARCHIVE_DIR,
+            help='Каталог для сжатых CSV-файлов выгруженных секций.',
+        )
+        parser.add_argument(
+            '--detach-only', action='store_true',
+            help='Только отсоединить старые секции, оставив их в базе.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, проверяя секции с заданным интервалом.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=24 * 60 * 60,
+            help='Пауза между проверками, в секундах.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование доступно только в Postgres.')
+        if options['enable']:
+            # Таблицы перестраиваются одной транзакцией и на это время
+            # блокируются; история миграций не меняется.
+            with transaction.atomic():
+                partitions.partition_tables(connection)
+        with connection.cursor() as cursor:
+            if not partitions.is_partitioned(cursor, partitions.REVIEW_TABLE):
+                raise CommandError(
+                    'Таблицы отзывов и комментариев не секционированы: '
+                    'запустите команду с --enable.'
+                )
+        while True:
+            with connection.cursor() as cursor:
+                self.run(cursor, options)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def run(self, cursor, options):
+        for name in partitions.ensure_partitions(
+            cursor, options['months_ahead']
+        ):
+            self.stdout.write(f'Создана секция {name}.')
+        before = options['archive_before']
+        if before is None and options['retention_months'] is not None:
+            before = partitions.add_months(
+                partitions.month_start(datetime.now(timezone.utc)),
+                -options['retention_months'],
+            )
+        if before is None:
+            return
+        if options['detach_only']:
+            archive_dir = None
+            months = sorted(
+                month for month in partitions.partitions(
+                    cursor, partitions.REVIEW_TABLE
+                ) if month < before
+            )
+        else:
+            archive_dir = options['archive_dir']
+            months = partitions.months_to_archive(cursor, before)
+        for month in months:
+            files = partitions.archive_month(cursor, month, archive_dir)
+            if files:
+                self.stdout.write(
+                    f'{month:%Y-%m} выгружен: ' + ', '.join(files)
+                )
+            else:
+                self.stdout.write(f'{month:%Y-%m} отсоединён.')
+        if months:
+            # Отзывы архивных месяцев больше не должны учитываться в
+            # рейтингах и счётчиках пользователей.
+            enqueue(Job.REBUILD_TITLE_AGGREGATES)
+            enqueue(Job.RECOUNT_USER_STATS)
+            self.stdout.write('Поставлен пересчёт рейтингов и счётчиков.')
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.codes import purge_codes
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие и использованные коды подтверждения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько кодов удалять за один запрос.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, очищая коды с заданным интервалом.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=3600,
+            help='Пауза между очистками, в секундах.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = purge_codes(options['batch_size'])
+            self.stdout.write(f'Удалено кодов: {deleted}.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
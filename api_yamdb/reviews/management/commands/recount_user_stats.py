@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews.models import Comment, Review, User
+from reviews.stats import recount_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики активности пользователей.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = recount_user_stats(User, Review, Comment)
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны для пользователей: {updated}.'
+        ))
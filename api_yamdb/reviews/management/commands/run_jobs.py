@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.jobs import claim_next, run
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, опрашивая очередь.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между опросами пустой очереди, в секундах.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next()
+            if job is not None:
+                run(job)
+                self.stdout.write(
+                    f'{job}: {job.get_status_display().lower()}.'
+                )
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
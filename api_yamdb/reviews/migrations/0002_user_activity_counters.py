@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:50
+
+from django.db import migrations, models
+
+from reviews.stats import recount_user_stats
+
+
+def fill_user_stats(apps, schema_editor):
+    recount_user_stats(
+        apps.get_model('reviews', 'User'),
+        apps.get_model('reviews', 'Review'),
+        apps.get_model('reviews', 'Comment'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма выставленных оценок'),
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
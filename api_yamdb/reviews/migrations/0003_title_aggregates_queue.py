@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:52
+
+from django.db import migrations, models
+
+from reviews.aggregates import rebuild_title_aggregates
+
+
+def fill_title_aggregates(apps, schema_editor):
+    rebuild_title_aggregates(
+        apps.get_model('reviews', 'Title'),
+        apps.get_model('reviews', 'Review'),
+        apps.get_model('reviews', 'TitleAggregateEvent'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_user_activity_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleAggregateEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title_id', models.PositiveIntegerField(db_index=True, verbose_name='Произведение')),
+                ('reviews_delta', models.SmallIntegerField(default=0, verbose_name='Изменение количества отзывов')),
+                ('score_delta', models.SmallIntegerField(default=0, verbose_name='Изменение суммы оценок')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата события')),
+            ],
+            options={
+                'verbose_name': 'Событие агрегатов произведения',
+                'verbose_name_plural': 'События агрегатов произведений',
+                'ordering': ['pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_title_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from reviews.codes import expiry_time, hash_code
+
+
+def hash_existing_codes(apps, schema_editor):
+    """Переносит выданные коды в новую таблицу, ограничивая их срок."""
+    User = apps.get_model('reviews', 'User')
+    ConfirmationCode = apps.get_model('reviews', 'ConfirmationCode')
+    expires_at = expiry_time()
+    users = User.objects.filter(
+        confirmation_code__isnull=False
+    ).values_list('pk', 'username', 'confirmation_code')
+    ConfirmationCode.objects.bulk_create(
+        (
+            ConfirmationCode(
+                user_id=pk,
+                code_hash=hash_code(username, code),
+                expires_at=expires_at,
+            )
+            for pk, username, code in users.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfirmationCode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code_hash', models.CharField(max_length=64, unique=True, verbose_name='Хеш кода')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('used_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата использования')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='confirmation_codes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Код подтверждения',
+                'verbose_name_plural': 'Коды подтверждения',
+            },
+        ),
+        migrations.RunPython(
+            hash_existing_codes, migrations.RunPython.noop
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='confirmation_code',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_confirmation_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleSimilarityState',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='reviews.Title', verbose_name='Произведение')),
+                ('reviews_count', models.PositiveIntegerField(verbose_name='Количество отзывов')),
+                ('checksum', models.BigIntegerField(verbose_name='Контрольная сумма')),
+                ('built', models.DateTimeField(auto_now=True, verbose_name='Дата расчёта')),
+            ],
+            options={
+                'verbose_name': 'Состояние расчёта похожих произведений',
+                'verbose_name_plural': 'Состояния расчёта похожих произведений',
+            },
+        ),
+        migrations.CreateModel(
+            name='TitleSimilarity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('common_reviewers', models.PositiveIntegerField(verbose_name='Общих рецензентов')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.Title', verbose_name='Похожее произведение')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='reviews.Title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Похожее произведение',
+                'verbose_name_plural': 'Похожие произведения',
+                'ordering': ['title', '-score'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='titlesimilarity',
+            index=models.Index(fields=['title', '-score'], name='reviews_tit_title_i_74efc2_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:08
+
+from django.db import migrations, models
+
+# Сортировка по рейтингу ставит произведения без оценок в конец (NULLS
+# LAST), а такие индексы Django 2.2 описать в Meta.indexes не умеет.
+# SQLite не поддерживает NULLS LAST, Django эмулирует его выражением
+# rating IS NULL, и индекс строится по тому же выражению.
+RATING_INDEXES = {
+    'postgresql': (
+        'CREATE INDEX title_rating_asc_idx ON reviews_title '
+        '(rating ASC NULLS LAST, id ASC)',
+        'CREATE INDEX title_rating_desc_idx ON reviews_title '
+        '(rating DESC NULLS LAST, id DESC)',
+    ),
+    'sqlite': (
+        'CREATE INDEX title_rating_asc_idx ON reviews_title '
+        '(rating IS NULL, rating ASC, id ASC)',
+        'CREATE INDEX title_rating_desc_idx ON reviews_title '
+        '(rating IS NULL, rating DESC, id DESC)',
+    ),
+}
+
+
+def create_rating_indexes(apps, schema_editor):
+    for sql in RATING_INDEXES.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def drop_rating_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in RATING_INDEXES:
+        for name in ('title_rating_asc_idx', 'title_rating_desc_idx'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_title_similarity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['year', 'id'], name='title_year_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['reviews_count', 'id'], name='title_reviews_count_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['name', 'id'], name='title_name_id_idx'),
+        ),
+        migrations.RunPython(create_rating_indexes, drop_rating_indexes),
+    ]
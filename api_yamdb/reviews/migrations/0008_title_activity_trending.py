@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_title_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleActivityBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title_id', models.PositiveIntegerField(verbose_name='Произведение')),
+                ('start', models.DateTimeField(verbose_name='Начало интервала')),
+                ('span', models.PositiveIntegerField(default=3600, verbose_name='Длина интервала, с')),
+                ('reviews_count', models.IntegerField(default=0, verbose_name='Количество отзывов')),
+                ('score_sum', models.IntegerField(default=0, verbose_name='Сумма оценок')),
+            ],
+            options={
+                'verbose_name': 'Активность произведения',
+                'verbose_name_plural': 'Активность произведений',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingTitle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=8, verbose_name='Окно')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Популярность')),
+                ('reviews', models.FloatField(verbose_name='Взвешенное число отзывов')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.Title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Популярное произведение',
+                'verbose_name_plural': 'Популярные произведения',
+                'ordering': ['window', 'rank'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='titleactivitybucket',
+            index=models.Index(fields=['span', 'start'], name='activity_span_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='titleactivitybucket',
+            constraint=models.UniqueConstraint(fields=('start', 'span', 'title_id'), name='unique_activity_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendingtitle',
+            constraint=models.UniqueConstraint(fields=('window', 'rank'), name='unique_trending_rank'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:40
+
+from django.conf import settings
+from django.db import migrations
+
+from reviews.partitions import partition_tables, unpartition_tables
+
+# Секционирование меняет только схему в Postgres, состояние моделей не
+# меняется. На уже мигрированной базе его включает команда
+# manage_review_partitions --enable без отката миграций; откат этой
+# миграции возвращает обычные таблицы.
+
+
+def partition(apps, schema_editor):
+    if (schema_editor.connection.vendor == 'postgresql'
+            and settings.REVIEW_PARTITIONING):
+        partition_tables(schema_editor.connection)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        unpartition_tables(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_title_activity_trending'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_review_partitioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextBand',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True, verbose_name='Хеш полосы')),
+                ('kind', models.CharField(choices=[('review', 'Отзыв'), ('comment', 'Комментарий')], max_length=10, verbose_name='Тип текста')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор')),
+            ],
+            options={
+                'verbose_name': 'Полоса сигнатуры текста',
+                'verbose_name_plural': 'Полосы сигнатур текстов',
+            },
+        ),
+        migrations.CreateModel(
+            name='TextSignature',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('review', 'Отзыв'), ('comment', 'Комментарий')], max_length=10, verbose_name='Тип текста')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор')),
+                ('signature', models.BinaryField(verbose_name='Сигнатура')),
+                ('duplicate_kind', models.CharField(blank=True, choices=[('review', 'Отзыв'), ('comment', 'Комментарий')], max_length=10, verbose_name='Тип повторяемого текста')),
+                ('duplicate_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Повторяет объект')),
+                ('similarity', models.FloatField(blank=True, null=True, verbose_name='Сходство')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата проверки')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура текста',
+                'verbose_name_plural': 'Сигнатуры текстов',
+                'ordering': ['-pk'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='textsignature',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_text_signature'),
+        ),
+        migrations.AddIndex(
+            model_name='textband',
+            index=models.Index(fields=['kind', 'object_id'], name='text_band_object_idx'),
+        ),
+    ]
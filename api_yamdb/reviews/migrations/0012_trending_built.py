@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trendingtitle',
+            name='built',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата расчёта'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_trending_built'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('delete_title', 'Удаление произведения'), ('delete_user', 'Удаление пользователя'), ('rebuild_title_aggregates', 'Пересчёт рейтингов'), ('recount_user_stats', 'Пересчёт счётчиков пользователей')], max_length=50, verbose_name='Тип задачи'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_job_recount_user_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='titleaggregateevent',
+            name='review_date',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата отзыва'),
+        ),
+    ]
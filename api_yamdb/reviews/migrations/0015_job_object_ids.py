@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0014_title_aggregate_event_review_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='object_ids',
+            field=models.TextField(blank=True, verbose_name='Идентификаторы объектов'),
+        ),
+    ]
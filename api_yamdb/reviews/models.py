@@ -1,9 +1,8 @@
-import uuid
-
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 from .validators import year_validator
 
@@ -38,11 +37,19 @@ class User(AbstractUser):
         default=USER,
         blank=False,
     )
-    confirmation_code = models.TextField(
-        verbose_name='Код подтверждения',
-        max_length=100,
-        default=uuid.uuid4,
-        null=True,
+    reviews_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+        default=0,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    score_sum = models.PositiveIntegerField(
+        verbose_name='Сумма выставленных оценок',
+        default=0,
         editable=False,
     )
 
@@ -62,6 +69,12 @@ class User(AbstractUser):
     def is_moderator(self):
         return self.role == settings.MODERATOR_ROLE
 
+    @property
+    def average_score(self):
+        if not self.reviews_count:
+            return None
+        return round(self.score_sum / self.reviews_count, 2)
+
 
 class Category(models.Model):
     name = models.CharField(
@@ -127,10 +140,37 @@ class Title(models.Model):
         blank=True,
         null=True,
     )
+    reviews_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+        default=0,
+        editable=False,
+    )
+    score_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+        editable=False,
+    )
+    rating = models.PositiveSmallIntegerField(
+        verbose_name='Рейтинг',
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
+        # Индексы под ?ordering= (см. StableOrderingFilter). Индексы по
+        # рейтингу с пустыми значениями в конце создаются миграцией
+        # 0007, так как зависят от СУБД.
+        indexes = [
+            models.Index(fields=['year', 'id'], name='title_year_id_idx'),
+            models.Index(
+                fields=['reviews_count', 'id'],
+                name='title_reviews_count_id_idx',
+            ),
+            models.Index(fields=['name', 'id'], name='title_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -160,6 +200,8 @@ class Review(models.Model):
         auto_now_add=True,
     )
 
+    loaded_score = None
+
     class Meta:
         ordering = ['pub_date']
         verbose_name = 'Отзыв'
@@ -172,6 +214,18 @@ class Review(models.Model):
     def __str__(self):
         return self.text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Оценка на момент загрузки нужна сигналам, чтобы учесть разницу
+        # при изменении отзыва без повторного запроса к базе.
+        instance.loaded_score = instance.__dict__.get('score')
+        return instance
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     review = models.ForeignKey(
@@ -195,3 +249,389 @@ class Comment(models.Model):
 
     def __str__(self):
         return self.text
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class TitleAggregateEvent(models.Model):
+    title_id = models.PositiveIntegerField(
+        verbose_name='Произведение',
+        db_index=True,
+    )
+    reviews_delta = models.SmallIntegerField(
+        verbose_name='Изменение количества отзывов',
+        default=0,
+    )
+    score_delta = models.SmallIntegerField(
+        verbose_name='Изменение суммы оценок',
+        default=0,
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата события',
+        auto_now_add=True,
+        db_index=True,
+    )
+    # Интервал активности для популярных произведений выбирается по дате
+    # отзыва: удаление или правка старого отзыва не меняет текущий час.
+    review_date = models.DateTimeField(
+        verbose_name='Дата отзыва',
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = 'Событие агрегатов произведения'
+        verbose_name_plural = 'События агрегатов произведений'
+
+    def __str__(self):
+        return (f'{self.title_id}: '
+                f'{self.reviews_delta:+} / {self.score_delta:+}')
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершена'),
+        (FAILED, 'Ошибка'),
+    ]
+    DELETE_TITLE = 'delete_title'
+    DELETE_USER = 'delete_user'
+    REBUILD_TITLE_AGGREGATES = 'rebuild_title_aggregates'
+    RECOUNT_USER_STATS = 'recount_user_stats'
+    KIND_CHOICES = [
+        (DELETE_TITLE, 'Удаление произведения'),
+        (DELETE_USER, 'Удаление пользователя'),
+        (REBUILD_TITLE_AGGREGATES, 'Пересчёт рейтингов'),
+        (RECOUNT_USER_STATS, 'Пересчёт счётчиков пользователей'),
+    ]
+
+    kind = models.CharField(
+        verbose_name='Тип задачи',
+        max_length=50,
+        choices=KIND_CHOICES,
+    )
+    object_id = models.PositiveIntegerField(
+        verbose_name='Идентификатор объекта',
+        blank=True,
+        null=True,
+    )
+    # Идентификаторы через запятую для задач над набором объектов.
+    object_ids = models.TextField(
+        verbose_name='Идентификаторы объектов',
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+    )
+    total = models.PositiveIntegerField(
+        verbose_name='Всего объектов',
+        default=0,
+    )
+    processed = models.PositiveIntegerField(
+        verbose_name='Обработано объектов',
+        default=0,
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+        blank=True,
+    )
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, related_name='jobs',
+        verbose_name='Автор задачи',
+        blank=True,
+        null=True,
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+    started = models.DateTimeField(
+        verbose_name='Дата запуска',
+        blank=True,
+        null=True,
+    )
+    finished = models.DateTimeField(
+        verbose_name='Дата завершения',
+        blank=True,
+        null=True,
+    )
+    heartbeat = models.DateTimeField(
+        verbose_name='Последний отклик воркера',
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.pk}'
+
+    @property
+    def progress(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(99, self.processed * 100 // self.total)
+
+
+class ConfirmationCode(models.Model):
+    """Одноразовый код подтверждения; в базе хранится только его HMAC."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='confirmation_codes',
+    )
+    code_hash = models.CharField(
+        verbose_name='Хеш кода',
+        max_length=64,
+        unique=True,
+    )
+    expires_at = models.DateTimeField(
+        verbose_name='Действует до',
+        db_index=True,
+    )
+    used_at = models.DateTimeField(
+        verbose_name='Дата использования',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Код подтверждения'
+        verbose_name_plural = 'Коды подтверждения'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.expires_at:%Y-%m-%d %H:%M}'
+
+
+class TitleSimilarity(models.Model):
+    """Соседи произведения по оценкам общих рецензентов.
+
+    Таблица заполняется командой build_title_similarity и хранит не
+    больше SIMILAR_TITLES_COUNT соседей на произведение.
+    """
+
+    title = models.ForeignKey(
+        Title,
+        verbose_name='Произведение',
+        on_delete=models.CASCADE,
+        related_name='similarities',
+    )
+    similar = models.ForeignKey(
+        Title,
+        verbose_name='Похожее произведение',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    common_reviewers = models.PositiveIntegerField(
+        verbose_name='Общих рецензентов',
+    )
+
+    class Meta:
+        ordering = ['title', '-score']
+        verbose_name = 'Похожее произведение'
+        verbose_name_plural = 'Похожие произведения'
+        indexes = [models.Index(fields=['title', '-score'])]
+
+    def __str__(self):
+        return f'{self.title_id} ~ {self.similar_id}: {self.score:.3f}'
+
+
+class TitleSimilarityState(models.Model):
+    """Отпечаток отзывов произведения на момент расчёта соседей.
+
+    По расхождению отпечатка инкрементальный расчёт находит
+    произведения, отзывы которых изменились.
+    """
+
+    title = models.OneToOneField(
+        Title,
+        verbose_name='Произведение',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    reviews_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+    )
+    checksum = models.BigIntegerField(verbose_name='Контрольная сумма')
+    built = models.DateTimeField(verbose_name='Дата расчёта', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Состояние расчёта похожих произведений'
+        verbose_name_plural = 'Состояния расчёта похожих произведений'
+
+    def __str__(self):
+        return f'{self.title_id}: {self.built:%Y-%m-%d %H:%M}'
+
+
+class TitleActivityBucket(models.Model):
+    """Отзывы на произведение за интервал времени.
+
+    Свежие интервалы часовые, старые сворачиваются в суточные командой
+    compact_title_activity. Как и в очереди агрегатов, произведение
+    хранится числом, чтобы запись не зависела от удаления произведения.
+    """
+    HOUR = 60 * 60
+    DAY = 24 * HOUR
+
+    title_id = models.PositiveIntegerField(verbose_name='Произведение')
+    start = models.DateTimeField(verbose_name='Начало интервала')
+    span = models.PositiveIntegerField(
+        verbose_name='Длина интервала, с',
+        default=HOUR,
+    )
+    reviews_count = models.IntegerField(
+        verbose_name='Количество отзывов',
+        default=0,
+    )
+    score_sum = models.IntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Активность произведения'
+        verbose_name_plural = 'Активность произведений'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['start', 'span', 'title_id'],
+                name='unique_activity_bucket',
+            )
+        ]
+        indexes = [
+            models.Index(fields=['span', 'start'], name='activity_span_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.title_id}: {self.start:%Y-%m-%d %H:%M}'
+
+
+class TrendingTitle(models.Model):
+    """Предрассчитанный рейтинг популярных произведений за окно."""
+
+    window = models.CharField(verbose_name='Окно', max_length=8)
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+    title = models.ForeignKey(
+        Title,
+        verbose_name='Произведение',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField(verbose_name='Популярность')
+    reviews = models.FloatField(verbose_name='Взвешенное число отзывов')
+    built = models.DateTimeField(
+        verbose_name='Дата расчёта',
+        default=timezone.now,
+    )
+
+    class Meta:
+        ordering = ['window', 'rank']
+        verbose_name = 'Популярное произведение'
+        verbose_name_plural = 'Популярные произведения'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['window', 'rank'], name='unique_trending_rank'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.window} #{self.rank}: {self.title_id}'
+
+
+class TextSignature(models.Model):
+    """MinHash-сигнатура текста отзыва или комментария.
+
+    Если при публикации нашёлся почти такой же текст, он записывается в
+    duplicate_kind и duplicate_id. Объект хранится типом и числом, чтобы
+    одна таблица обслуживала отзывы и комментарии.
+    """
+    REVIEW = 'review'
+    COMMENT = 'comment'
+    KIND_CHOICES = [
+        (REVIEW, 'Отзыв'),
+        (COMMENT, 'Комментарий'),
+    ]
+
+    kind = models.CharField(
+        verbose_name='Тип текста',
+        max_length=10,
+        choices=KIND_CHOICES,
+    )
+    object_id = models.PositiveIntegerField(verbose_name='Идентификатор')
+    signature = models.BinaryField(verbose_name='Сигнатура')
+    duplicate_kind = models.CharField(
+        verbose_name='Тип повторяемого текста',
+        max_length=10,
+        choices=KIND_CHOICES,
+        blank=True,
+    )
+    duplicate_id = models.PositiveIntegerField(
+        verbose_name='Повторяет объект',
+        blank=True,
+        null=True,
+    )
+    similarity = models.FloatField(
+        verbose_name='Сходство',
+        blank=True,
+        null=True,
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата проверки',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ['-pk']
+        verbose_name = 'Сигнатура текста'
+        verbose_name_plural = 'Сигнатуры текстов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='unique_text_signature'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class TextBand(models.Model):
+    """Корзина LSH: хеш одной полосы сигнатуры текста."""
+
+    key = models.BigIntegerField(verbose_name='Хеш полосы', db_index=True)
+    kind = models.CharField(
+        verbose_name='Тип текста',
+        max_length=10,
+        choices=TextSignature.KIND_CHOICES,
+    )
+    object_id = models.PositiveIntegerField(verbose_name='Идентификатор')
+
+    class Meta:
+        verbose_name = 'Полоса сигнатуры текста'
+        verbose_name_plural = 'Полосы сигнатур текстов'
+        indexes = [
+            models.Index(fields=['kind', 'object_id'],
+                         name='text_band_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.key}'
@@ -0,0 +1,126 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """Оценка числа строк по статистике планировщика Postgres.
+
+    Для запроса без условий берётся reltuples таблицы, у секционированной
+    таблицы — сумма reltuples её секций, для запроса с фильтрами — оценка
+    из EXPLAIN. На других СУБД возвращает None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    if not queryset.query.where:
+        # У секционированной таблицы своей статистики нет (reltuples 0
+        # или -1), и у ещё не проанализированной секции reltuples -1.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN parent.relkind = 'p' THEN ("
+                'SELECT COALESCE(SUM(GREATEST(child.reltuples, 0)), 0) '
+                'FROM pg_inherits '
+                'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                'WHERE pg_inherits.inhparent = parent.oid'
+                ') ELSE parent.reltuples END::bigint '
+                'FROM pg_class parent WHERE parent.oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return max(row[0], 0) if row else None
+    # QuerySet.explain() в Django 2.2 отдаёт repr разобранного плана, а
+    # не JSON, поэтому EXPLAIN выполняется напрямую.
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_cache_key(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(
+        repr((queryset.db, sql, params)).encode()
+    ).hexdigest()
+    return f'count:{digest}'
+
+
+def bounded_count(queryset, limit=None, estimate=None):
+    """Точное число строк, если их не больше limit, иначе оценка.
+
+    Точный подсчёт ограничен limit + 1 строкой, поэтому на больших
+    таблицах не сканирует их целиком. Оценку даёт estimate (например,
+    поддерживаемый счётчик), иначе статистика Postgres, а если её нет —
+    подсчёт без ограничения. Оценка кешируется на COUNT_CACHE_TTL секунд,
+    и следующие страницы того же списка не считают строки вовсе.
+    """
+    if limit is None:
+        limit = settings.EXACT_COUNT_LIMIT
+    try:
+        key = count_cache_key(queryset)
+    except EmptyResultSet:
+        return 0
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    count = queryset.order_by()[:limit + 1].count()
+    if count <= limit:
+        return count
+    value = estimate() if estimate is not None else None
+    if value is None:
+        value = estimated_count(queryset)
+    if value is None:
+        value = queryset.count()
+    value = max(value, count)
+    cache.set(key, value, settings.COUNT_CACHE_TTL)
+    return value
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который не делает COUNT(*) по всей большой таблице."""
+
+    def __init__(self, *args, estimate=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return len(self.object_list)
+        return bounded_count(self.object_list, estimate=self.estimate)
+
+    def validate_number(self, number):
+        """Номер страницы; страница за концом оценки проверяется по строкам.
+
+        Оценка бывает меньше настоящего числа строк (устаревшая статистика,
+        отстающий счётчик). Если на запрошенной странице есть строки, count
+        увеличивается до найденного, и страница отдаётся вместо 404.
+        """
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            number = int(number)
+            if number <= 1 or not hasattr(self.object_list, 'query'):
+                raise
+            bottom = (number - 1) * self.per_page
+            found = self.object_list.order_by()[
+                bottom:bottom + self.per_page + 1
+            ].count()
+            if not found:
+                raise
+        self.__dict__['count'] = bottom + found
+        self.__dict__.pop('num_pages', None)
+        cache.set(
+            count_cache_key(self.object_list), self.count,
+            settings.COUNT_CACHE_TTL,
+        )
+        return number
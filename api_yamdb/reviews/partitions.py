@@ -0,0 +1,359 @@
+"""Секционирование отзывов и комментариев по месяцам pub_date (Postgres).
+
+Таблицы reviews_review и reviews_comment превращаются в секционированные
+по диапазону pub_date: каждая секция — месяц, плюс секция по умолчанию
+для строк вне созданных месяцев. ORM работает с ними как раньше, а
+запросы с условием на pub_date читают только нужные секции. Старые
+месяцы отсоединяются и выгружаются в сжатые файлы целиком, без DELETE
+и последующего VACUUM.
+
+Ограничения Postgres и как они обойдены:
+
+* первичный ключ секционированной таблицы обязан включать pub_date,
+  поэтому он становится (id, pub_date); id по-прежнему выдаёт
+  последовательность и в ORM остаётся первичным ключом;
+* уникальность (title, author) отзыва нельзя задать ограничением без
+  pub_date, её проверяет триггер unique_review под advisory-блокировкой
+  пары и при нарушении поднимает ту же ошибку unique_violation;
+* внешний ключ на секционированную таблицу требует уникального ключа
+  ссылки, которого у id больше нет, поэтому внешнего ключа
+  комментариев на отзывы в базе нет; каскадное удаление по-прежнему
+  выполняет Django.
+"""
+import gzip
+import os
+import re
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TextBand, TextSignature
+
+REVIEW_TABLE = 'reviews_review'
+COMMENT_TABLE = 'reviews_comment'
+TABLES = (REVIEW_TABLE, COMMENT_TABLE)
+PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+UNIQUE_REVIEW_FUNCTION = '''
+CREATE FUNCTION reviews_review_unique_review() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(NEW.title_id, NEW.author_id);
+    IF EXISTS (
+        SELECT 1 FROM reviews_review
+        WHERE title_id = NEW.title_id AND author_id = NEW.author_id
+            AND id <> NEW.id
+    ) THEN
+        RAISE unique_violation USING MESSAGE =
+            'duplicate key value violates unique constraint "unique_review"';
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+'''
+UNIQUE_REVIEW_TRIGGER = (
+    'CREATE TRIGGER unique_review '
+    'BEFORE INSERT OR UPDATE OF title_id, author_id ON reviews_review '
+    'FOR EACH ROW EXECUTE FUNCTION reviews_review_unique_review()'
+)
+
+
+def month_start(value):
+    return value.astimezone(timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return '{}_p{:%Y_%m}'.format(table, month)
+
+
+def default_partition_name(table):
+    return table + '_default'
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [table]
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitions(cursor, table):
+    """Месячные секции таблицы: {месяц: имя}."""
+    cursor.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(%s)', [table]
+    )
+    months = {}
+    for name, in cursor.fetchall():
+        match = PARTITION_NAME.search(name)
+        if match:
+            year, month = map(int, match.groups())
+            months[datetime(year, month, 1, tzinfo=timezone.utc)] = name
+    return months
+
+
+def bounds(month):
+    return (month.isoformat(), add_months(month, 1).isoformat())
+
+
+def create_partition(cursor, table, month):
+    """Создаёт секцию месяца, перенося в неё строки из секции по
+    умолчанию, если они там есть."""
+    name = partition_name(table, month)
+    default = default_partition_name(table)
+    start, end = bounds(month)
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM {default} '
+        'WHERE pub_date >= %s AND pub_date < %s)', [start, end]
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            f'CREATE TABLE {name} PARTITION OF {table} '
+            'FOR VALUES FROM (%s) TO (%s)', [start, end]
+        )
+        return name
+    with transaction.atomic():
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default}')
+        cursor.execute(
+            f'CREATE TABLE {name} PARTITION OF {table} '
+            'FOR VALUES FROM (%s) TO (%s)', [start, end]
+        )
+        cursor.execute(
+            f'INSERT INTO {name} SELECT * FROM {default} '
+            'WHERE pub_date >= %s AND pub_date < %s', [start, end]
+        )
+        cursor.execute(
+            f'DELETE FROM {default} WHERE pub_date >= %s AND pub_date < %s',
+            [start, end]
+        )
+        cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {default} '
+                       'DEFAULT')
+    return name
+
+
+def ensure_partitions(cursor, months_ahead):
+    """Создаёт секции с текущего месяца на months_ahead месяцев вперёд."""
+    current = month_start(datetime.now(timezone.utc))
+    created = []
+    for table in TABLES:
+        existing = partitions(cursor, table)
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                created.append(create_partition(cursor, table, month))
+    return created
+
+
+def table_definition(cursor, table):
+    """Индексы и внешние ключи таблицы, кроме первичного ключа и
+    ограничений уникальности, в виде SQL для пересоздания."""
+    cursor.execute(
+        'SELECT pg_get_indexdef(indexrelid) FROM pg_index '
+        'WHERE indrelid = to_regclass(%s) AND NOT indisprimary '
+        'AND NOT indisunique', [table]
+    )
+    # У секционированной таблицы определение индекса содержит ON ONLY.
+    indexes = [
+        row[0].replace(' ON ONLY ', ' ON ') for row in cursor.fetchall()
+    ]
+    cursor.execute(
+        'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [table]
+    )
+    foreign_keys = [
+        f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}'
+        for name, definition in cursor.fetchall()
+    ]
+    return indexes, foreign_keys
+
+
+def drop_references(cursor, table):
+    """Удаляет внешние ключи других таблиц на table."""
+    cursor.execute(
+        'SELECT conrelid::regclass, conname FROM pg_constraint '
+        "WHERE confrelid = to_regclass(%s) AND contype = 'f'", [table]
+    )
+    for source, name in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {source} DROP CONSTRAINT {name}')
+
+
+def rebuild_table(cursor, table, partitioned):
+    """Пересоздаёт таблицу секционированной или обычной с теми же
+    данными, индексами и внешними ключами."""
+    indexes, foreign_keys = table_definition(cursor, table)
+    drop_references(cursor, table)
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    old = table + '_old'
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    cursor.execute(
+        f'ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey'
+    )
+    partition_by = ' PARTITION BY RANGE (pub_date)' if partitioned else ''
+    cursor.execute(
+        f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS '
+        f'INCLUDING CONSTRAINTS INCLUDING STORAGE){partition_by}'
+    )
+    primary_key = '(id, pub_date)' if partitioned else '(id)'
+    cursor.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey '
+        f'PRIMARY KEY {primary_key}'
+    )
+    if partitioned:
+        cursor.execute(
+            f'CREATE TABLE {default_partition_name(table)} '
+            f'PARTITION OF {table} DEFAULT'
+        )
+        cursor.execute(
+            "SELECT date_trunc('month', min(pub_date) AT TIME ZONE 'UTC')"
+            f'::date FROM {old}'
+        )
+        first = cursor.fetchone()[0]
+        month = month_start(datetime.now(timezone.utc))
+        if first is not None:
+            month = datetime(first.year, first.month, 1, tzinfo=timezone.utc)
+        last = add_months(month_start(datetime.now(timezone.utc)),
+                          settings.PARTITION_PREMAKE_MONTHS)
+        while month <= last:
+            create_partition(cursor, table, month)
+            month = add_months(month, 1)
+    cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+    cursor.execute(f'DROP TABLE {old}')
+    for sql in indexes + foreign_keys:
+        cursor.execute(sql)
+    cursor.execute(f'ANALYZE {table}')
+
+
+def partition_tables(connection):
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, REVIEW_TABLE):
+            return
+        cursor.execute(
+            f'ALTER TABLE {REVIEW_TABLE} DROP CONSTRAINT unique_review'
+        )
+        for table in TABLES:
+            rebuild_table(cursor, table, partitioned=True)
+        cursor.execute(
+            f'CREATE INDEX {REVIEW_TABLE}_title_author_idx '
+            f'ON {REVIEW_TABLE} (title_id, author_id)'
+        )
+        cursor.execute(UNIQUE_REVIEW_FUNCTION)
+        cursor.execute(UNIQUE_REVIEW_TRIGGER)
+
+
+def unpartition_tables(connection):
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, REVIEW_TABLE):
+            return
+        cursor.execute(f'DROP TRIGGER unique_review ON {REVIEW_TABLE}')
+        cursor.execute('DROP FUNCTION reviews_review_unique_review()')
+        cursor.execute(f'DROP INDEX {REVIEW_TABLE}_title_author_idx')
+        for table in TABLES:
+            rebuild_table(cursor, table, partitioned=False)
+        cursor.execute(
+            f'ALTER TABLE {REVIEW_TABLE} ADD CONSTRAINT unique_review '
+            'UNIQUE (title_id, author_id)'
+        )
+        cursor.execute(
+            f'ALTER TABLE {COMMENT_TABLE} '
+            'ADD CONSTRAINT reviews_comment_review_id_fk '
+            f'FOREIGN KEY (review_id) REFERENCES {REVIEW_TABLE} (id) '
+            'DEFERRABLE INITIALLY DEFERRED'
+        )
+
+
+def copy_to_file(cursor, query, path):
+    """Выгружает результат запроса в CSV, сжатый gzip."""
+    temporary = path + '.tmp'
+    with gzip.open(temporary, 'wb') as archive:
+        cursor.copy_expert(
+            f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)', archive
+        )
+    os.replace(temporary, path)
+
+
+def archive_month(cursor, month, archive_dir=None):
+    """Отсоединяет секции месяца и, если задан archive_dir, выгружает их
+    в сжатые файлы и удаляет.
+
+    Комментарии к отзывам месяца, написанные позже, переносятся в
+    таблицу комментариев месяца и выгружаются вместе с ней. Без
+    archive_dir секции остаются в базе отдельными таблицами; чтобы
+    вернуть их через ATTACH PARTITION, перенесённые комментарии сначала
+    нужно вставить обратно в reviews_comment.
+
+    Счётчики произведений и пользователей не меняются, их пересчитывают
+    задачи, которые ставит manage_review_partitions.
+    """
+    review_partition = partition_name(REVIEW_TABLE, month)
+    comment_partition = partition_name(COMMENT_TABLE, month)
+    # Отсоединение держит эксклюзивную блокировку таблицы, поэтому каждая
+    # секция отсоединяется своей короткой транзакцией.
+    for table, partition in ((REVIEW_TABLE, review_partition),
+                             (COMMENT_TABLE, comment_partition)):
+        cursor.execute(
+            'SELECT relispartition FROM pg_class WHERE oid = to_regclass(%s)',
+            [partition]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(f'CREATE TABLE {partition} (LIKE {table})')
+        elif row[0]:
+            with transaction.atomic():
+                cursor.execute(
+                    f'ALTER TABLE {table} DETACH PARTITION {partition}'
+                )
+    # Иначе в reviews_comment остались бы комментарии к отсутствующим
+    # отзывам.
+    with transaction.atomic():
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {COMMENT_TABLE} WHERE review_id IN '
+            f'(SELECT id FROM {review_partition}) RETURNING *) '
+            f'INSERT INTO {comment_partition} SELECT * FROM moved'
+        )
+        # Выгрузка идёт мимо сигналов, поэтому сигнатуры для поиска
+        # повторов удаляются здесь.
+        for kind, partition in ((TextSignature.REVIEW, review_partition),
+                                (TextSignature.COMMENT, comment_partition)):
+            for model in (TextSignature, TextBand):
+                cursor.execute(
+                    f'DELETE FROM {model._meta.db_table} WHERE kind = %s '
+                    f'AND object_id IN (SELECT id FROM {partition})', [kind]
+                )
+    if archive_dir is None:
+        return []
+    os.makedirs(archive_dir, exist_ok=True)
+    files = []
+    with transaction.atomic():
+        for name in (review_partition, comment_partition):
+            path = os.path.join(archive_dir, name + '.csv.gz')
+            copy_to_file(cursor, f'SELECT * FROM {name} ORDER BY id', path)
+            files.append(path)
+        cursor.execute(f'DROP TABLE {review_partition}, {comment_partition}')
+    return files
+
+
+def months_to_archive(cursor, before):
+    """Месяцы раньше before, для которых остались таблицы отзывов:
+    присоединённые секции и отсоединённые ранее, но ещё не выгруженные."""
+    cursor.execute(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' "
+        'AND relname LIKE %s', [REVIEW_TABLE + r'\_p%']
+    )
+    months = set()
+    for name, in cursor.fetchall():
+        match = PARTITION_NAME.search(name)
+        if match:
+            year, month = map(int, match.groups())
+            months.add(datetime(year, month, 1, tzinfo=timezone.utc))
+    return sorted(month for month in months if month < before)
@@ -0,0 +1,47 @@
+from django.db.models import prefetch_related_objects
+
+from .models import Comment
+
+FIRST_COMMENTS_SQL = '''
+SELECT * FROM (
+    SELECT
+        comment.*,
+        ROW_NUMBER() OVER (
+            PARTITION BY comment.review_id
+            ORDER BY comment.pub_date, comment.id
+        ) AS position,
+        COUNT(*) OVER (PARTITION BY comment.review_id) AS total
+    FROM {table} AS comment
+    WHERE comment.review_id IN ({placeholders})
+) AS ranked
+WHERE ranked.position <= %s
+ORDER BY ranked.review_id, ranked.position
+'''
+
+
+def first_comments(review_ids, limit):
+    """Первые limit комментариев и общее число комментариев к отзывам.
+
+    Один оконный запрос на всю страницу отзывов вместо запроса на каждый
+    отзыв. Возвращает словарь {review_id: (комментарии, количество)}.
+    """
+    review_ids = list(review_ids)
+    if not review_ids:
+        return {}
+    comments = list(Comment.objects.raw(
+        FIRST_COMMENTS_SQL.format(
+            table=Comment._meta.db_table,
+            placeholders=', '.join(['%s'] * len(review_ids)),
+        ),
+        [*review_ids, limit],
+    ))
+    prefetch_related_objects(comments, 'author')
+    grouped = {review_id: [] for review_id in review_ids}
+    totals = dict.fromkeys(review_ids, 0)
+    for comment in comments:
+        grouped[comment.review_id].append(comment)
+        totals[comment.review_id] = comment.total
+    return {
+        review_id: (grouped[review_id], totals[review_id])
+        for review_id in review_ids
+    }
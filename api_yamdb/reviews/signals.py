@@ -0,0 +1,170 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import live
+from .aggregates import enqueue_review_change, enqueue_review_changes
+from .autocomplete import autocomplete
+from .dedup import text_index
+from .models import Comment, Genre, Review, TextSignature, Title, User
+
+# Модели, построчные обработчики удаления которых отключены в потоке.
+_muted = threading.local()
+
+
+def muted(sender):
+    return sender in getattr(_muted, 'senders', ())
+
+
+@contextmanager
+def mute(sender):
+    senders = getattr(_muted, 'senders', frozenset())
+    _muted.senders = senders | {sender}
+    try:
+        yield
+    finally:
+        _muted.senders = senders
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            reviews_count=F('reviews_count') + 1,
+            score_sum=F('score_sum') + instance.score,
+        )
+        enqueue_review_change(
+            instance.title_id, 1, instance.score, instance.pub_date
+        )
+        live.publish_review(instance)
+    elif (instance.loaded_score is not None
+          and instance.score != instance.loaded_score):
+        score_delta = instance.score - instance.loaded_score
+        User.objects.filter(pk=instance.author_id).update(
+            score_sum=F('score_sum') + score_delta,
+        )
+        enqueue_review_change(
+            instance.title_id, 0, score_delta, instance.pub_date
+        )
+    instance.loaded_score = instance.score
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    if muted(sender):
+        return
+    User.objects.filter(pk=instance.author_id).update(
+        reviews_count=F('reviews_count') - 1,
+        score_sum=F('score_sum') - instance.score,
+    )
+    enqueue_review_change(
+        instance.title_id, -1, -instance.score, instance.pub_date
+    )
+    text_index.forget(TextSignature.REVIEW, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            comments_count=F('comments_count') + 1,
+        )
+        live.publish_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if muted(sender):
+        return
+    User.objects.filter(pk=instance.author_id).update(
+        comments_count=F('comments_count') - 1,
+    )
+    text_index.forget(TextSignature.COMMENT, instance.pk)
+
+
+def update_authors(fields, deltas):
+    """Вычитает из полей fields авторов их доли {author_id: (n, ...)}.
+
+    Авторы с одинаковыми долями обновляются одним запросом, поэтому
+    запросов столько, сколько разных долей, а не авторов.
+    """
+    authors = {}
+    for author_id, delta in deltas.items():
+        authors.setdefault(delta, []).append(author_id)
+    for delta, author_ids in authors.items():
+        User.objects.filter(pk__in=author_ids).update(**{
+            field: F(field) - value for field, value in zip(fields, delta)
+        })
+
+
+def reviews_deleted(reviews):
+    """То же, что review_deleted, для пачки отзывов."""
+    reviews = list(reviews.values_list(
+        'pk', 'author_id', 'title_id', 'score', 'pub_date'
+    ))
+    counts, scores = Counter(), Counter()
+    for _, author_id, _, score, _ in reviews:
+        counts[author_id] += 1
+        scores[author_id] += score
+    update_authors(('reviews_count', 'score_sum'), {
+        author_id: (count, scores[author_id])
+        for author_id, count in counts.items()
+    })
+    enqueue_review_changes(
+        (title_id, -1, -score, pub_date)
+        for _, _, title_id, score, pub_date in reviews
+    )
+    text_index.forget_many(TextSignature.REVIEW, [row[0] for row in reviews])
+
+
+def comments_deleted(comments):
+    """То же, что comment_deleted, для пачки комментариев."""
+    comments = list(comments.values_list('pk', 'author_id'))
+    counts = Counter(author_id for _, author_id in comments)
+    update_authors(('comments_count',), {
+        author_id: (count,) for author_id, count in counts.items()
+    })
+    text_index.forget_many(TextSignature.COMMENT, [pk for pk, _ in comments])
+
+
+BULK_DELETE_HANDLERS = {
+    Review: reviews_deleted,
+    Comment: comments_deleted,
+}
+
+
+def bulk_delete(queryset):
+    """Удаляет queryset, выполняя работу обработчиков удаления пачкой.
+
+    Счётчики авторов, очередь рейтингов и индекс похожих текстов
+    обновляются несколькими запросами на всю пачку, а построчные
+    обработчики post_delete модели на время удаления отключаются.
+    Вызывать внутри транзакции.
+    """
+    model = queryset.model
+    bulk_handler = BULK_DELETE_HANDLERS.get(model)
+    if bulk_handler is None:
+        return queryset.delete()
+    bulk_handler(queryset)
+    with mute(model):
+        return queryset.delete()
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=User)
+def autocomplete_object_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete.object_saved(instance))
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=User)
+def autocomplete_object_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.object_deleted(sender, pk))
@@ -0,0 +1,219 @@
+"""Расчёт похожих произведений по оценкам общих рецензентов.
+
+Сходство — скорректированный косинус: оценки каждого пользователя
+центрируются по его средней оценке, так что похожими считаются
+произведения, которые одни и те же люди оценивают одинаково выше или
+ниже своего обычного уровня. Для пар с малым числом общих рецензентов
+сходство уменьшается множителем c / (c + SIMILARITY_SHRINKAGE).
+"""
+import itertools
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Review, TitleSimilarity, TitleSimilarityState
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+BLOCK_SIZE = 500
+# Константы splitmix64.
+MIX_SHIFTS = (30, 27, 31)
+MIX_CONSTANTS = (0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+
+
+def review_hashes(authors, scores):
+    """64-битный хеш пары (автор, оценка) для каждого отзыва.
+
+    Сумма хешей по произведению не зависит от порядка отзывов, а
+    изменения, которые компенсируют друг друга в простой сумме оценок,
+    меняют её почти наверняка.
+    """
+    values = (
+        authors.astype(np.uint64) << np.uint64(8)
+    ) | scores.astype(np.uint64)
+    values = values + np.uint64(MIX_CONSTANTS[0])
+    for shift, constant in zip(MIX_SHIFTS[:2], MIX_CONSTANTS[1:]):
+        values = (values ^ (values >> np.uint64(shift))) * np.uint64(constant)
+    return values ^ (values >> np.uint64(MIX_SHIFTS[2]))
+
+
+def load_reviews(chunk_size=100000):
+    """Все отзывы как массив строк (title_id, author_id, score)."""
+    rows = Review.objects.order_by().values_list(
+        'title_id', 'author_id', 'score'
+    )
+    flat = itertools.chain.from_iterable(rows.iterator(chunk_size=chunk_size))
+    return np.fromiter(flat, dtype=np.int64).reshape(-1, 3)
+
+
+class ReviewMatrix:
+    """Разреженные матрицы «произведение × пользователь»."""
+
+    def __init__(self, reviews):
+        self.title_ids, title_idx = np.unique(
+            reviews[:, 0], return_inverse=True
+        )
+        user_ids, user_idx = np.unique(reviews[:, 1], return_inverse=True)
+        scores = reviews[:, 2].astype(np.float64)
+        user_mean = (
+            np.bincount(user_idx, weights=scores)
+            / np.bincount(user_idx)
+        )
+        shape = (len(self.title_ids), len(user_ids))
+        self.ratings = sparse.csr_matrix(
+            (scores - user_mean[user_idx], (title_idx, user_idx)),
+            shape=shape,
+        )
+        self.reviewed = sparse.csr_matrix(
+            (np.ones(len(scores), dtype=np.float32), (title_idx, user_idx)),
+            shape=shape,
+        )
+        self.norms = np.sqrt(
+            np.asarray(self.ratings.multiply(self.ratings).sum(axis=1))
+        ).ravel()
+        self.counts = np.bincount(title_idx, minlength=shape[0])
+        # Сумма по модулю 2 ** 64, в базе хранится как знаковое число.
+        checksums = np.zeros(shape[0], dtype=np.uint64)
+        np.add.at(
+            checksums, title_idx, review_hashes(reviews[:, 1], reviews[:, 2])
+        )
+        self.checksums = checksums.view(np.int64)
+
+    def index_of(self, title_ids):
+        return np.searchsorted(self.title_ids, title_ids)
+
+    def co_reviewed(self, rows):
+        """Индексы произведений, у которых есть общие рецензенты с rows."""
+        common = self.reviewed[rows] @ self.reviewed.T
+        return np.unique(common.indices)
+
+    def neighbours(self, rows, count, min_common, shrinkage):
+        """Лучшие соседи для строк rows.
+
+        Возвращает массивы (строка, сосед, сходство, общих рецензентов),
+        отсортированные по строке и убыванию сходства.
+        """
+        size = len(self.title_ids)
+        common = (self.reviewed[rows] @ self.reviewed.T).tocoo()
+        dots = (self.ratings[rows] @ self.ratings.T).tocoo()
+        row = rows[common.row]
+        keep = (common.col != row) & (common.data >= min_common)
+        row, col, shared = row[keep], common.col[keep], common.data[keep]
+
+        # Структура dots — подмножество структуры common, поэтому
+        # скалярные произведения находятся по ключу (строка, столбец).
+        dot_keys = rows[dots.row] * size + dots.col
+        order = np.argsort(dot_keys)
+        dot_keys, dot_values = dot_keys[order], dots.data[order]
+        keys = row * size + col
+        position = np.minimum(
+            np.searchsorted(dot_keys, keys), max(len(dot_keys) - 1, 0)
+        )
+        dot = np.zeros(len(keys))
+        if len(dot_keys):
+            found = dot_keys[position] == keys
+            dot[found] = dot_values[position[found]]
+
+        norms = self.norms[row] * self.norms[col]
+        score = np.divide(
+            dot, norms, out=np.zeros_like(dot), where=norms > 0
+        ) * shared / (shared + shrinkage)
+        keep = score > 0
+        row, col, score, shared = (
+            row[keep], col[keep], score[keep], shared[keep]
+        )
+
+        order = np.lexsort((-score, row))
+        row, col, score, shared = (
+            row[order], col[order], score[order], shared[order]
+        )
+        starts = np.searchsorted(row, row, side='left')
+        keep = np.arange(len(row)) - starts < count
+        return row[keep], col[keep], score[keep], shared[keep]
+
+
+def stored_fingerprints():
+    return {
+        title_id: (reviews_count, checksum)
+        for title_id, reviews_count, checksum
+        in TitleSimilarityState.objects.values_list(
+            'title_id', 'reviews_count', 'checksum'
+        ).iterator()
+    }
+
+
+def build_title_similarity(full=False, block_size=BLOCK_SIZE):
+    """Пересчитывает соседей произведений.
+
+    Без full пересчитываются только произведения, отзывы которых
+    изменились с прошлого расчёта, и произведения, у которых с ними есть
+    общие рецензенты. Сдвиг средних оценок пользователей при этом
+    учитывается не во всех парах, поэтому полный расчёт стоит
+    периодически запускать заново. Возвращает число пересчитанных
+    произведений.
+    """
+    matrix = ReviewMatrix(load_reviews())
+    stored = stored_fingerprints()
+    known = set(matrix.title_ids.tolist())
+    gone = [title_id for title_id in stored if title_id not in known]
+
+    if full:
+        affected = np.arange(len(matrix.title_ids))
+    else:
+        dirty = np.array([
+            index for index, title_id in enumerate(matrix.title_ids.tolist())
+            if stored.get(title_id) != (
+                int(matrix.counts[index]), int(matrix.checksums[index])
+            )
+        ], dtype=np.int64)
+        affected = dirty
+        if len(dirty):
+            affected = np.union1d(dirty, matrix.co_reviewed(dirty))
+        if gone:
+            referencing = TitleSimilarity.objects.filter(
+                similar_id__in=gone
+            ).values_list('title_id', flat=True).distinct()
+            referencing = [pk for pk in referencing if pk in known]
+            affected = np.union1d(affected, matrix.index_of(referencing))
+
+    with transaction.atomic():
+        TitleSimilarity.objects.filter(title_id__in=gone).delete()
+        TitleSimilarityState.objects.filter(title_id__in=gone).delete()
+
+    for start in range(0, len(affected), block_size):
+        save_block(matrix, affected[start:start + block_size])
+    return len(affected)
+
+
+def save_block(matrix, rows):
+    row, col, score, shared = matrix.neighbours(
+        rows,
+        settings.SIMILAR_TITLES_COUNT,
+        settings.SIMILARITY_MIN_COMMON_REVIEWERS,
+        settings.SIMILARITY_SHRINKAGE,
+    )
+    title_ids = matrix.title_ids[rows].tolist()
+    with transaction.atomic():
+        TitleSimilarity.objects.filter(title_id__in=title_ids).delete()
+        TitleSimilarity.objects.bulk_create(
+            TitleSimilarity(
+                title_id=int(matrix.title_ids[title]),
+                similar_id=int(matrix.title_ids[similar]),
+                score=round(float(value), 4),
+                common_reviewers=int(common),
+            )
+            for title, similar, value, common in zip(row, col, score, shared)
+        )
+        TitleSimilarityState.objects.filter(title_id__in=title_ids).delete()
+        TitleSimilarityState.objects.bulk_create(
+            TitleSimilarityState(
+                title_id=int(matrix.title_ids[index]),
+                reviews_count=int(matrix.counts[index]),
+                checksum=int(matrix.checksums[index]),
+            )
+            for index in rows
+        )
@@ -0,0 +1,33 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def _per_author(model, aggregate):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(author=OuterRef('pk'))
+            .order_by()
+            .values('author')
+            .annotate(value=aggregate)
+            .values('value'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_user_stats(user_model, review_model, comment_model,
+                       user_ids=None):
+    """Пересчитывает счётчики активности пользователей одним UPDATE.
+
+    Без user_ids пересчитываются все пользователи, иначе только
+    перечисленные.
+    """
+    users = user_model.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    return users.update(
+        reviews_count=_per_author(review_model, Count('pk')),
+        comments_count=_per_author(comment_model, Count('pk')),
+        score_sum=_per_author(review_model, Sum('score')),
+    )
@@ -0,0 +1,159 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Title, TitleActivityBucket, TrendingTitle
+
+HOUR = TitleActivityBucket.HOUR
+DAY = TitleActivityBucket.DAY
+
+
+def hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def cache_key(window, built):
+    """Ключ кеша ответа: с датой расчёта, чтобы каждый процесс сразу
+    переходил на новую таблицу, а старые ключи истекали сами."""
+    stamp = built.timestamp() if built is not None else 'none'
+    return f'trending:{window}:{stamp}'
+
+
+def last_built(window):
+    return TrendingTitle.objects.filter(window=window).values_list(
+        'built', flat=True
+    ).first()
+
+
+def add_to_bucket(title_id, start, span, reviews_delta, score_delta):
+    buckets = TitleActivityBucket.objects.filter(
+        title_id=title_id, start=start, span=span
+    )
+    changes = {
+        'reviews_count': F('reviews_count') + reviews_delta,
+        'score_sum': F('score_sum') + score_delta,
+    }
+    if buckets.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            TitleActivityBucket.objects.create(
+                title_id=title_id, start=start, span=span,
+                reviews_count=reviews_delta, score_sum=score_delta,
+            )
+    except IntegrityError:
+        buckets.update(**changes)
+
+
+def add_activity(changes):
+    """Добавляет изменения {(title_id, час): [отзывы, оценки]} в часовые
+    интервалы. Вызывается при применении очереди агрегатов."""
+    for (title_id, start), (reviews_delta, score_delta) in sorted(
+        changes.items()
+    ):
+        add_to_bucket(title_id, start, HOUR, reviews_delta, score_delta)
+
+
+def compact_activity(now=None):
+    """Сворачивает старые часовые интервалы в суточные.
+
+    Каждые сутки сворачиваются отдельной транзакцией. Интервалы старше
+    ACTIVITY_RETENTION_DAYS удаляются. Возвращает число свёрнутых и
+    удалённых интервалов.
+    """
+    today = day_start(now or timezone.now())
+    retention = timedelta(days=settings.ACTIVITY_HOURLY_RETENTION_DAYS)
+    hourly = TitleActivityBucket.objects.filter(
+        span=HOUR, start__lt=today - retention
+    )
+    compacted = 0
+    oldest = hourly.order_by('start').values_list('start', flat=True).first()
+    while oldest is not None:
+        day = day_start(oldest)
+        with transaction.atomic():
+            day_hours = hourly.filter(
+                start__gte=day, start__lt=day + timedelta(days=1)
+            )
+            totals = day_hours.order_by().values('title_id').annotate(
+                reviews=Sum('reviews_count'), score=Sum('score_sum')
+            )
+            for row in totals:
+                add_to_bucket(
+                    row['title_id'], day, DAY, row['reviews'], row['score']
+                )
+            compacted += day_hours.delete()[0]
+        oldest = hourly.order_by('start').values_list(
+            'start', flat=True
+        ).first()
+    expired = TitleActivityBucket.objects.filter(
+        start__lt=today - timedelta(days=settings.ACTIVITY_RETENTION_DAYS)
+    ).delete()[0]
+    return compacted, expired
+
+
+def trending_scores(window, now=None):
+    """Популярность произведений за окно с экспоненциальным затуханием.
+
+    Каждый интервал входит в сумму с весом 0.5 ** (возраст / период
+    полураспада), где возраст отсчитывается от середины интервала.
+    Возвращает {title_id: (взвешенная сумма оценок, взвешенное число
+    отзывов)}.
+    """
+    now = now or timezone.now()
+    hours, half_life = settings.TRENDING_WINDOWS[window]
+    since = now - timedelta(hours=hours)
+    decay = math.log(2) / (half_life * HOUR)
+    scores = defaultdict(lambda: [0.0, 0.0])
+    buckets = TitleActivityBucket.objects.filter(
+        start__gt=since - timedelta(seconds=DAY)
+    ).values_list('title_id', 'start', 'span', 'reviews_count', 'score_sum')
+    for title_id, start, span, reviews, score_sum in buckets.iterator():
+        if start + timedelta(seconds=span) <= since:
+            continue
+        middle = start + timedelta(seconds=span / 2)
+        weight = math.exp(-decay * max((now - middle).total_seconds(), 0))
+        scores[title_id][0] += weight * score_sum
+        scores[title_id][1] += weight * reviews
+    return scores
+
+
+def build_trending(now=None):
+    """Пересчитывает таблицу популярных произведений для всех окон."""
+    now = now or timezone.now()
+    size = settings.TRENDING_SIZE
+    for window in settings.TRENDING_WINDOWS:
+        ranked = sorted(
+            (
+                (title_id, score, reviews)
+                for title_id, (score, reviews)
+                in trending_scores(window, now).items()
+                if score > 0
+            ),
+            key=lambda item: (-item[1], item[0]),
+        )[:size * 2]
+        # Интервалы удалённых произведений доживают до сворачивания.
+        existing = set(Title.objects.filter(
+            pk__in=[title_id for title_id, _, _ in ranked]
+        ).values_list('pk', flat=True))
+        ranked = [item for item in ranked if item[0] in existing][:size]
+        built = timezone.now()
+        with transaction.atomic():
+            TrendingTitle.objects.filter(window=window).delete()
+            TrendingTitle.objects.bulk_create(
+                TrendingTitle(
+                    window=window, rank=rank, title_id=title_id,
+                    score=round(score, 3), reviews=round(reviews, 3),
+                    built=built,
+                )
+                for rank, (title_id, score, reviews)
+                in enumerate(ranked, start=1)
+            )
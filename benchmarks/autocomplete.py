@@ -0,0 +1,88 @@
+"""Задержка автодополнения на индексе в памяти.
+
+Индекс строится из синтетических названий, минуя базу данных; замеряются
+время сборки, поиск по случайным префиксам и обновления индекса.
+
+    python benchmarks/autocomplete.py --entries 1000000
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+
+from utils import setup_django
+
+SYLLABLES = (
+    'ба ве го да же зи ко ла ми но пу ро са те фу ха це чи ша ю я ён '
+    'ka le mi no pu ro sa te vu xa ze an el in or un'
+).split()
+
+
+def vocabulary(size, rng):
+    """Псевдослова из слогов: кириллица и латиница вперемешку."""
+    return sorted({
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(size)
+    })
+
+
+def synthetic_entries(count, rng, words):
+    # Частоты слов убывают по закону Ципфа, как в настоящих названиях.
+    cum_weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, len(words) + 1)
+    ))
+    for pk in range(1, count + 1):
+        name = ' '.join(rng.choices(
+            words, cum_weights=cum_weights, k=rng.randint(1, 4)
+        ))
+        yield pk, name.capitalize(), rng.randint(0, 10000), pk
+
+
+def percentile(values, share):
+    return sorted(values)[int(len(values) * share) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from reviews.autocomplete import PrefixIndex, normalize
+
+    rng = random.Random(0)
+    words = vocabulary(20000, rng)
+    entries = list(synthetic_entries(args.entries, rng, words))
+    start = time.perf_counter()
+    index = PrefixIndex.build(entries)
+    print(f'Сборка индекса: {time.perf_counter() - start:.1f} с, '
+          f'объектов: {len(index)}')
+
+    prefixes = [
+        normalize(rng.choice(words))[:rng.randint(1, 6)]
+        for _ in range(args.queries)
+    ]
+    for label, queries in (('холодный кеш', prefixes), ('тёплый', prefixes)):
+        timings = []
+        for prefix in queries:
+            started = time.perf_counter()
+            index.search(prefix, args.limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f'Поиск, {label}: медиана {statistics.median(timings):.3f} мс, '
+              f'p99 {percentile(timings, 0.99):.3f} мс, '
+              f'максимум {max(timings):.3f} мс')
+
+    timings = []
+    for pk in rng.sample(range(1, args.entries + 1), 200):
+        started = time.perf_counter()
+        index.add(pk, rng.choice(words), rng.randint(0, 20000), pk)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f'Обновление: медиана {statistics.median(timings):.3f} мс, '
+          f'максимум {max(timings):.3f} мс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Сравнение пропускной способности моделей воркеров gunicorn.
+
+Запускает приложение с каждой моделью воркеров из api_yamdb/gunicorn.conf.py
+и нагружает выбранный адрес параллельными запросами:
+
+    python benchmarks/gunicorn_workers.py --path /api/v1/titles/ \
+        --requests 2000 --concurrency 32 sync gthread gevent
+
+Подключение к БД берётся из тех же переменных окружения, что и у
+приложения (DB_ENGINE, DB_NAME и т.д.).
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_yamdb'
+)
+WORKER_DEPENDENCIES = {'gevent': 'gevent'}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn не запустился на порту {port}')
+
+
+def run_client(port, path, count):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    errors = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers={'Host': 'localhost'})
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(
+                '127.0.0.1', port, timeout=30
+            )
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    return latencies, errors
+
+
+def benchmark(worker_class, args):
+    port = free_port()
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+    )
+    if args.workers:
+        env['GUNICORN_WORKERS'] = str(args.workers)
+    server = subprocess.Popen(
+        [sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()',
+         'api_yamdb.wsgi:application', '--config', 'gunicorn.conf.py'],
+        cwd=PROJECT_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(port)
+        run_client(port, args.path, args.warmup)
+        per_client = args.requests // args.concurrency
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(
+                lambda _: run_client(port, args.path, per_client),
+                range(args.concurrency),
+            ))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = sorted(
+        latency for client_latencies, _ in results
+        for latency in client_latencies
+    )
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'worker_classes', nargs='*', default=['sync', 'gthread', 'gevent'],
+    )
+    parser.add_argument('--path', default='/api/v1/titles/')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    print(f'{"worker":<10}{"req/s":>10}{"p50, мс":>10}{"p99, мс":>10}'
+          f'{"ошибки":>10}')
+    for worker_class in args.worker_classes:
+        dependency = WORKER_DEPENDENCIES.get(worker_class)
+        if dependency and importlib.util.find_spec(dependency) is None:
+            print(f'{worker_class:<10}пропущено: не установлен {dependency}')
+            continue
+        result = benchmark(worker_class, args)
+        print(f'{worker_class:<10}{result["rps"]:>10.1f}'
+              f'{result["p50"]:>10.1f}{result["p99"]:>10.1f}'
+              f'{result["errors"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Размер ответа и время ответа списков с ?fields= и без.
+
+    python benchmarks/sparse_fields.py --titles 2000 --repeat 50
+"""
+import argparse
+import statistics
+import time
+
+from utils import seed, setup_django
+
+
+def measure(client, url, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.content
+    return len(response.content), len(queries), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    seed(titles=args.titles)
+
+    from rest_framework.test import APIClient
+
+    from reviews.models import Title
+
+    title_id = Title.objects.values_list('pk', flat=True).first()
+    cases = [
+        ('/api/v1/titles/', '/api/v1/titles/?fields=id,name,rating'),
+        (f'/api/v1/titles/{title_id}/reviews/',
+         f'/api/v1/titles/{title_id}/reviews/?fields=id,score,author'),
+    ]
+    client = APIClient()
+    print(f'{"запрос":<50}{"байт":>8}{"запросов":>10}{"мс":>8}')
+    for full, sparse in cases:
+        for url in (full, sparse):
+            size, queries, median = measure(client, url, args.repeat)
+            print(f'{url:<50}{size:>8}{queries:>10}{median * 1000:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Общая подготовка окружения для бенчмарков.
+
+Если переменная DB_ENGINE не задана, бенчмарк работает на временной
+базе SQLite, чтобы его можно было запустить без Postgres.
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT_DIR, 'api_yamdb')
+
+
+def setup_django():
+    sys.path[:0] = [PROJECT_DIR, ROOT_DIR]
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+    if 'DB_ENGINE' not in os.environ:
+        os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+        os.environ['DB_NAME'] = os.path.join(
+            tempfile.mkdtemp(prefix='yamdb-bench-'), 'db.sqlite3'
+        )
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.core.management import call_command
+
+    settings.ALLOWED_HOSTS = ['*']
+    call_command('migrate', verbosity=0)
+
+
+def seed(**kwargs):
+    """Наполняет базу тем же генератором, что и тесты.
+
+    Аргументы — как у tests.factories.seed; вызывать после setup_django.
+    """
+    from tests.factories import seed
+
+    return seed(**kwargs)
+
+
+@contextmanager
+def timer(results, key):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
@@ -1,9 +1,40 @@
 import sys
 from os.path import abspath, dirname, join
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
 pytest_plugins = [
 ]
+
+# Размер набора данных для тестов API: десятки тысяч строк
+# наполняются за несколько секунд (см. tests/factories.py).
+DATASET_SIZE = {
+    'titles': 10000,
+    'reviews_per_title': 3,
+    'comments_per_review': 1,
+}
+
+
+def pytest_runtest_setup(item):
+    from django.db import connection
+
+    if (item.get_closest_marker('postgres')
+            and connection.vendor != 'postgresql'):
+        pytest.skip('Тест выполняется только на Postgres.')
+
+
+@pytest.fixture(scope='session')
+def dataset(django_db_setup, django_db_blocker):
+    """Общий набор данных, один на процесс (и на воркер pytest-xdist).
+
+    Тесты с ним должны использовать django_db без transaction=True:
+    изменения откатываются, а набор остаётся.
+    """
+    from .factories import seed
+
+    with django_db_blocker.unblock():
+        return seed(**DATASET_SIZE)
@@ -0,0 +1,133 @@
+"""Быстрое наполнение базы для тестов и бенчмарков через bulk_create.
+
+Сигналы при этом не срабатывают, поэтому счётчики и рейтинги
+произведений и пользователей считаются здесь же и сразу записываются
+согласованными с отзывами и комментариями. Бенчмарки подключают этот
+модуль через benchmarks/utils.py.
+"""
+from collections import namedtuple
+
+from django.db.models import Max
+
+from reviews.models import Category, Comment, Genre, Review, Title, User
+
+Dataset = namedtuple(
+    'Dataset', 'users titles reviews comments categories genres'
+)
+
+
+def new_ids(model, create):
+    """Создаёт объекты и возвращает их id по порядку создания.
+
+    Django 2.2 не возвращает id из bulk_create на SQLite, поэтому новые
+    id читаются из базы.
+    """
+    last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    create()
+    return list(
+        model.objects.filter(pk__gt=last).order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def score_for(title, position):
+    return (title * 7 + position * 3) % 10 + 1
+
+
+def create_users(count, prefix='user', role=User.USER, counters=None):
+    counters = counters or {}
+    return new_ids(User, lambda: User.objects.bulk_create(
+        User(
+            username=f'{prefix}{index}',
+            email=f'{prefix}{index}@yamdb.ru',
+            role=role,
+            **counters.get(index, {}),
+        )
+        for index in range(count)
+    ))
+
+
+def seed(titles=100, reviews_per_title=3, comments_per_review=1,
+         users=None, categories=10, genres=20, prefix='seed'):
+    """Создаёт произведения с отзывами и комментариями.
+
+    Отзыв номер j на произведение t пишет пользователь (t + j) % users,
+    комментарий номер k к отзыву r — пользователь (r + k) % users.
+    Оценки детерминированы (см. score_for). Даты публикации у всех
+    отзывов и комментариев одинаковые: их выставляет auto_now_add.
+    """
+    if users is None:
+        users = max(100, reviews_per_title)
+    if users < reviews_per_title:
+        raise ValueError('Пользователей меньше, чем отзывов на произведение.')
+    counters = {
+        index: {'reviews_count': 0, 'comments_count': 0, 'score_sum': 0}
+        for index in range(users)
+    }
+    title_scores = []
+    for title in range(titles):
+        scores = [score_for(title, j) for j in range(reviews_per_title)]
+        title_scores.append(scores)
+        for j, score in enumerate(scores):
+            author = counters[(title + j) % users]
+            author['reviews_count'] += 1
+            author['score_sum'] += score
+    total_reviews = titles * reviews_per_title
+    for review in range(total_reviews):
+        for k in range(comments_per_review):
+            counters[(review + k) % users]['comments_count'] += 1
+    user_ids = create_users(users, prefix, counters=counters)
+
+    category_ids = new_ids(Category, lambda: Category.objects.bulk_create(
+        Category(name=f'Категория {index}', slug=f'{prefix}-category-{index}')
+        for index in range(categories)
+    ))
+    genre_ids = new_ids(Genre, lambda: Genre.objects.bulk_create(
+        Genre(name=f'Жанр {index}', slug=f'{prefix}-genre-{index}')
+        for index in range(genres)
+    ))
+    title_ids = new_ids(Title, lambda: Title.objects.bulk_create(
+        Title(
+            name=f'Произведение {index}',
+            year=1950 + index % 75,
+            description=f'Описание произведения {index}',
+            category_id=category_ids[index % categories],
+            reviews_count=len(scores),
+            score_sum=sum(scores),
+            rating=sum(scores) // len(scores) if scores else None,
+        )
+        for index, scores in enumerate(title_scores)
+    ))
+    Title.genre.through.objects.bulk_create(
+        Title.genre.through(title_id=title_id, genre_id=genre_id)
+        for index, title_id in enumerate(title_ids)
+        for genre_id in {
+            genre_ids[index % genres], genre_ids[(index * 3 + 1) % genres]
+        }
+    )
+
+    review_ids = new_ids(Review, lambda: Review.objects.bulk_create(
+        Review(
+            title_id=title_id,
+            author_id=user_ids[(index + j) % users],
+            text=f'Отзыв {j} на произведение {index}',
+            score=score,
+        )
+        for index, (title_id, scores) in enumerate(
+            zip(title_ids, title_scores)
+        )
+        for j, score in enumerate(scores)
+    ))
+
+    comment_ids = new_ids(Comment, lambda: Comment.objects.bulk_create(
+        Comment(
+            review_id=review_id,
+            author_id=user_ids[(index + k) % users],
+            text=f'Комментарий {k} к отзыву {index}',
+        )
+        for index, review_id in enumerate(review_ids)
+        for k in range(comments_per_review)
+    ))
+    return Dataset(
+        user_ids, title_ids, review_ids, comment_ids, category_ids, genre_ids
+    )
@@ -0,0 +1,126 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from reviews.aggregates import apply_pending_events
+from reviews.models import Title, User
+
+pytestmark = pytest.mark.django_db
+
+# Число запросов к базе на страницу списка не должно зависеть от
+# размера таблиц и от числа объектов на странице.
+TITLE_LIST_QUERIES = 3
+REVIEW_LIST_QUERIES = 5
+COMMENT_LIST_QUERIES = 4
+
+
+def client(user=None):
+    api_client = APIClient()
+    if user is not None:
+        api_client.force_authenticate(user)
+    return api_client
+
+
+@pytest.fixture
+def admin(dataset):
+    return User.objects.create(
+        username='admin', email='admin@yamdb.ru', role=User.ADMIN
+    )
+
+
+@pytest.fixture
+def new_user(dataset):
+    return User.objects.create(username='reader', email='reader@yamdb.ru')
+
+
+class TestApiOnLargeDataset:
+
+    def setup_method(self):
+        cache.clear()
+
+    def test_title_list(self, dataset, django_assert_max_num_queries):
+        with django_assert_max_num_queries(TITLE_LIST_QUERIES):
+            response = client().get('/api/v1/titles/?page=50')
+        assert response.status_code == 200
+        assert response.data['count'] == len(dataset.titles), (
+            'Проверьте, что count в списке произведений точный'
+        )
+        title = response.data['results'][0]
+        assert len(title['genre']) == 2
+        assert title['category']['slug'].startswith('seed-category-')
+
+    def test_title_ordering(self, dataset, django_assert_max_num_queries):
+        with django_assert_max_num_queries(TITLE_LIST_QUERIES):
+            response = client().get('/api/v1/titles/?ordering=-rating')
+        ratings = [title['rating'] for title in response.data['results']]
+        assert ratings == sorted(ratings, reverse=True)
+        best = Title.objects.order_by('-rating', '-id').first()
+        assert response.data['results'][0]['id'] == best.pk
+
+    def test_title_batch_fetch(self, dataset):
+        ids = [dataset.titles[-1], 0, dataset.titles[0]]
+        response = client().get(
+            '/api/v1/titles/?ids=' + ','.join(map(str, ids))
+        )
+        assert [title['id'] for title in response.data['results']] == [
+            dataset.titles[-1], dataset.titles[0]
+        ]
+        assert response.data['missing'] == [0]
+
+    def test_review_list_with_comments(self, dataset,
+                                       django_assert_max_num_queries):
+        title_id = dataset.titles[1234]
+        with django_assert_max_num_queries(REVIEW_LIST_QUERIES):
+            response = client().get(
+                f'/api/v1/titles/{title_id}/reviews/?embed=comments'
+            )
+        assert response.status_code == 200
+        assert response.data['count'] == 3
+        for review in response.data['results']:
+            assert review['comments_count'] == 1
+            assert len(review['comments']) == 1
+
+    def test_comment_list(self, dataset, django_assert_max_num_queries):
+        review_id = dataset.reviews[4321]
+        title_id = dataset.titles[4321 // 3]
+        with django_assert_max_num_queries(COMMENT_LIST_QUERIES):
+            response = client().get(
+                f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+            )
+        assert response.status_code == 200
+        assert response.data['count'] == 1
+
+    def test_user_list(self, dataset, admin):
+        response = client(admin).get('/api/v1/users/?search=seed1')
+        assert response.status_code == 200
+        assert response.data['count'] == 11
+        assert client(admin).get('/api/v1/users/').data['count'] == (
+            len(dataset.users) + 1
+        )
+
+    def test_create_review(self, dataset, new_user):
+        title = Title.objects.get(pk=dataset.titles[0])
+        response = client(new_user).post(
+            f'/api/v1/titles/{title.pk}/reviews/',
+            {'text': 'Новый отзыв', 'score': 10},
+        )
+        assert response.status_code == 201
+        new_user.refresh_from_db()
+        assert (new_user.reviews_count, new_user.score_sum) == (1, 10), (
+            'Проверьте, что счётчики автора обновляются при отзыве'
+        )
+        apply_pending_events()
+        response = client().get(f'/api/v1/titles/{title.pk}/')
+        assert response.data['rating'] == (title.score_sum + 10) // 4, (
+            'Проверьте, что рейтинг учитывает новый отзыв'
+        )
+
+    def test_duplicate_review(self, dataset, new_user):
+        url = f'/api/v1/titles/{dataset.titles[0]}/reviews/'
+        data = {'text': 'Отзыв', 'score': 5}
+        assert client(new_user).post(url, data).status_code == 201
+        response = client(new_user).post(url, data)
+        assert response.status_code == 400
+        assert list(response.data) == ['non_field_errors'], (
+            'Проверьте, что ошибка повторного отзыва не изменила формат'
+        )
@@ -0,0 +1,80 @@
+from reviews.autocomplete import PrefixIndex, normalize
+
+
+def build(entries, **kwargs):
+    return PrefixIndex.build(
+        ((pk, name, popularity, pk) for pk, name, popularity in entries),
+        **kwargs
+    )
+
+
+class TestPrefixIndex:
+
+    def test_normalize(self):
+        assert normalize('  Ёжик в ТУМАНЕ! ') == 'ежик в тумане', (
+            'Проверьте, что регистр, «ё» и пунктуация нормализуются'
+        )
+
+    def test_prefix_and_word_start(self):
+        index = build([
+            (1, 'Властелин колец', 5),
+            (2, 'Ёжик в тумане', 3),
+            (3, 'The Lord of the Rings', 4),
+        ])
+        assert index.search('влас', 10) == [1]
+        assert index.search('КОЛ', 10) == [1], (
+            'Проверьте, что поиск находит начало любого слова названия'
+        )
+        assert index.search('еж', 10) == [2]
+        assert index.search('lord', 10) == [3]
+        assert index.search('x', 10) == []
+        assert index.search('я', 10) == []
+
+    def test_ranked_by_popularity(self):
+        index = build([(1, 'Alien', 1), (2, 'Aliens', 10), (3, 'Alf', 5)])
+        assert index.search('al', 10) == [2, 3, 1], (
+            'Проверьте, что подсказки упорядочены по популярности'
+        )
+        assert index.search('al', 2) == [2, 3]
+
+    def test_incremental_updates(self):
+        index = build([(1, 'Alien', 1), (2, 'Aliens', 10)])
+        index.add(3, 'Alf', 20, 3)
+        assert index.search('al', 10) == [3, 2, 1]
+        index.add(1, 'Bob', None, 1)
+        assert index.search('al', 10) == [3, 2], (
+            'Проверьте, что после переименования старый ключ удаляется'
+        )
+        assert index.search('bo', 10) == [1]
+        index.remove(3)
+        assert index.search('al', 10) == [2]
+        assert len(index) == 2
+
+    def test_cached_top_stays_consistent(self):
+        entries = [(pk, f'a{pk}', pk, pk) for pk in range(1, 101)]
+        index = PrefixIndex.build(entries, top_size=5, scan_limit=10)
+        assert index.search('a', 3) == [100, 99, 98]
+        index.add(1, 'a1', 1000, 1)
+        assert index.search('a', 3) == [1, 100, 99], (
+            'Проверьте, что кеш лучших подсказок учитывает изменения'
+        )
+        index.add(1, 'a1', 0, 1)
+        assert index.search('a', 3) == [100, 99, 98]
+        index.remove(100)
+        assert index.search('a', 2) == [99, 98]
+
+    def test_small_chunks(self):
+        index = PrefixIndex.build(
+            [(pk, f'b{pk:03}', pk, pk) for pk in range(1, 50)],
+            chunk_size=4, scan_limit=3, top_size=3,
+        )
+        for pk in range(50, 80):
+            index.add(pk, f'a{pk:03}', pk, pk)
+        for pk in range(1, 50, 2):
+            index.remove(pk)
+        assert index.search('a', 3) == [79, 78, 77]
+        assert index.search('b', 3) == [48, 46, 44]
+        assert index.search('b00', 3) == [8, 6, 4]
+        keys = [key for chunk in index.chunks for key in chunk]
+        assert keys == sorted(keys), 'Проверьте, что ключи остаются отсортированными'
+        assert all(len(chunk) <= 8 for chunk in index.chunks)
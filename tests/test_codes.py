@@ -0,0 +1,110 @@
+import re
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reviews.codes import consume_code, issue_code, purge_codes
+from reviews.models import ConfirmationCode, User
+
+pytestmark = pytest.mark.django_db
+
+SIGNUP_URL = '/api/v1/auth/signup/'
+TOKEN_URL = '/api/v1/auth/token/'
+
+
+def mailed_code():
+    return re.search(r'Ваш код: (\S+)', mail.outbox[-1].body).group(1)
+
+
+class TestConfirmationCodes:
+
+    def setup_method(self):
+        self.user = User.objects.create(
+            username='coded', email='coded@yamdb.ru'
+        )
+
+    def test_issue_stores_only_hash(self):
+        code = issue_code(self.user)
+        stored = ConfirmationCode.objects.get(user=self.user)
+        assert code not in stored.code_hash, (
+            'Проверьте, что в базе хранится только хеш кода'
+        )
+        assert stored.used_at is None
+        assert stored.expires_at > timezone.now()
+
+    def test_consume(self):
+        code = issue_code(self.user)
+        assert consume_code('someone-else', code) is None, (
+            'Проверьте, что код привязан к имени пользователя'
+        )
+        assert consume_code(self.user.username, code) == self.user.pk
+
+    def test_reuse_rejected(self):
+        code = issue_code(self.user)
+        assert consume_code(self.user.username, code) == self.user.pk
+        assert consume_code(self.user.username, code) is None, (
+            'Проверьте, что код нельзя использовать повторно'
+        )
+
+    def test_expired_rejected(self):
+        code = issue_code(self.user)
+        ConfirmationCode.objects.filter(user=self.user).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        assert consume_code(self.user.username, code) is None, (
+            'Проверьте, что истёкший код не принимается'
+        )
+
+    def test_purge_codes(self):
+        used = issue_code(self.user)
+        consume_code(self.user.username, used)
+        issue_code(self.user)
+        ConfirmationCode.objects.filter(
+            user=self.user, used_at__isnull=True
+        ).update(expires_at=timezone.now() - timedelta(seconds=1))
+        fresh = issue_code(self.user)
+        assert purge_codes(batch_size=1) == 2, (
+            'Проверьте, что purge_codes удаляет использованные и истёкшие коды'
+        )
+        assert consume_code(self.user.username, fresh) == self.user.pk
+
+
+class TestSignupResend:
+
+    def test_existing_user_gets_new_code(self):
+        client = APIClient()
+        data = {'username': 'returning', 'email': 'returning@yamdb.ru'}
+        assert client.post(SIGNUP_URL, data).status_code == 200
+        first = mailed_code()
+        response = client.post(TOKEN_URL, {
+            'username': 'returning', 'confirmation_code': first
+        })
+        assert response.status_code == 200
+        response = client.post(TOKEN_URL, {
+            'username': 'returning', 'confirmation_code': first
+        })
+        assert response.status_code == 400
+
+        response = client.post(SIGNUP_URL, data)
+        assert response.status_code == 200, (
+            'Проверьте, что повторная регистрация существующего '
+            'пользователя отправляет новый код'
+        )
+        assert User.objects.filter(username='returning').count() == 1
+        second = mailed_code()
+        assert second != first
+        response = client.post(TOKEN_URL, {
+            'username': 'returning', 'confirmation_code': second
+        })
+        assert response.status_code == 200
+
+    def test_taken_username_with_other_email(self):
+        User.objects.create(username='taken', email='taken@yamdb.ru')
+        response = APIClient().post(
+            SIGNUP_URL, {'username': 'taken', 'email': 'other@yamdb.ru'}
+        )
+        assert response.status_code == 400
+        assert not mail.outbox
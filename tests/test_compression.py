@@ -0,0 +1,113 @@
+import gzip
+import os
+import re
+
+import pytest
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from api_yamdb.middleware import CompressionMiddleware
+
+from .conftest import infra_dir_path
+
+BODY = ('{"name": "Произведение", "year": 2000}' * 100).encode()
+
+
+def respond(accept_encoding='', body=BODY, content_type='application/json'):
+    middleware = CompressionMiddleware(
+        lambda request: HttpResponse(body, content_type=content_type)
+    )
+    headers = {}
+    if accept_encoding:
+        headers['HTTP_ACCEPT_ENCODING'] = accept_encoding
+    return middleware(RequestFactory().get('/api/v1/titles/', **headers))
+
+
+class TestCompressionMiddleware:
+
+    def test_gzip(self):
+        response = respond('gzip, deflate')
+        assert response['Content-Encoding'] == 'gzip', (
+            'Проверьте, что большой ответ сжимается gzip'
+        )
+        assert gzip.decompress(response.content) == BODY, (
+            'Проверьте, что сжатый ответ распаковывается в исходный'
+        )
+        assert int(response['Content-Length']) < len(BODY), (
+            'Проверьте, что Content-Length соответствует сжатому ответу'
+        )
+        assert 'Accept-Encoding' in response['Vary'], (
+            'Проверьте, что ответ содержит Vary: Accept-Encoding'
+        )
+
+    def test_brotli(self):
+        brotli = pytest.importorskip('brotli')
+        response = respond('gzip, br')
+        assert response['Content-Encoding'] == 'br', (
+            'Проверьте, что при поддержке клиентом используется brotli'
+        )
+        assert brotli.decompress(response.content) == BODY
+
+    def test_small_response_not_compressed(self):
+        response = respond('gzip', body=b'{"count": 0}')
+        assert not response.has_header('Content-Encoding'), (
+            'Проверьте, что ответы меньше COMPRESSION_MIN_SIZE не сжимаются'
+        )
+
+    def test_without_accept_encoding(self):
+        response = respond()
+        assert not response.has_header('Content-Encoding')
+        assert response.content == BODY
+
+    def test_binary_content_not_compressed(self):
+        response = respond('gzip', content_type='image/png')
+        assert not response.has_header('Content-Encoding'), (
+            'Проверьте, что сжимаются только текстовые типы'
+        )
+
+
+class TestCompressedStaticStorage:
+
+    def test_collectstatic(self, tmp_path):
+        source = tmp_path / 'source'
+        source.mkdir()
+        (source / 'app.css').write_text('body { color: black; }\n' * 50)
+        (source / 'tiny.css').write_text('a {}')
+        target = tmp_path / 'static'
+        with override_settings(
+            STATIC_ROOT=str(target),
+            STATICFILES_STORAGE=(
+                'api_yamdb.storage.CompressedManifestStaticFilesStorage'
+            ),
+            STATICFILES_DIRS=[str(source)],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder',
+            ],
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        files = os.listdir(str(target))
+        hashed = [
+            name for name in files
+            if re.fullmatch(r'app\.[0-9a-f]{12}\.css', name)
+        ]
+        assert hashed, 'Проверьте, что в имена статики добавляется хеш'
+        assert hashed[0] + '.gz' in files, (
+            'Проверьте, что для статики собираются .gz копии'
+        )
+        assert 'tiny.css.gz' not in files, (
+            'Проверьте, что маленькие файлы не сжимаются'
+        )
+
+
+class TestNginxConfig:
+
+    def test_static_caching(self):
+        with open(os.path.join(infra_dir_path, 'nginx', 'default.conf')) as f:
+            config = f.read()
+        assert 'gzip_static on;' in config, (
+            'Проверьте, что nginx отдаёт готовые .gz копии статики'
+        )
+        assert 'immutable' in config, (
+            'Проверьте, что статика с хешем в имени кешируется бессрочно'
+        )
@@ -0,0 +1,151 @@
+import pytest
+from rest_framework.test import APIClient
+
+from reviews import dedup
+from reviews.models import Review, TextBand, TextSignature, User
+
+from .factories import seed
+
+TEXT = (
+    'Отличный фильм, смотрел на одном дыхании: сюжет держит до самого '
+    'конца, актёры играют убедительно, музыка запоминается надолго.'
+)
+EDITED = TEXT.replace('надолго', 'навсегда') + ' Всем советую!'
+OTHER = (
+    'Скучная книга: герои картонные, диалоги натянутые, а финал '
+    'угадывается уже с первых страниц, дочитал с трудом.'
+)
+REVIEW = TextSignature.REVIEW
+
+
+class TestDuplicateText:
+
+    def test_short_text_skipped(self):
+        assert dedup.minhash('Отлично!') is None, (
+            'Проверьте, что короткие тексты не проверяются на повторы'
+        )
+
+    def test_near_duplicate_similarity(self):
+        signature = dedup.minhash(TEXT)
+        assert len(signature) == dedup.NUM_PERM
+        assert len(dedup.band_keys(signature)) == dedup.BANDS
+        assert dedup.minhash(TEXT.upper()) == signature, (
+            'Проверьте, что регистр не влияет на сигнатуру'
+        )
+        assert dedup.similarity(signature, dedup.minhash(EDITED)) >= 0.7
+        assert dedup.similarity(signature, dedup.minhash(OTHER)) < 0.3
+        assert dedup.unpack(dedup.pack(signature)) == signature
+
+    def test_numpy_fallback(self, monkeypatch):
+        signature = dedup.minhash(TEXT)
+        monkeypatch.setattr(dedup, 'np', None)
+        assert dedup.minhash(TEXT) == signature, (
+            'Проверьте, что без numpy сигнатура считается так же'
+        )
+
+
+def clear_text_index():
+    # Общий индекс процесса мог запомнить объекты прошлых тестов, а в
+    # транзакции теста он не обновляется после сохранения (on_commit).
+    for cache in (dedup.text_index.buckets, dedup.text_index.signatures):
+        cache.items.clear()
+
+
+@pytest.mark.django_db
+class TestTextIndex:
+
+    def setup_method(self):
+        clear_text_index()
+
+    def test_check_and_save(self):
+        index = dedup.TextIndex()
+        first, same, other = index.check_many([
+            (REVIEW, 1, TEXT), (REVIEW, 2, EDITED), (REVIEW, 3, OTHER),
+        ])
+        assert first.duplicate is None
+        assert same.duplicate == (REVIEW, 1), (
+            'Проверьте, что тексты сравниваются внутри пачки'
+        )
+        assert other.duplicate is None
+        index.save_many([first, other])
+        assert TextSignature.objects.count() == 2
+        assert TextBand.objects.count() == 2 * dedup.BANDS
+        check = dedup.TextIndex().check(TextSignature.COMMENT, EDITED)
+        assert check.duplicate == (REVIEW, 1)
+        assert check.similarity >= 0.7
+
+    def test_empty_buckets_cached_briefly(self, settings):
+        settings.DUPLICATE_TEXT_SHORT_CACHE_TTL = 0
+        index = dedup.TextIndex()
+        assert index.check(REVIEW, TEXT).duplicate is None
+        # Текст сохраняет другой процесс со своим кешем.
+        other = dedup.TextIndex()
+        other.save_many([other.check(REVIEW, TEXT, 1)])
+        assert index.check(REVIEW, EDITED).duplicate == (REVIEW, 1), (
+            'Проверьте, что пустые корзины не кешируются надолго'
+        )
+
+    def test_candidates_limit_keeps_newest(self, settings):
+        settings.DUPLICATE_TEXT_MAX_CANDIDATES = 1
+        index = dedup.TextIndex()
+        index.save_many(
+            index.check_many([(REVIEW, pk, TEXT) for pk in (3, 1, 2)])
+        )
+        assert dedup.TextIndex().check(REVIEW, TEXT).duplicate == (
+            REVIEW, 3
+        ), 'Проверьте, что при усечении корзин остаются новые тексты'
+
+    def test_backfill(self):
+        data = seed(titles=1, reviews_per_title=3, users=3, prefix='dedup')
+        for pk, text in zip(data.reviews, (TEXT, OTHER, EDITED)):
+            Review.objects.filter(pk=pk).update(text=text)
+        assert dedup.backfill(Review, REVIEW, batch_size=1000) == (3, 1)
+        signature = TextSignature.objects.get(
+            kind=REVIEW, object_id=data.reviews[2]
+        )
+        assert signature.duplicate_kind == REVIEW
+        assert signature.duplicate_id == data.reviews[0], (
+            'Проверьте, что поздний текст помечается повтором раннего'
+        )
+        assert dedup.backfill(Review, REVIEW, batch_size=1000) == (0, 0)
+
+
+@pytest.mark.django_db
+class TestDuplicateTextApi:
+
+    def setup_method(self):
+        data = seed(titles=1, reviews_per_title=1, users=3, prefix='spam')
+        self.url = f'/api/v1/titles/{data.titles[0]}/reviews/'
+        self.clients = []
+        for user in User.objects.filter(pk__in=data.users[1:]):
+            client = APIClient()
+            client.force_authenticate(user)
+            self.clients.append(client)
+
+    def post(self, client, text):
+        clear_text_index()
+        return client.post(self.url, {'text': text, 'score': 5})
+
+    def test_duplicate_flagged(self, settings):
+        settings.DUPLICATE_TEXT_ACTION = 'flag'
+        first = self.post(self.clients[0], TEXT)
+        assert first.status_code == 201
+        response = self.post(self.clients[1], EDITED)
+        assert response.status_code == 201, (
+            'Проверьте, что при DUPLICATE_TEXT_ACTION=flag повтор публикуется'
+        )
+        signature = TextSignature.objects.get(
+            kind=REVIEW, object_id=response.data['id']
+        )
+        assert signature.duplicate_id == first.data['id']
+
+    def test_duplicate_rejected(self, settings):
+        settings.DUPLICATE_TEXT_ACTION = 'reject'
+        assert self.post(self.clients[0], TEXT).status_code == 201
+        response = self.post(self.clients[1], EDITED)
+        assert response.status_code == 400, (
+            'Проверьте, что при DUPLICATE_TEXT_ACTION=reject повтор '
+            'отклоняется'
+        )
+        assert list(response.data) == ['text']
+        assert self.post(self.clients[1], OTHER).status_code == 201
@@ -0,0 +1,262 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.contrib import admin
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.mixins import AsyncDestroyMixin
+from reviews.jobs import claim_next, enqueue, run
+from reviews.models import (Comment, Job, Review, TextBand, TextSignature,
+                            Title, TitleAggregateEvent, User)
+from reviews.stats import recount_user_stats
+
+from .factories import create_users, seed
+
+pytestmark = pytest.mark.django_db
+
+
+def running_job(seconds_ago):
+    moment = timezone.now() - timedelta(seconds=seconds_ago)
+    return Job.objects.create(
+        kind=Job.DELETE_TITLE, object_id=1, status=Job.RUNNING,
+        started=moment, heartbeat=moment, processed=10,
+    )
+
+
+class TestJobLease:
+
+    def test_live_job_not_claimed(self, settings):
+        settings.JOB_LEASE_TIMEOUT = 60
+        job = running_job(30)
+        assert claim_next() is None
+        assert enqueue(Job.DELETE_TITLE, 1) == job
+
+    def test_abandoned_job_claimed_again(self, settings):
+        settings.JOB_LEASE_TIMEOUT = 60
+        job = running_job(120)
+        claimed = claim_next()
+        assert claimed == job, (
+            'Проверьте, что задача упавшего воркера снова выполняется'
+        )
+        assert claimed.status == Job.RUNNING
+        assert claimed.processed == 0
+        assert timezone.now() - claimed.heartbeat < timedelta(seconds=5)
+
+    def test_enqueue_requeues_abandoned_job(self, settings):
+        settings.JOB_LEASE_TIMEOUT = 60
+        job = running_job(120)
+        assert enqueue(Job.DELETE_TITLE, 1) == job
+        job.refresh_from_db()
+        assert job.status == Job.PENDING, (
+            'Проверьте, что брошенная задача возвращается в очередь'
+        )
+        assert Job.objects.count() == 1
+
+
+class TestAsyncDestroyMixin:
+
+    def test_required_attributes(self):
+        with pytest.raises(ImproperlyConfigured):
+            type('View', (AsyncDestroyMixin,), {})
+        with pytest.raises(ImproperlyConfigured):
+            type('View', (AsyncDestroyMixin,), {
+                'delete_job_kind': Job.RECOUNT_USER_STATS,
+            })
+
+    def test_cascade_size(self, settings):
+        settings.ASYNC_DELETE_THRESHOLD = 100
+        data = seed(titles=2, reviews_per_title=3, comments_per_review=2,
+                    users=5, prefix='cascade')
+        title = Title.objects.get(pk=data.titles[0])
+        Title.objects.filter(pk=title.pk).update(reviews_count=0)
+        view = type('View', (AsyncDestroyMixin,), {
+            'delete_job_kind': Job.DELETE_TITLE,
+        })()
+        assert view.get_cascade_size(title) == 3 + 6, (
+            'Проверьте, что размер каскада считается по отзывам и '
+            'комментариям, а не по счётчикам'
+        )
+
+        author = User.objects.get(pk=create_users(1, 'author')[0])
+        review = Review.objects.create(
+            title=title, author=author, text='Отзыв', score=5
+        )
+        Comment.objects.bulk_create(
+            Comment(review=review, author_id=user_id, text='Ответ')
+            for user_id in data.users
+        )
+        view = type('View', (AsyncDestroyMixin,), {
+            'delete_job_kind': Job.DELETE_USER,
+        })()
+        assert view.get_cascade_size(author) == 1 + 5, (
+            'Проверьте, что учитываются чужие комментарии к отзывам '
+            'пользователя'
+        )
+        settings.ASYNC_DELETE_THRESHOLD = 4
+        assert view.get_cascade_size(author) == 4
+
+
+class TestRebuildJobs:
+
+    def setup_method(self):
+        self.data = seed(titles=7, users=5, prefix='rebuild')
+
+    def run_job(self, kind, settings):
+        settings.JOB_CHUNK_SIZE = 2
+        settings.JOB_LEASE_TIMEOUT = 60
+        enqueue(kind)
+        job = claim_next()
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - timedelta(seconds=120)
+        )
+        run(job)
+        job.refresh_from_db()
+        assert job.status == Job.DONE
+        assert job.processed == job.total
+        assert timezone.now() - job.heartbeat < timedelta(seconds=5), (
+            'Проверьте, что задача продлевает аренду между пачками'
+        )
+
+    def test_rebuild_aggregates(self, settings):
+        expected = dict(Title.objects.values_list('pk', 'rating'))
+        Title.objects.update(reviews_count=0, score_sum=0, rating=None)
+        TitleAggregateEvent.objects.create(
+            title_id=self.data.titles[0], reviews_delta=1, score_delta=5
+        )
+        self.run_job(Job.REBUILD_TITLE_AGGREGATES, settings)
+        assert dict(Title.objects.values_list('pk', 'rating')) == expected
+        assert not TitleAggregateEvent.objects.exists()
+
+    def test_admin_rebuild_selected_titles(self, settings):
+        settings.JOB_CHUNK_SIZE = 2
+        selected = self.data.titles[:5]
+        expected = dict(Title.objects.values_list('pk', 'rating'))
+        Title.objects.update(reviews_count=0, score_sum=0, rating=None)
+        request = RequestFactory().post('/admin/reviews/title/')
+        request.user = User.objects.get(pk=self.data.users[0])
+        model_admin = admin.site._registry[Title]
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.rebuild_aggregates(
+                request, Title.objects.filter(pk__in=selected)
+            )
+        jobs = Job.objects.filter(kind=Job.REBUILD_TITLE_AGGREGATES)
+        assert jobs.count() == 3, (
+            'Проверьте, что выбранные произведения ставятся в задачи '
+            'пачками по JOB_CHUNK_SIZE'
+        )
+        assert sorted(
+            int(pk) for ids in jobs.values_list('object_ids', flat=True)
+            for pk in ids.split(',')
+        ) == sorted(selected)
+        settings.JOB_LEASE_TIMEOUT = 60
+        while True:
+            job = claim_next()
+            if job is None:
+                break
+            run(job)
+            assert job.total <= 2
+        ratings = dict(Title.objects.values_list('pk', 'rating'))
+        assert {pk: ratings[pk] for pk in selected} == {
+            pk: expected[pk] for pk in selected
+        }, 'Проверьте, что пересчитываются только выбранные произведения'
+        assert all(
+            ratings[pk] is None for pk in self.data.titles[5:]
+        )
+
+    def test_recount_users(self, settings):
+        fields = ('pk', 'reviews_count', 'comments_count', 'score_sum')
+        expected = set(User.objects.values_list(*fields))
+        User.objects.update(reviews_count=0, comments_count=0, score_sum=0)
+        self.run_job(Job.RECOUNT_USER_STATS, settings)
+        assert set(User.objects.values_list(*fields)) == expected
+
+
+class TestDeleteJobs:
+
+    def setup_method(self):
+        # Каждый из пяти пользователей пишет по отзыву на все произведения.
+        self.data = seed(titles=30, reviews_per_title=5, comments_per_review=3,
+                         users=5, prefix='purge')
+        self.user_id = self.data.users[0]
+        texts = [
+            (TextSignature.REVIEW, Review.objects.filter(
+                title_id__in=self.data.titles
+            )),
+            (TextSignature.COMMENT, Comment.objects.filter(
+                review__title_id__in=self.data.titles
+            )),
+        ]
+        for kind, queryset in texts:
+            pks = list(queryset.values_list('pk', flat=True))
+            TextSignature.objects.bulk_create(
+                TextSignature(kind=kind, object_id=pk, signature=b'')
+                for pk in pks
+            )
+            TextBand.objects.bulk_create(
+                TextBand(key=pk, kind=kind, object_id=pk) for pk in pks
+            )
+
+    def test_delete_user(self, settings):
+        settings.JOB_CHUNK_SIZE = 100
+        user_ids = self.data.users
+        comments = Comment.objects.filter(
+            Q(author_id=self.user_id) | Q(review__author_id=self.user_id)
+        )
+        deleted = {
+            (TextSignature.REVIEW, pk) for pk in Review.objects.filter(
+                author_id=self.user_id
+            ).values_list('pk', flat=True)
+        } | {
+            (TextSignature.COMMENT, pk)
+            for pk in comments.values_list('pk', flat=True)
+        }
+        rows = len(deleted)
+        events = TitleAggregateEvent.objects.filter(
+            title_id__in=self.data.titles
+        )
+        events.delete()
+        signatures = TextSignature.objects.count()
+
+        enqueue(Job.DELETE_USER, self.user_id)
+        with CaptureQueriesContext(connection) as context:
+            run(claim_next())
+        assert len(context.captured_queries) < rows, (
+            'Проверьте, что удаление пачки не выполняет запросов '
+            'для каждой строки'
+        )
+        assert not User.objects.filter(pk=self.user_id).exists()
+
+        fields = ('pk', 'reviews_count', 'comments_count', 'score_sum')
+        counters = set(
+            User.objects.filter(pk__in=user_ids).values_list(*fields)
+        )
+        recount_user_stats(User, Review, Comment, user_ids)
+        assert counters == set(
+            User.objects.filter(pk__in=user_ids).values_list(*fields)
+        ), 'Проверьте, что счётчики авторов пачки уменьшаются'
+
+        assert sorted(events.values_list('title_id', 'reviews_delta')) == [
+            (title_id, -1) for title_id in sorted(self.data.titles)
+        ]
+        assert not events.filter(review_date__isnull=True).exists(), (
+            'Проверьте, что события удаления отзывов несут дату отзыва'
+        )
+
+        remaining = set(TextSignature.objects.filter(
+            object_id__in=[pk for _, pk in deleted]
+        ).values_list('kind', 'object_id'))
+        assert not remaining & deleted, (
+            'Проверьте, что сигнатуры удалённых текстов удаляются'
+        )
+        assert TextSignature.objects.count() == signatures - rows
+        assert not TextBand.objects.filter(
+            kind=TextSignature.REVIEW,
+            object_id__in=[pk for kind, pk in deleted
+                           if kind == TextSignature.REVIEW],
+        ).exists()
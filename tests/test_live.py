@@ -0,0 +1,169 @@
+import asyncio
+import re
+
+from reviews import live
+from reviews.live import REVIEW, Broker, Event, SentEvents, parse_event_id
+
+
+def event(timestamp, pk, title_id=1):
+    return Event((timestamp, REVIEW, pk), title_id, REVIEW, {'id': pk})
+
+
+class TestLiveFeedBroker:
+
+    def setup_method(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def teardown_method(self):
+        self.loop.close()
+
+    def test_event_id(self):
+        assert parse_event_id(event(1500, 7).id) == (1500, REVIEW, 7)
+        for value in ('', None, 'abc', '1-review', '1-user-2', 'x-review-1'):
+            assert parse_event_id(value) is None, (
+                'Проверьте, что некорректный Last-Event-ID игнорируется'
+            )
+
+    def test_dispatch_to_title_subscribers(self):
+        broker = Broker(
+            history_size=10, history_titles=10, queue_size=10,
+            max_subscribers=2,
+        )
+        first = broker.subscribe(1)
+        other = broker.subscribe(2)
+        assert broker.subscribe(1) is None, (
+            'Проверьте, что число подписчиков ограничено'
+        )
+        broker.dispatch(event(1, 1))
+        assert first.queue.qsize() == 1
+        assert other.queue.qsize() == 0, (
+            'Проверьте, что события приходят только подписчикам произведения'
+        )
+        broker.unsubscribe(first)
+        broker.unsubscribe(first)
+        assert broker.count == 1
+        assert broker.subscribe(1) is not None
+
+    def test_slow_subscriber_overflows(self):
+        broker = Broker(
+            history_size=10, history_titles=10, queue_size=2,
+            max_subscribers=10,
+        )
+        subscription = broker.subscribe(1)
+        for pk in range(3):
+            broker.dispatch(event(pk, pk))
+        assert subscription.overflowed, (
+            'Проверьте, что переполнение очереди отключает медленного клиента'
+        )
+        assert subscription.queue.qsize() == 2
+
+    def test_replay(self):
+        broker = Broker(
+            history_size=3, history_titles=10, queue_size=10,
+            max_subscribers=10,
+        )
+        for pk in (1, 3, 2, 3):
+            broker.dispatch(event(pk, pk))
+        assert [item.key[0] for item in broker.history[1]] == [1, 2, 3], (
+            'Проверьте, что история упорядочена и без повторов'
+        )
+        assert [item.id for item in broker.replay(1, (1, REVIEW, 1))] == [
+            event(2, 2).id, event(3, 3).id,
+        ]
+        broker.dispatch(event(4, 4))
+        assert broker.replay(1, (1, REVIEW, 1)) is None, (
+            'Проверьте, что при пропуске старше истории события читаются '
+            'из базы'
+        )
+        assert broker.replay(2, (1, REVIEW, 1)) is None
+
+    def test_history_titles_limited(self):
+        broker = Broker(
+            history_size=3, history_titles=2, queue_size=10,
+            max_subscribers=10,
+        )
+        broker.dispatch(event(1, 1, title_id=1))
+        broker.dispatch(event(2, 2, title_id=2))
+        broker.subscribe(1)
+        broker.dispatch(event(3, 3, title_id=3))
+        assert list(broker.history) == [1, 3], (
+            'Проверьте, что история хранится только для недавно активных '
+            'произведений'
+        )
+        assert broker.replay(2, (2, REVIEW, 2)) is None
+        assert broker.replay(1, (1, REVIEW, 1)) == []
+
+
+class TestLiveFeedStream:
+
+    def setup_method(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def teardown_method(self):
+        self.loop.close()
+
+    def test_sent_events_window(self):
+        sent = SentEvents(2)
+        assert sent.add(1) and sent.add(2)
+        assert not sent.add(1)
+        assert sent.add(3)
+        assert sent.add(1), 'Проверьте, что окно ключей ограничено'
+
+    def test_late_events_delivered(self, monkeypatch):
+        from api_yamdb import asgi
+
+        broker = Broker(
+            history_size=10, history_titles=10, queue_size=10,
+            max_subscribers=10,
+        )
+        monkeypatch.setattr(live, 'broker', broker)
+
+        async def title_exists(pk):
+            return True
+
+        monkeypatch.setattr(asgi, 'title_exists', title_exists)
+        broker.dispatch(event(1, 1))
+        broker.dispatch(event(2, 2))
+        scope = {
+            'type': 'http', 'method': 'GET', 'headers': [],
+            'query_string': b'last_event_id=' + event(1, 1).id.encode(),
+        }
+        messages = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        async def scenario():
+            feed = asyncio.ensure_future(
+                asgi.live_feed(scope, receive, send, 1)
+            )
+            while not messages:
+                await asyncio.sleep(0)
+            subscription, = broker.subscribers[1]
+            # Повтор уже отправленного из истории и опоздавшее событие.
+            subscription.push(event(2, 2))
+            broker.dispatch(event(5, 5))
+            broker.dispatch(event(4, 4))
+            while subscription.queue.qsize():
+                await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            disconnect.set()
+            await feed
+
+        self.loop.run_until_complete(scenario())
+        body = b''.join(
+            message.get('body', b'') for message in messages
+        ).decode()
+        assert re.findall(r'^id: (\S+)$', body, re.M) == [
+            event(2, 2).id, event(5, 5).id, event(4, 4).id,
+        ], (
+            'Проверьте, что опоздавшие события доходят до подключённых '
+            'клиентов, а повторы отсекаются'
+        )
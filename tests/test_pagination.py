@@ -0,0 +1,158 @@
+import pytest
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.db import connection
+from rest_framework.test import APIClient
+
+from reviews.models import Review, Title
+from reviews.paginator import EstimatedCountPaginator, estimated_count
+from reviews.partitions import (REVIEW_TABLE, default_partition_name,
+                                partition_tables, partitions)
+
+from .factories import seed
+
+
+@pytest.mark.django_db
+class TestEstimatedCountPaginator:
+
+    def setup_method(self):
+        cache.clear()
+
+    def titles(self, count):
+        ids = seed(
+            titles=count, reviews_per_title=1, comments_per_review=0,
+            prefix='page',
+        ).titles
+        return Title.objects.filter(pk__in=ids).order_by('pk')
+
+    def test_small_list_counted_exactly(self, settings):
+        settings.EXACT_COUNT_LIMIT = 100
+        paginator = EstimatedCountPaginator(
+            self.titles(42), 10, estimate=lambda: 1000
+        )
+        assert paginator.count == 42, (
+            'Проверьте, что небольшие списки считаются точно'
+        )
+        assert paginator.num_pages == 5
+
+    def test_large_list_estimated_and_cached(
+        self, settings, django_assert_num_queries
+    ):
+        settings.EXACT_COUNT_LIMIT = 100
+        titles = self.titles(150)
+        with django_assert_num_queries(1):
+            paginator = EstimatedCountPaginator(
+                titles, 10, estimate=lambda: 999000
+            )
+            assert paginator.count == 999000, (
+                'Проверьте, что для большого списка используется оценка'
+            )
+        with django_assert_num_queries(0):
+            assert EstimatedCountPaginator(titles, 10).count == 999000, (
+                'Проверьте, что оценка кешируется и следующие страницы не '
+                'считают строки'
+            )
+
+    def test_estimate_not_below_counted(self, settings):
+        settings.EXACT_COUNT_LIMIT = 100
+        paginator = EstimatedCountPaginator(
+            self.titles(150), 10, estimate=lambda: 3
+        )
+        assert paginator.count == 101
+
+    def test_tail_page_past_low_estimate(self, settings):
+        settings.EXACT_COUNT_LIMIT = 100
+        titles = self.titles(250)
+        paginator = EstimatedCountPaginator(
+            titles, 10, estimate=lambda: 101
+        )
+        assert paginator.num_pages == 11
+        page = paginator.page(25)
+        assert len(page) == 10, (
+            'Проверьте, что страница за концом заниженной оценки отдаётся, '
+            'если на ней есть строки'
+        )
+        assert not page.has_next()
+        assert paginator.count == 250
+        assert EstimatedCountPaginator(titles, 10).count == 250
+        page = EstimatedCountPaginator(titles, 10).page(24)
+        assert page.has_next()
+        with pytest.raises(EmptyPage):
+            EstimatedCountPaginator(titles, 10).page(26)
+
+    def test_review_list_tail_page_past_counter(self, settings):
+        settings.EXACT_COUNT_LIMIT = 100
+        data = seed(
+            titles=1, reviews_per_title=150, comments_per_review=0,
+            prefix='lagging',
+        )
+        Title.objects.filter(pk=data.titles[0]).update(reviews_count=101)
+        response = APIClient().get(
+            f'/api/v1/titles/{data.titles[0]}/reviews/?page=15'
+        )
+        assert response.status_code == 200, (
+            'Проверьте, что отстающий счётчик не даёт 404 на последних '
+            'страницах'
+        )
+        assert len(response.data['results']) == 10
+        assert response.data['next'] is None
+
+    def test_review_list_uses_counter(self, settings):
+        settings.EXACT_COUNT_LIMIT = 100
+        data = seed(
+            titles=1, reviews_per_title=150, comments_per_review=0,
+            prefix='counter',
+        )
+        Title.objects.filter(pk=data.titles[0]).update(reviews_count=1000)
+        response = APIClient().get(
+            f'/api/v1/titles/{data.titles[0]}/reviews/'
+        )
+        assert response.status_code == 200
+        assert response.data['count'] == 1000, (
+            'Проверьте, что count списка отзывов берётся из счётчика '
+            'произведения'
+        )
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db
+class TestPlannerEstimate:
+
+    def assert_close(self, estimate, exact):
+        assert abs(estimate - exact) <= exact * 0.2, (
+            'Проверьте, что оценка близка к числу строк'
+        )
+
+    def test_filtered_estimate(self, dataset):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE reviews_title')
+        queryset = Title.objects.filter(year__gte=2000)
+        self.assert_close(estimated_count(queryset), queryset.count())
+
+    def test_table_estimate(self, dataset):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE reviews_review')
+        self.assert_close(
+            estimated_count(Review.objects.all()), Review.objects.count()
+        )
+
+    def test_partitioned_table_estimate(self, dataset):
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        partition_tables(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {REVIEW_TABLE} WHERE id % 2 = 0')
+            # Autovacuum анализирует только секции, статистика самой
+            # секционированной таблицы не обновляется.
+            for name in partitions(cursor, REVIEW_TABLE).values():
+                cursor.execute(f'ANALYZE {name}')
+            cursor.execute(f'ANALYZE {default_partition_name(REVIEW_TABLE)}')
+        self.assert_close(
+            estimated_count(Review.objects.all()), Review.objects.count()
+        )
+
+    def test_admin_changelist_above_limit(self, dataset, settings):
+        settings.EXACT_COUNT_LIMIT = 100
+        queryset = Title.objects.filter(year__gte=2000)
+        paginator = EstimatedCountPaginator(queryset, 50)
+        assert paginator.count > 100
@@ -0,0 +1,171 @@
+import gzip
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+
+from reviews import partitions
+from reviews.jobs import claim_next, run
+from reviews.models import (Comment, Job, Review, TextBand, TextSignature,
+                            Title, User)
+from reviews.partitions import add_months, month_start, partition_name
+
+from .factories import seed
+
+ARCHIVED_MONTH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.postgres
+@pytest.mark.django_db
+class TestPartitionedTables:
+
+    def setup_method(self):
+        self.data = seed(
+            titles=2, reviews_per_title=2, users=4, prefix='part'
+        )
+        # Отзыв старого месяца, комментарий к нему — текущего.
+        self.archived = self.data.reviews[0]
+        self.archived_comment = Comment.objects.get(review=self.archived)
+        self.author = Review.objects.get(pk=self.archived).author_id
+        Review.objects.filter(pk=self.archived).update(
+            pub_date=datetime(2020, 1, 15, tzinfo=timezone.utc)
+        )
+        self.reviews = Review.objects.count()
+        self.comments = Comment.objects.count()
+        with connection.cursor() as cursor:
+            # ALTER TABLE не выполняется, пока в транзакции теста есть
+            # отложенные проверки внешних ключей.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        partitions.partition_tables(connection)
+
+    def create_duplicate(self):
+        review = Review.objects.get(pk=self.data.reviews[1])
+        with transaction.atomic():
+            Review.objects.create(
+                title_id=review.title_id, author_id=review.author_id,
+                text='Повтор', score=5,
+            )
+
+    def test_partitioned_tables(self):
+        with connection.cursor() as cursor:
+            assert partitions.is_partitioned(cursor, partitions.REVIEW_TABLE)
+            assert ARCHIVED_MONTH in partitions.partitions(
+                cursor, partitions.REVIEW_TABLE
+            )
+        assert Review.objects.count() == self.reviews
+        with pytest.raises(IntegrityError):
+            self.create_duplicate()
+        Review.objects.create(
+            title_id=self.data.titles[1], author_id=self.data.users[0],
+            text='Новый отзыв', score=5,
+        )
+        assert Review.objects.count() == self.reviews + 1
+
+    def test_archive_updates_counters(self, tmp_path):
+        title = Review.objects.get(pk=self.archived).title_id
+        call_command(
+            'manage_review_partitions', '--archive-before=2020-02',
+            f'--archive-dir={tmp_path}', stdout=StringIO(),
+        )
+        assert not Review.objects.filter(pk=self.archived).exists()
+        assert not Comment.objects.filter(review_id=self.archived).exists(), (
+            'Проверьте, что комментарии к выгруженным отзывам удаляются'
+        )
+        name = partition_name(
+            partitions.COMMENT_TABLE, ARCHIVED_MONTH
+        )
+        with gzip.open(tmp_path / f'{name}.csv.gz', 'rt') as archive:
+            assert archive.read().splitlines()[1].startswith(
+                f'{self.archived_comment.pk},'
+            ), 'Проверьте, что комментарии выгружаются вместе с отзывом'
+        while True:
+            job = claim_next()
+            if job is None:
+                break
+            run(job)
+            assert job.status == Job.DONE
+        assert Title.objects.get(pk=title).reviews_count == 1, (
+            'Проверьте, что после выгрузки пересчитываются рейтинги'
+        )
+        assert User.objects.get(pk=self.author).reviews_count == (
+            Review.objects.filter(author_id=self.author).count()
+        ), 'Проверьте, что после выгрузки пересчитываются счётчики'
+
+    def test_detach_moves_comments(self):
+        texts = [
+            (TextSignature.REVIEW, self.archived),
+            (TextSignature.COMMENT, self.archived_comment.pk),
+        ]
+        for kind, object_id in texts:
+            TextSignature.objects.create(
+                kind=kind, object_id=object_id, signature=b''
+            )
+            TextBand.objects.create(key=1, kind=kind, object_id=object_id)
+        call_command(
+            'manage_review_partitions', '--archive-before=2020-02',
+            '--detach-only', stdout=StringIO(),
+        )
+        assert not Review.objects.filter(pk=self.archived).exists()
+        assert not Comment.objects.filter(review_id=self.archived).exists(), (
+            'Проверьте, что в секциях не остаётся комментариев к '
+            'отсоединённым отзывам'
+        )
+        name = partition_name(
+            partitions.COMMENT_TABLE, ARCHIVED_MONTH
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {name}')
+            assert cursor.fetchall() == [(self.archived_comment.pk,)]
+        assert not TextSignature.objects.exists()
+        assert not TextBand.objects.exists(), (
+            'Проверьте, что сигнатуры отсоединённых текстов удаляются'
+        )
+
+    def test_unpartition(self):
+        partitions.unpartition_tables(connection)
+        with connection.cursor() as cursor:
+            assert not partitions.is_partitioned(
+                cursor, partitions.REVIEW_TABLE
+            )
+        assert Review.objects.count() == self.reviews
+        assert Comment.objects.count() == self.comments
+        with pytest.raises(IntegrityError):
+            self.create_duplicate()
+
+    def test_enable_command(self):
+        partitions.unpartition_tables(connection)
+        call_command(
+            'manage_review_partitions', '--enable', stdout=StringIO()
+        )
+        with connection.cursor() as cursor:
+            assert partitions.is_partitioned(
+                cursor, partitions.REVIEW_TABLE
+            ), (
+                'Проверьте, что --enable секционирует таблицы без отката '
+                'миграций'
+            )
+        assert Review.objects.count() == self.reviews
+        assert Comment.objects.count() == self.comments
+
+
+class TestReviewPartitions:
+
+    def test_month_arithmetic(self):
+        month = datetime(2026, 11, 1, tzinfo=timezone.utc)
+        assert add_months(month, 2) == datetime(2027, 1, 1,
+                                                tzinfo=timezone.utc)
+        assert add_months(month, -11) == datetime(2025, 12, 1,
+                                                  tzinfo=timezone.utc)
+        assert partition_name('reviews_review', month) == (
+            'reviews_review_p2026_11'
+        )
+
+    def test_month_start_in_utc(self):
+        moscow = timezone(timedelta(hours=3))
+        value = datetime(2026, 11, 1, 1, 30, tzinfo=moscow)
+        assert month_start(value) == datetime(2026, 10, 1,
+                                              tzinfo=timezone.utc), (
+            'Проверьте, что границы секций считаются в UTC'
+        )
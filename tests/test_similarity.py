@@ -0,0 +1,291 @@
+import math
+import random
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from reviews.models import (Category, Review, Title, TitleSimilarity,
+                            TitleSimilarityState)
+
+from .factories import create_users
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+
+from reviews import similarity  # noqa: E402
+from reviews.management.commands import (  # noqa: E402
+    build_title_similarity as similarity_command)
+from reviews.similarity import (ReviewMatrix,  # noqa: E402
+                                build_title_similarity)
+
+# Два пользователя со средней оценкой 5: после центрирования
+# произведения 1 и 2 — векторы (3, 4) и (3, 2), 3 и 4 — (-3, -4) и
+# (-3, -2). Похожи только пары 1–2 и 3–4.
+KNOWN_REVIEWS = [
+    (1, 10, 8), (2, 10, 8), (3, 10, 2), (4, 10, 2),
+    (1, 11, 9), (2, 11, 7), (3, 11, 1), (4, 11, 3),
+]
+KNOWN_COSINE = 17 / (5 * math.sqrt(13))
+
+
+def checksums(rows):
+    return ReviewMatrix(np.array(rows, dtype=np.int64)).checksums.tolist()
+
+
+class TestSimilarityChecksum:
+
+    def test_order_independent(self):
+        rows = [(1, 10, 5), (1, 11, 7), (2, 10, 3)]
+        assert checksums(rows) == checksums(rows[::-1])
+
+    def test_compensating_changes_detected(self):
+        before = checksums([(1, 10, 5), (1, 11, 7)])
+        assert checksums([(1, 10, 6), (1, 11, 6)]) != before, (
+            'Проверьте, что встречные изменения оценок меняют контрольную '
+            'сумму'
+        )
+        assert checksums([(1, 10, 5), (1, 12, 7)]) != before
+        assert checksums([(1, 10, 5), (1, 11, 7)]) == before
+
+
+def reference_neighbours(rows, count, min_common, shrinkage):
+    """Соседи по определению, перебором пар."""
+    ratings = {}
+    for title, user, score in rows:
+        ratings.setdefault(user, {})[title] = score
+    centered = {}
+    for user, scores in ratings.items():
+        mean = sum(scores.values()) / len(scores)
+        for title, score in scores.items():
+            centered.setdefault(title, {})[user] = score - mean
+    result = {}
+    for title, vector in centered.items():
+        candidates = []
+        for other, other_vector in centered.items():
+            common = vector.keys() & other_vector.keys()
+            if other == title or len(common) < min_common:
+                continue
+            norms = math.sqrt(
+                sum(value ** 2 for value in vector.values())
+                * sum(value ** 2 for value in other_vector.values())
+            )
+            if not norms:
+                continue
+            dot = sum(vector[user] * other_vector[user] for user in common)
+            score = dot / norms * len(common) / (len(common) + shrinkage)
+            if score > 0:
+                candidates.append((other, score))
+        candidates.sort(key=lambda item: -item[1])
+        result[title] = candidates[:count]
+    return result
+
+
+def neighbours(rows, count, min_common=1, shrinkage=0):
+    matrix = ReviewMatrix(np.array(rows, dtype=np.int64))
+    row, col, score, _ = matrix.neighbours(
+        np.arange(len(matrix.title_ids)), count, min_common, shrinkage
+    )
+    result = {int(title): [] for title in matrix.title_ids}
+    for title, similar, value in zip(row, col, score):
+        result[int(matrix.title_ids[title])].append(
+            (int(matrix.title_ids[similar]), float(value))
+        )
+    return result
+
+
+class TestReviewMatrixNeighbours:
+
+    def test_known_neighbours(self):
+        result = neighbours(KNOWN_REVIEWS, count=10)
+        assert {title: [pk for pk, _ in pairs]
+                for title, pairs in result.items()} == {
+            1: [2], 2: [1], 3: [4], 4: [3],
+        }, 'Проверьте, что соседями считаются только похожие произведения'
+        assert result[1][0][1] == pytest.approx(KNOWN_COSINE)
+
+    def test_shrinkage_and_min_common(self):
+        result = neighbours(KNOWN_REVIEWS, count=10, shrinkage=2)
+        assert result[3][0][1] == pytest.approx(KNOWN_COSINE / 2), (
+            'Проверьте множитель c / (c + SIMILARITY_SHRINKAGE)'
+        )
+        result = neighbours(KNOWN_REVIEWS, count=10, min_common=3)
+        assert not any(result.values())
+
+    def test_matches_reference(self):
+        rng = random.Random(0)
+        rows = [
+            (title, user, rng.randint(1, 10))
+            for title in range(1, 31)
+            for user in rng.sample(range(100, 120), 6)
+        ]
+        expected = reference_neighbours(
+            rows, count=3, min_common=2, shrinkage=1
+        )
+        result = neighbours(rows, count=3, min_common=2, shrinkage=1)
+        assert result.keys() == expected.keys()
+        for title, pairs in expected.items():
+            assert len(result[title]) == len(pairs) <= 3, (
+                'Проверьте, что у произведения не больше count соседей'
+            )
+            assert [value for _, value in result[title]] == pytest.approx(
+                [value for _, value in pairs]
+            )
+
+
+@pytest.mark.django_db
+class TestBuildTitleSimilarity:
+
+    @pytest.fixture(autouse=True)
+    def matrix(self, settings, monkeypatch):
+        settings.SIMILARITY_MIN_COMMON_REVIEWERS = 1
+        settings.SIMILARITY_SHRINKAGE = 0
+        category = Category.objects.create(name='Кино', slug='similar-movie')
+        self.titles = [
+            Title.objects.create(name=f'Фильм {index}', year=2000,
+                                 category=category)
+            for index in range(5)
+        ]
+        self.users = create_users(2, 'similar')
+        # Произведения 1–4 — из KNOWN_REVIEWS, пятое без отзывов.
+        for title, user, score in KNOWN_REVIEWS:
+            Review.objects.create(
+                title=self.titles[title - 1],
+                author_id=self.users[user - 10],
+                text='Отзыв', score=score,
+            )
+        # Отзывы общего набора из conftest в расчёт не попадают.
+        load_reviews = similarity.load_reviews
+        ids = [title.pk for title in self.titles]
+
+        def own_reviews():
+            rows = load_reviews()
+            return rows[np.isin(rows[:, 0], ids)]
+
+        monkeypatch.setattr(similarity, 'load_reviews', own_reviews)
+
+    def stored(self):
+        return {
+            (similarity.title_id, similarity.similar_id)
+            for similarity in TitleSimilarity.objects.all()
+        }
+
+    def pairs(self, *indexes):
+        return {
+            (self.titles[left].pk, self.titles[right].pk)
+            for left, right in indexes
+        }
+
+    def test_full_build(self):
+        assert build_title_similarity(full=True) == 4
+        assert self.stored() == self.pairs((0, 1), (1, 0), (2, 3), (3, 2))
+        assert TitleSimilarity.objects.get(
+            title=self.titles[0]
+        ).score == pytest.approx(KNOWN_COSINE, abs=1e-4)
+
+    def test_incremental_refresh(self):
+        build_title_similarity(full=True)
+        assert build_title_similarity() == 0, (
+            'Проверьте, что без изменений ничего не пересчитывается'
+        )
+        states = dict(TitleSimilarityState.objects.values_list(
+            'title_id', 'checksum'
+        ))
+        Review.objects.filter(
+            title=self.titles[0], author_id=self.users[1]
+        ).update(score=6)
+        with mock.patch.object(
+            similarity, 'save_block', wraps=similarity.save_block
+        ) as save_block:
+            assert build_title_similarity() == 4
+        refreshed = {
+            int(title_id)
+            for call in save_block.call_args_list
+            for title_id in call[0][0].title_ids[call[0][1]]
+        }
+        assert refreshed == {title.pk for title in self.titles[:4]}
+        new_states = dict(TitleSimilarityState.objects.values_list(
+            'title_id', 'checksum'
+        ))
+        changed = {pk for pk in states if states[pk] != new_states[pk]}
+        assert changed == {self.titles[0].pk}, (
+            'Проверьте, что отпечаток меняется только у изменённого '
+            'произведения'
+        )
+
+    def test_disjoint_titles_not_refreshed(self):
+        other = create_users(2, 'other')
+        Review.objects.create(title=self.titles[4], author_id=other[0],
+                              text='Отзыв', score=7)
+        Review.objects.create(title=self.titles[4], author_id=other[1],
+                              text='Отзыв', score=3)
+        build_title_similarity(full=True)
+        Review.objects.filter(
+            title=self.titles[4], author_id=other[0]
+        ).update(score=9)
+        assert build_title_similarity() == 1, (
+            'Проверьте, что пересчитываются только изменённые произведения '
+            'и произведения с общими рецензентами'
+        )
+
+    def test_title_without_reviews_dropped(self):
+        build_title_similarity(full=True)
+        Review.objects.filter(title=self.titles[1]).delete()
+        build_title_similarity()
+        assert self.stored() == self.pairs((2, 3), (3, 2))
+        assert not TitleSimilarityState.objects.filter(
+            title=self.titles[1]
+        ).exists()
+
+    def test_similar_endpoint(self):
+        build_title_similarity(full=True)
+        response = APIClient().get(
+            f'/api/v1/titles/{self.titles[0].pk}/similar/'
+        )
+        assert response.status_code == 200
+        assert [item['title']['id'] for item in response.data] == [
+            self.titles[1].pk
+        ]
+        assert response.data[0]['common_reviewers'] == 2
+        assert response.data[0]['score'] == pytest.approx(
+            KNOWN_COSINE, abs=1e-4
+        )
+        response = APIClient().get(
+            f'/api/v1/titles/{self.titles[4].pk}/similar/'
+        )
+        assert response.status_code == 200
+        assert response.data == []
+
+    def test_similar_endpoint_unknown_title(self):
+        missing = self.titles[-1].pk + 1000
+        response = APIClient().get(f'/api/v1/titles/{missing}/similar/')
+        assert response.status_code == 404, (
+            'Проверьте, что для несуществующего произведения '
+            'возвращается 404'
+        )
+
+
+class TestBuildTitleSimilarityCommand:
+
+    def test_loop_full_rebuild_interval(self):
+        clock = mock.Mock()
+        clock.perf_counter.return_value = 0
+        # Старт, две паузы по часу и пауза после суток с полного расчёта.
+        clock.monotonic.side_effect = [0, 3600, 86400, 86400, 90000]
+        clock.sleep.side_effect = [None, None, None, KeyboardInterrupt]
+        with mock.patch.object(similarity_command, 'time', clock), \
+                mock.patch.object(
+                    similarity, 'build_title_similarity', return_value=0
+                ) as build:
+            with pytest.raises(KeyboardInterrupt):
+                call_command(
+                    'build_title_similarity', '--loop', '--full',
+                    stdout=mock.Mock(),
+                )
+        assert [call[1]['full'] for call in build.call_args_list] == [
+            True, False, True, False
+        ], (
+            'Проверьте, что в режиме --loop все произведения '
+            'пересчитываются раз в --full-interval секунд'
+        )
@@ -0,0 +1,113 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .factories import seed
+
+pytestmark = pytest.mark.django_db
+
+TITLES_URL = '/api/v1/titles/'
+# Только произведения этого модуля, без общего набора из conftest.
+CATEGORY = 'category=sparse-category-0'
+
+
+def get(url):
+    with CaptureQueriesContext(connection) as context:
+        response = APIClient().get(url)
+    return response, [query['sql'] for query in context.captured_queries]
+
+
+def title_selects(queries):
+    return [
+        sql for sql in queries
+        if sql.startswith('SELECT') and 'FROM "reviews_title"' in sql
+        and 'COUNT(' not in sql
+    ]
+
+
+class TestSparseFields:
+
+    def setup_method(self):
+        cache.clear()
+        self.data = seed(titles=5, users=5, prefix='sparse')
+        self.reviews_url = (
+            f'{TITLES_URL}{self.data.titles[0]}/reviews/'
+        )
+
+    def test_title_fields(self):
+        response, queries = get(f'{TITLES_URL}?fields=id,name')
+        assert response.status_code == 200
+        for title in response.data['results']:
+            assert set(title) == {'id', 'name'}, (
+                'Проверьте, что ?fields= оставляет только перечисленные поля'
+            )
+        assert not any('reviews_genre' in sql for sql in queries), (
+            'Проверьте, что жанры не загружаются, если они не запрошены'
+        )
+        assert not any('reviews_category' in sql for sql in queries)
+        assert title_selects(queries)
+        for sql in title_selects(queries):
+            assert '"rating"' not in sql and '"description"' not in sql, (
+                'Проверьте, что из таблицы произведений читаются только '
+                'нужные колонки'
+            )
+
+    def test_full_title_list(self):
+        response, queries = get(TITLES_URL)
+        assert response.status_code == 200
+        assert any('reviews_genre' in sql for sql in queries)
+        assert any('"rating"' in sql for sql in title_selects(queries))
+
+    def test_compact_and_expanded_relations(self):
+        response, _ = get(
+            f'{TITLES_URL}?{CATEGORY}&fields=id,genre,category'
+        )
+        title = response.data['results'][0]
+        assert title['category'].startswith('sparse-category-'), (
+            'Проверьте, что связанные объекты из fields отдаются как slug'
+        )
+        assert all(isinstance(slug, str) for slug in title['genre'])
+
+        response, _ = get(
+            f'{TITLES_URL}?{CATEGORY}&fields=id&expand=genre,category'
+        )
+        title = response.data['results'][0]
+        assert set(title) == {'id', 'genre', 'category'}
+        assert set(title['category']) == {'name', 'slug'}, (
+            'Проверьте, что ?expand= отдаёт связанный объект целиком'
+        )
+        assert title['genre'] and all(
+            set(genre) == {'name', 'slug'} for genre in title['genre']
+        )
+
+    def test_unknown_fields(self):
+        response, _ = get(f'{TITLES_URL}?fields=id,unknown')
+        assert response.status_code == 400, (
+            'Проверьте, что неизвестное поле в ?fields= даёт 400'
+        )
+        response, _ = get(f'{TITLES_URL}?fields=id&expand=unknown')
+        assert response.status_code == 400
+
+    def test_review_fields(self):
+        response, queries = get(f'{self.reviews_url}?fields=id,score')
+        assert response.status_code == 200
+        assert response.data['results']
+        for review in response.data['results']:
+            assert set(review) == {'id', 'score'}
+        assert not any('reviews_user' in sql for sql in queries), (
+            'Проверьте, что автор не загружается, если он не запрошен'
+        )
+        review_selects = [
+            sql for sql in queries if 'FROM "reviews_review"' in sql
+            and 'COUNT(' not in sql
+        ]
+        assert review_selects
+        assert not any('"text"' in sql for sql in review_selects)
+
+        response, _ = get(f'{self.reviews_url}?fields=id,author')
+        assert all(
+            review['author'].startswith('sparse')
+            for review in response.data['results']
+        )
@@ -0,0 +1,28 @@
+import pytest
+from django.conf import settings
+
+from api.startup import measure_startup
+
+
+@pytest.fixture(scope='module')
+def startup_report():
+    return measure_startup()
+
+
+class TestStartup:
+
+    def test_startup_budget(self, startup_report):
+        budget = settings.STARTUP_TIME_BUDGET
+        assert startup_report['total'] < budget, (
+            f'Холодный старт занял {startup_report["total"]:.2f} с, '
+            f'бюджет — {budget} с. Подробности: manage.py profile_startup'
+        )
+
+    def test_schema_generator_is_lazy(self, startup_report):
+        loaded = [
+            module for module in startup_report['modules']
+            if module.startswith('drf_yasg')
+        ]
+        assert not loaded, (
+            'Проверьте, что drf_yasg не импортируется при старте приложения'
+        )
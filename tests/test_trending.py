@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reviews.aggregates import apply_pending_events, rebuild_title_aggregates
+from reviews.models import (Review, Title, TitleActivityBucket,
+                            TitleAggregateEvent, TrendingTitle)
+from reviews.trending import trending_scores
+
+from .factories import create_users, seed
+
+pytestmark = pytest.mark.django_db
+
+
+def store_ranking(window, title_ids, built):
+    TrendingTitle.objects.filter(window=window).delete()
+    TrendingTitle.objects.bulk_create(
+        TrendingTitle(
+            window=window, rank=rank, title_id=title_id, score=1, reviews=1,
+            built=built,
+        )
+        for rank, title_id in enumerate(title_ids, start=1)
+    )
+
+
+class TestTrendingCache:
+
+    def setup_method(self):
+        cache.clear()
+        self.titles = seed(titles=3, prefix='trend').titles
+
+    def ranking(self):
+        response = APIClient().get('/api/v1/titles/trending/?window=7d')
+        assert response.status_code == 200
+        return [item['title']['id'] for item in response.data]
+
+    def test_new_build_visible_in_other_processes(self):
+        built = timezone.now()
+        store_ranking('7d', self.titles[:2], built)
+        assert self.ranking() == self.titles[:2]
+        # Пересчёт в другом процессе не может очистить локальный кеш.
+        store_ranking(
+            '7d', self.titles[::-1], built + timedelta(seconds=1)
+        )
+        assert self.ranking() == self.titles[::-1], (
+            'Проверьте, что новая таблица популярных видна без ожидания '
+            'TRENDING_CACHE_TTL'
+        )
+
+
+class TestTrendingActivity:
+
+    def setup_method(self):
+        self.title = Title.objects.get(
+            pk=seed(titles=1, reviews_per_title=0, prefix='active').titles[0]
+        )
+        self.users = create_users(2, 'reader')
+        self.now = timezone.now() + timedelta(hours=1)
+
+    def review(self, user, score):
+        return Review.objects.create(
+            title=self.title, author_id=user, text='Отзыв', score=score
+        )
+
+    def score(self):
+        apply_pending_events()
+        return trending_scores('7d', self.now).get(self.title.pk)
+
+    def test_old_review_changes_not_recent_activity(self):
+        old = self.review(self.users[0], 8)
+        apply_pending_events()
+        Review.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=90)
+        )
+        TitleActivityBucket.objects.all().delete()
+        self.review(self.users[1], 6)
+        before = self.score()
+        old = Review.objects.get(pk=old.pk)
+        old.score = 2
+        old.save()
+        old.delete()
+        assert self.score() == before, (
+            'Проверьте, что удаление и правка старого отзыва не меняют '
+            'текущую популярность произведения'
+        )
+
+    def test_rebuild_keeps_pending_activity(self):
+        self.review(self.users[0], 9)
+        assert TitleAggregateEvent.objects.exists()
+        rebuild_title_aggregates(Title, Review, TitleAggregateEvent)
+        assert not TitleAggregateEvent.objects.exists()
+        assert self.score()[1] > 0, (
+            'Проверьте, что пересчёт агрегатов не теряет активность из '
+            'очереди событий'
+        )
@@ -0,0 +1,79 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Comment, Review, Title, User
+
+from .factories import create_users, seed
+
+pytestmark = pytest.mark.django_db
+
+
+def counters(user):
+    user.refresh_from_db()
+    return user.reviews_count, user.comments_count, user.score_sum
+
+
+class TestUserStats:
+
+    def setup_method(self):
+        self.data = seed(titles=3, users=5, prefix='stats')
+        self.user = User.objects.get(pk=create_users(1, 'counted')[0])
+        self.title = Title.objects.get(pk=self.data.titles[0])
+
+    def test_review_counters(self):
+        review = Review.objects.create(
+            title=self.title, author=self.user, text='Отзыв', score=7
+        )
+        assert counters(self.user) == (1, 0, 7), (
+            'Проверьте, что новый отзыв увеличивает счётчики автора'
+        )
+        review.score = 3
+        review.save()
+        assert counters(self.user) == (1, 0, 3), (
+            'Проверьте, что изменение оценки меняет сумму оценок'
+        )
+        review = Review.objects.get(pk=review.pk)
+        review.text = 'Другой текст'
+        review.save()
+        assert counters(self.user) == (1, 0, 3)
+        review.score = 10
+        review.save()
+        assert counters(self.user) == (1, 0, 10)
+        review.delete()
+        assert counters(self.user) == (0, 0, 0), (
+            'Проверьте, что удаление отзыва уменьшает счётчики автора'
+        )
+
+    def test_comment_counters(self):
+        comment = Comment.objects.create(
+            review_id=self.data.reviews[0], author=self.user, text='Да'
+        )
+        Comment.objects.create(
+            review_id=self.data.reviews[1], author=self.user, text='Нет'
+        )
+        assert counters(self.user) == (0, 2, 0)
+        comment.delete()
+        assert counters(self.user) == (0, 1, 0), (
+            'Проверьте, что удаление комментария уменьшает счётчик'
+        )
+
+    def test_review_delete_cascades_comment_counters(self):
+        Comment.objects.create(
+            review_id=self.data.reviews[0], author=self.user, text='Да'
+        )
+        Review.objects.filter(pk=self.data.reviews[0]).get().delete()
+        assert counters(self.user) == (0, 0, 0)
+
+    def test_recount_user_stats(self):
+        users = list(User.objects.filter(pk__in=self.data.users))
+        expected = {user.pk: counters(user) for user in users}
+        assert any(value != (0, 0, 0) for value in expected.values())
+        User.objects.filter(pk__in=self.data.users).update(
+            reviews_count=0, comments_count=0, score_sum=0
+        )
+        call_command('recount_user_stats', stdout=StringIO())
+        assert {user.pk: counters(user) for user in users} == expected, (
+            'Проверьте, что recount_user_stats восстанавливает счётчики'
+        )